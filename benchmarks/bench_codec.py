@@ -0,0 +1,122 @@
+"""
+Bytes per cache entry and encode/decode time for the cache codecs on Google Books payloads.
+
+"legacy" is the old json.dumps text; the other rows go through core.codec with the given serializer and
+compression (combinations whose library is not installed are skipped). The last lines compare caching
+raw + processed payloads per query with caching only the raw one (EXTERNAL_CACHE_PROCESSED=0).
+
+Without --payload a synthetic response is generated: volumes with 1000-5000 character descriptions
+built from a fixed vocabulary. Save a real answer with
+    curl "https://www.googleapis.com/books/v1/volumes?q=python&maxResults=40" > python.json
+for numbers on real data.
+
+Usage:
+    python benchmarks/bench_codec.py --items 40
+    python benchmarks/bench_codec.py --payload python.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# external_api.models імпортує через src., service - через core.
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+from core import codec as codec_module  # noqa: E402
+from external_api.service import GoogleBooksService  # noqa: E402
+
+WORDS = (
+    "python programming guide data science machine learning web development practical examples "
+    "beginners advanced patterns testing performance design software engineering algorithms book "
+    "chapter author edition reader code project library framework async concurrency database"
+).split()
+
+
+def synthetic(items: int, seed: int) -> dict:
+    rng = random.Random(seed)
+
+    def text(length: int) -> str:
+        words = []
+        while sum(len(word) + 1 for word in words) < length:
+            words.append(rng.choice(WORDS))
+        return " ".join(words)[:length]
+
+    return {
+        "kind": "books#volumes",
+        "totalItems": 1000,
+        "items": [
+            {
+                "id": f"vol{i:06d}",
+                "volumeInfo": {
+                    "title": text(40).title(),
+                    "authors": [text(15).title() for _ in range(rng.randint(1, 3))],
+                    "publishedDate": f"{rng.randint(1990, 2025)}-01-01",
+                    "description": text(rng.randint(1000, 5000)),
+                    "pageCount": rng.randint(100, 900),
+                    "categories": ["Computers"],
+                    "imageLinks": {"thumbnail": f"http://books.google.com/books/content?id=vol{i:06d}&img=1"},
+                    "language": "en",
+                    "previewLink": f"http://books.google.com/books?id=vol{i:06d}",
+                },
+            }
+            for i in range(items)
+        ],
+    }
+
+
+def measure(encode, decode, value, rounds: int):
+    encoded = encode(value)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(value)
+    encode_us = (time.perf_counter() - start) / rounds * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        decode(encoded)
+    decode_us = (time.perf_counter() - start) / rounds * 1e6
+    return len(encoded), encode_us, decode_us
+
+
+def codecs():
+    yield "legacy json text", lambda value: json.dumps(value).encode(), json.loads
+    serializers = codec_module._serializers()
+    compressors = codec_module._compressors(None)
+    for serializer in ("json", "orjson", "msgpack"):
+        for compression in ("none", "zlib", "zstd"):
+            if serializer in serializers and compression in compressors:
+                codec = codec_module.Codec(serializer, compression, min_compress_bytes=0)
+                yield f"{serializer} + {compression}", codec.encode, codec.decode
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payload", help="saved Google Books API response (JSON)")
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as f:
+            raw = json.load(f)
+    else:
+        raw = synthetic(args.items, args.seed)
+    # Так само, як GoogleBooksService._build_processed кладе оброблений запис у кеш
+    books = GoogleBooksService._process_raw(raw)
+    processed = {"total_books": len(books), "books": books}
+
+    sizes = {}
+    for name, payload in (("raw", raw), ("processed", processed)):
+        print(f"{name} payload, {len(payload.get('items', payload.get('books', [])))} volumes")
+        for codec_name, encode, decode in codecs():
+            size, encode_us, decode_us = measure(encode, decode, payload, args.rounds)
+            sizes.setdefault(codec_name, {})[name] = size
+            print(f"  {codec_name:<18} {size:>9} B  encode {encode_us:>8.1f} us  decode {decode_us:>8.1f} us")
+
+    print("bytes per query: raw + processed vs raw only")
+    for codec_name, size in sizes.items():
+        print(f"  {codec_name:<18} {size['raw'] + size['processed']:>9} B  {size['raw']:>9} B")
@@ -0,0 +1,104 @@
+"""
+Cache operations per second: a new Redis client per call (old core.cache behaviour) vs the shared pool,
+and per-key GET/SET vs the pipelined cache_get_many/cache_set_many.
+
+Without --url it runs against in-process fakeredis: no sockets, so it only shows client-side overhead
+(client construction, command encoding, round trips through the pipeline API). Point --url at a local
+redis-server (or a TLS rediss:// server for Upstash-like handshake costs) to see the network effect.
+
+Usage:
+    python benchmarks/bench_redis.py --ops 5000 --batch 50
+    python benchmarks/bench_redis.py --url redis://localhost:6379/0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import fakeredis  # noqa: E402
+import fakeredis.aioredis  # noqa: E402
+from redis import asyncio as aioredis  # noqa: E402
+
+from core import cache, redis_client  # noqa: E402
+
+
+async def per_call_client(new_client, ops: int) -> float:
+    """Old behaviour: a new client + close around every operation"""
+    start = time.perf_counter()
+    for i in range(ops):
+        redis = new_client()
+        try:
+            await redis.set(f"bench:{i}", json.dumps({"i": i}), ex=60)
+        finally:
+            await redis.close()
+    return ops / (time.perf_counter() - start)
+
+
+async def pooled(ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        await cache.cache_set(f"bench:{i}", {"i": i}, 60)
+    return ops / (time.perf_counter() - start)
+
+
+async def pipelined(ops: int, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, ops, batch):
+        await cache.cache_set_many({f"bench:{i}": {"i": i} for i in range(offset, offset + batch)}, 60)
+    return ops / (time.perf_counter() - start)
+
+
+async def read_pooled(ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        await cache.cache_get(f"bench:{i}")
+    return ops / (time.perf_counter() - start)
+
+
+async def read_pipelined(ops: int, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, ops, batch):
+        await cache.cache_get_many([f"bench:{i}" for i in range(offset, offset + batch)])
+    return ops / (time.perf_counter() - start)
+
+
+async def main(args) -> None:
+    # L1 вимкнено, щоб міряти саме звернення до Redis
+    cache.l1.max_entries = 0
+
+    if args.url:
+        os.environ["REDIS_URL"] = args.url
+
+        def new_client():
+            return aioredis.from_url(args.url)
+
+    else:
+        server = fakeredis.FakeServer()
+        fake = fakeredis.aioredis.FakeRedis(server=server)
+        cache.get_redis = lambda: fake
+
+        def new_client():
+            return fakeredis.aioredis.FakeRedis(server=server)
+
+    results = [("SET, new client per call", await per_call_client(new_client, args.ops))]
+    results.append(("SET, pooled client", await pooled(args.ops)))
+    results.append((f"SET, cache_set_many x{args.batch}", await pipelined(args.ops, args.batch)))
+    results.append(("GET, pooled client", await read_pooled(args.ops)))
+    results.append((f"GET, cache_get_many x{args.batch}", await read_pipelined(args.ops, args.batch)))
+    await redis_client.close_redis()
+
+    for name, ops_per_second in results:
+        print(f"{name:<32} {ops_per_second:>10.0f} ops/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Redis URL (default: in-process fakeredis)")
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""
+Latency of a cache hit on /api/external/books: the previous path (cache_get decodes the entry,
+ProcessedBooksResponse(**cached) validates it, FastAPI validates it again against response_model and
+renders JSON) vs core.response_cache, which sends the stored body bytes as they are.
+
+Requests go through the ASGI app in-process (httpx.ASGITransport) with fakeredis behind core.cache,
+so the numbers are server-side CPU per request without network. Bodies are read raw: gzip/br
+decompression on the client is not counted. "bytes" is what would go over the wire.
+
+Usage:
+    python benchmarks/bench_response_cache.py --sizes 10 40 --requests 500
+    python benchmarks/bench_response_cache.py --no-l1   # every hit goes to (fake) Redis
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+if "--no-l1" in sys.argv:
+    os.environ["CACHE_L1_MAX_ENTRIES"] = "0"
+
+import fakeredis.aioredis  # noqa: E402
+import httpx  # noqa: E402
+from bench_codec import synthetic  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+
+from core import cache  # noqa: E402
+from core.response_cache import ResponseCache, brotli  # noqa: E402
+from external_api.models import ProcessedBooksResponse  # noqa: E402
+from external_api.service import GoogleBooksService  # noqa: E402
+
+ENCODINGS = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+
+
+def build_app(responses: ResponseCache) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before/{size}", response_model=ProcessedBooksResponse)
+    async def before(size: int):
+        cached = await cache.cache_get(f"bench:processed:{size}")
+        return ProcessedBooksResponse(**cached)
+
+    @app.get("/after/{size}", response_model=ProcessedBooksResponse)
+    async def after(size: int, request: Request):
+        return await responses.get(f"bench:response:{size}", request)
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, url: str, encoding: str, requests: int):
+    latencies, size = [], 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        async with client.stream("GET", url, headers={"Accept-Encoding": encoding}) as response:
+            size = sum([len(chunk) async for chunk in response.aiter_raw()])
+        latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1], size
+
+
+async def main(sizes, requests: int) -> None:
+    redis = fakeredis.aioredis.FakeRedis()
+    cache.get_redis = lambda: redis
+    responses = ResponseCache(enabled=True)
+    app = build_app(responses)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for size in sizes:
+            books = GoogleBooksService._process_raw(synthetic(size, seed=size))
+            processed = {"total_books": len(books), "books": books}
+            await cache.cache_set(f"bench:processed:{size}", processed, 600)
+            # Тіло так само, як його зберігає /api/external/books після промаху
+            body = GoogleBooksService._processed_response(books).model_dump_json().encode()
+            await responses.store(f"bench:response:{size}", httpx.Request("GET", "/"), body)
+
+            print(f"{size} books")
+            for encoding in ENCODINGS:
+                # Прогрів: перший запит будує роутинг і L1
+                for path in ("before", "after"):
+                    await measure(client, f"/{path}/{size}", encoding, 5)
+                old_p50, old_p99, old_size = await measure(client, f"/before/{size}", encoding, requests)
+                new_p50, new_p99, new_size = await measure(client, f"/after/{size}", encoding, requests)
+                print(
+                    f"  {encoding:<9} before p50 {old_p50:>8.1f} us p99 {old_p99:>8.1f} us {old_size:>7} B"
+                    f"  after p50 {new_p50:>8.1f} us p99 {new_p99:>8.1f} us {new_size:>7} B  x{old_p50 / new_p50:>5.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--no-l1", action="store_true", help="disable the in-process cache tier")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.requests))
@@ -0,0 +1,107 @@
+"""
+CPU time per request for turning a Google Books response into ProcessedBooksResponse:
+the previous pipeline (full model validation, a validated ProcessedBook per item and a re-validated
+response) vs the fast path in GoogleBooksService (trusted cached data is not re-validated; items are transformed
+as plain dicts and validated once by pydantic-core).
+
+Cases per payload size:
+    miss       - fresh upstream response: validation before caching + transformation
+    raw hit    - cached raw response (EXTERNAL_CACHE_PROCESSED=0, fan-out pages)
+    processed  - cached processed response
+
+Usage:
+    python benchmarks/bench_transform.py --sizes 10 40 400 --rounds 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+from bench_codec import synthetic  # noqa: E402
+
+from external_api.models import GoogleBooksResponse, ProcessedBook, ProcessedBooksResponse  # noqa: E402
+from external_api.service import GoogleBooksService  # noqa: E402
+
+
+def legacy_process(raw_data: GoogleBooksResponse) -> ProcessedBooksResponse:
+    """Перетворення до швидкого шляху: по моделях, з валідацією кожного ProcessedBook"""
+    books = []
+    for book in raw_data.items:
+        volume_info = book.volumeInfo
+        published_year = None
+        if volume_info.publishedDate:
+            try:
+                published_year = int(volume_info.publishedDate[:4])
+            except (ValueError, TypeError):
+                published_year = None
+        thumbnail = None
+        if volume_info.imageLinks and volume_info.imageLinks.get("thumbnail"):
+            thumbnail = volume_info.imageLinks["thumbnail"]
+        books.append(
+            ProcessedBook(
+                id=book.id,
+                title=volume_info.title,
+                authors=volume_info.authors or ["Unknown Author"],
+                published_year=published_year,
+                page_count=volume_info.pageCount,
+                categories=volume_info.categories or [],
+                thumbnail=thumbnail,
+                preview_link=str(volume_info.previewLink) if volume_info.previewLink else None,
+                language=volume_info.language,
+            )
+        )
+    return ProcessedBooksResponse(total_books=len(books), books=books)
+
+
+def legacy(raw: dict, processed: dict):
+    def miss():
+        ProcessedBooksResponse(**legacy_process(GoogleBooksResponse(**raw)).dict())
+
+    return {
+        "miss": miss,
+        "raw hit": lambda: legacy_process(GoogleBooksResponse(**raw)),
+        "processed": lambda: ProcessedBooksResponse(**processed),
+    }
+
+
+def fast(raw: dict, processed: dict):
+    service = GoogleBooksService
+
+    def miss():
+        GoogleBooksResponse.model_validate(raw)
+        service._processed_response(service._process_raw(raw))
+
+    return {
+        "miss": miss,
+        "raw hit": lambda: service._processed_response(service._process_raw(raw)),
+        "processed": lambda: service._processed_response(processed["books"]),
+    }
+
+
+def cpu_us(fn, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        fn()
+    return (time.process_time() - start) / rounds * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 40, 400])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        raw = synthetic(size, seed=size)
+        books = GoogleBooksService._process_raw(raw)
+        processed = {"total_books": len(books), "books": books}
+        before, after = legacy(raw, processed), fast(raw, processed)
+        rounds = max(args.rounds * 40 // max(size, 40), 5)
+        print(f"{size} items")
+        for case in ("miss", "raw hit", "processed"):
+            old, new = cpu_us(before[case], rounds), cpu_us(after[case], rounds)
+            print(f"  {case:<10} before {old:>9.1f} us  after {new:>9.1f} us  x{old / new:>5.1f}")
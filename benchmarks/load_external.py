@@ -0,0 +1,160 @@
+"""
+Latency of an unrelated endpoint (/common/healthcheck) while /api/external/books/raw waits on a slow upstream.
+
+Starts a local stub of the Google Books API that answers after --upstream-delay seconds, then the app
+with GOOGLE_BOOKS_API_URL pointing at the stub. Healthcheck latency is measured once on an idle app and
+once while --slow-clients keep cache-missing external searches in flight. With REDIS_URL set it also
+measures a hot /api/external/books query whose soft TTL (1 s) keeps expiring: with stale-while-revalidate
+its p99 should stay at cache-hit latency instead of jumping to --upstream-delay.
+
+--fail-rate makes the stub answer 503 to that share of calls; the breaker and limiter counters from
+/api/external/stats are printed at the end.
+
+Usage:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/load_external.py --slow-clients 50 --upstream-delay 1
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Response
+from load_books import prepare_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_stub(port: int, delay: float, fail_rate: float = 0.0) -> uvicorn.Server:
+    stub = FastAPI()
+
+    @stub.get("/books/v1/volumes")
+    async def volumes(q: str, maxResults: int = 10):
+        await asyncio.sleep(delay)
+        if random.random() < fail_rate:
+            return Response(status_code=503)
+        items = [
+            {"id": f"{q}-{i}", "volumeInfo": {"title": f"{q} {i}", "authors": ["Stub"]}} for i in range(maxResults)
+        ]
+        return {"kind": "books#volumes", "totalItems": len(items), "items": items}
+
+    server = uvicorn.Server(uvicorn.Config(stub, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def start_app(port: int, stub_port: int) -> subprocess.Popen:
+    env = dict(os.environ, GOOGLE_BOOKS_API_URL=f"http://127.0.0.1:{stub_port}/books/v1/volumes")
+    env.setdefault("SKIP_SCHEMA_INSPECTION", "true")
+    env.setdefault("CACHE_SWR_SOFT_TTL", "1")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/common/healthcheck")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def probe(client: httpx.AsyncClient, duration: float):
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        await client.get("/common/healthcheck")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def slow_search(client: httpx.AsyncClient, deadline: float, counts: dict) -> None:
+    while time.monotonic() < deadline:
+        # Унікальний запит - завжди промах кешу, тобто завжди повільний upstream
+        response = await client.get("/api/external/books/raw", params={"query": uuid.uuid4().hex, "max_results": 5})
+        if response.status_code == 200:
+            counts["ok"] += 1
+        else:
+            # Клієнт, якому відмовили, не повторює запит миттєво
+            counts["errors"] += 1
+            await asyncio.sleep(0.1)
+
+
+async def hot_query(client: httpx.AsyncClient, duration: float):
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        await client.get("/api/external/books", params={"query": "hot", "max_results": 5})
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    # Перший запит - холодний промах, його не враховуємо
+    return latencies[1:]
+
+
+def report(name: str, latencies, endpoint: str = "healthcheck") -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000
+    print(f"{endpoint} {name:<22} p50 {statistics.median(latencies) * 1000:>7.1f} ms  p99 {p99:>7.1f} ms")
+
+
+async def main(args) -> None:
+    stub = start_stub(args.stub_port, args.upstream_delay, args.fail_rate)
+    app = start_app(args.port, args.stub_port)
+    limits = httpx.Limits(max_connections=args.slow_clients + 10)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+            report("idle", await probe(client, args.duration))
+
+            counts = {"ok": 0, "errors": 0}
+            deadline = time.monotonic() + args.duration
+            slow = [asyncio.create_task(slow_search(client, deadline, counts)) for _ in range(args.slow_clients)]
+            report(f"{args.slow_clients} slow upstream calls", await probe(client, args.duration))
+            await asyncio.gather(*slow)
+            print(f"external searches: {counts['ok']} ok, {counts['errors']} errors")
+            stats = (await client.get("/api/external/stats")).json()
+            print(f"breaker: {stats['breaker']}")
+            print(f"limiter: {stats['limiter']}")
+
+            if os.getenv("REDIS_URL"):
+                report("(soft TTL 1 s)", await hot_query(client, args.duration), endpoint="hot query")
+    finally:
+        app.terminate()
+        app.wait()
+        stub.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slow-clients", type=int, default=50)
+    parser.add_argument("--upstream-delay", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of upstream calls answered with 503")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--stub-port", type=int, default=8768)
+    args = parser.parse_args()
+
+    prepare_database(os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/bench_external.db"))
+    asyncio.run(main(args))
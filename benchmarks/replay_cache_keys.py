@@ -0,0 +1,91 @@
+"""
+Hit ratio of the external search cache under replayed traffic: raw-string keys (old) vs normalised keys
+vs normalised keys with superset reuse (a cached larger max_results answers a smaller one).
+
+Traffic is a JSONL file with one {"query": ..., "max_results": ...} object per line; without --traffic
+a Zipf-distributed synthetic workload with case/whitespace/width variants is generated. The cache is
+simulated without expiry, so the numbers compare key schemes only.
+
+Usage:
+    python benchmarks/replay_cache_keys.py --traffic logs/external_requests.jsonl
+    python benchmarks/replay_cache_keys.py --requests 100000 --queries 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.external_api import keys  # noqa: E402
+
+
+def synthetic(requests: int, queries: int, seed: int):
+    rng = random.Random(seed)
+    vocabulary = [f"topic {i} books" for i in range(queries)]
+    weights = [1 / (rank + 1) for rank in range(queries)]
+
+    def variant(query: str) -> str:
+        choice = rng.random()
+        if choice < 0.2:
+            return query.title()
+        if choice < 0.35:
+            return f"  {query.upper()} "
+        if choice < 0.45:
+            # Повноширинні символи, як з японської розкладки
+            return "".join(chr(ord(c) + 0xFEE0) if "!" <= c <= "~" else c for c in query)
+        if choice < 0.55:
+            return query.replace(" ", "  ")
+        return query
+
+    for query in rng.choices(vocabulary, weights=weights, k=requests):
+        yield {"query": variant(query), "max_results": rng.choice([10, 10, 10, 20, 40])}
+
+
+def load(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                yield {"query": row["query"], "max_results": int(row.get("max_results", 10))}
+
+
+def replay(traffic):
+    raw, normalised, superset = set(), set(), set()
+    hits = {"raw": 0, "normalised": 0, "superset": 0}
+    total = 0
+    for request in traffic:
+        total += 1
+        query, size = request["query"], request["max_results"]
+
+        raw_key = f"books:raw:{query}:{size}"
+        hits["raw"] += raw_key in raw
+        raw.add(raw_key)
+
+        key = keys.cache_key("raw", query, size)
+        hits["normalised"] += key in normalised
+        normalised.add(key)
+
+        candidates = [key] + [keys.cache_key("raw", query, larger) for larger in keys.superset_sizes(size)]
+        if any(candidate in superset for candidate in candidates):
+            hits["superset"] += 1
+        else:
+            superset.add(key)
+    return total, hits, {"raw": len(raw), "normalised": len(normalised), "superset": len(superset)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traffic", help="JSONL file with query/max_results per line")
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    traffic = load(args.traffic) if args.traffic else synthetic(args.requests, args.queries, args.seed)
+    total, hits, entries = replay(traffic)
+    print(f"{total} requests")
+    for scheme in ("raw", "normalised", "superset"):
+        print(f"{scheme:<11} hit ratio {hits[scheme] / total:>7.2%}  entries {entries[scheme]:>8}")
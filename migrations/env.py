@@ -0,0 +1,46 @@
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, pool
+
+load_dotenv()
+
+config = context.config
+
+# Міграції пишуться вручну (SQL тригерів і індексів), автогенерація не використовується
+target_metadata = None
+
+
+def run_migrations_offline() -> None:
+    context.configure(url=os.getenv("DATABASE_URL"), literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # Тести передають власне з'єднання (SQLite в пам'яті)
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise ValueError("❌ DATABASE_URL not found in environment variables")
+    engine = create_engine(url, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
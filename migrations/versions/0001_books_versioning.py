@@ -0,0 +1,178 @@
+"""books: version columns, sharded catalog version counter, search indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Idempotent: columns, tables and indexes created earlier by the startup DDL are left as they are.
+The catalog version is the sum of CATALOG_VERSION_SHARDS rows; a statement-level trigger bumps one
+random row, so concurrent writers rarely wait on the same row lock.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CATALOG_VERSION_TABLE = "books_catalog_version"
+CATALOG_VERSION_SHARDS = 16
+FTS_TABLE = "books_fts"
+SEARCH_VECTOR_SQL = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, ''))"
+
+POSTGRES_BUMP_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION bump_{CATALOG_VERSION_TABLE}() RETURNS trigger AS $$
+BEGIN
+    UPDATE {CATALOG_VERSION_TABLE} SET version = version + 1
+    WHERE id = floor(random() * {CATALOG_VERSION_SHARDS})::int;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+SQLITE_FTS_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON books BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON books BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END
+    """,
+    f"{FTS_TABLE}_au": f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON books BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO {FTS_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+}
+
+
+def _create_books_table() -> None:
+    op.create_table(
+        "books",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("author", sa.String(255), nullable=False),
+        sa.Column("year", sa.Integer),
+        sa.Column("isbn", sa.String(20)),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+        sa.Column("version", sa.Integer, nullable=False, server_default="1"),
+    )
+    op.create_index("ix_books_id", "books", ["id"])
+    op.create_index("ix_books_title", "books", ["title"])
+    op.create_index("ix_books_author", "books", ["author"])
+    op.create_index("ix_books_isbn", "books", ["isbn"], unique=True)
+
+
+def _add_version_columns(inspector) -> None:
+    columns = {column["name"] for column in inspector.get_columns("books")}
+    if "updated_at" not in columns:
+        op.add_column("books", sa.Column("updated_at", sa.DateTime))
+    if "version" not in columns:
+        op.add_column("books", sa.Column("version", sa.Integer, nullable=False, server_default="1"))
+
+
+def _create_catalog_version(inspector) -> None:
+    if not inspector.has_table(CATALOG_VERSION_TABLE):
+        op.create_table(
+            CATALOG_VERSION_TABLE,
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("version", sa.BigInteger, nullable=False, server_default="0"),
+        )
+    # Рядок id=1 зі старого лічильника зберігає своє значення - сума версій не зменшується
+    for shard in range(CATALOG_VERSION_SHARDS):
+        op.execute(
+            f"INSERT INTO {CATALOG_VERSION_TABLE} (id, version) VALUES ({shard}, 0) ON CONFLICT (id) DO NOTHING"
+        )
+
+
+def _upgrade_postgresql() -> None:
+    op.execute(POSTGRES_BUMP_FUNCTION)
+    # DROP + CREATE замість CREATE OR REPLACE TRIGGER (лише з PostgreSQL 14); EXECUTE PROCEDURE - з PostgreSQL 10
+    op.execute(f"DROP TRIGGER IF EXISTS {CATALOG_VERSION_TABLE}_bump ON books")
+    op.execute(
+        f"""
+        CREATE TRIGGER {CATALOG_VERSION_TABLE}_bump AFTER INSERT OR UPDATE OR DELETE ON books
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_{CATALOG_VERSION_TABLE}()
+        """
+    )
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_books_search_tsv ON books USING gin (({SEARCH_VECTOR_SQL}))")
+
+    # Без прав на розширення пошук працює через ILIKE без індексів - міграцію через це не зупиняємо
+    bind = op.get_bind()
+    try:
+        with bind.begin_nested():
+            bind.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            bind.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)"))
+            bind.execute(
+                sa.text("CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING gin (author gin_trgm_ops)")
+            )
+    except sa.exc.DBAPIError as e:
+        print(f"⚠️ pg_trgm indexes skipped: {e}")
+
+
+def _upgrade_sqlite(inspector) -> None:
+    # SQLite пише в один потік, тож тригер рядковий; лічильник той самий, що й у PostgreSQL
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        name = f"{CATALOG_VERSION_TABLE}_{event.lower()}"
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(
+            f"""
+            CREATE TRIGGER {name} AFTER {event} ON books BEGIN
+                UPDATE {CATALOG_VERSION_TABLE} SET version = version + 1
+                WHERE id = abs(random()) % {CATALOG_VERSION_SHARDS};
+            END
+            """
+        )
+
+    fts_exists = inspector.has_table(FTS_TABLE)
+    op.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(title, author, content='books', content_rowid='id', tokenize='trigram')
+        """
+    )
+    for name, statement in SQLITE_FTS_TRIGGERS.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(statement)
+    if not fts_exists:
+        op.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if inspector.has_table("books"):
+        _add_version_columns(inspector)
+    else:
+        _create_books_table()
+    _create_catalog_version(inspector)
+
+    if bind.dialect.name == "postgresql":
+        _upgrade_postgresql()
+    elif bind.dialect.name == "sqlite":
+        _upgrade_sqlite(inspector)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(f"DROP TRIGGER IF EXISTS {CATALOG_VERSION_TABLE}_bump ON books")
+        op.execute(f"DROP FUNCTION IF EXISTS bump_{CATALOG_VERSION_TABLE}()")
+        for index in ("ix_books_search_tsv", "ix_books_title_trgm", "ix_books_author_trgm"):
+            op.execute(f"DROP INDEX IF EXISTS {index}")
+    else:
+        for name in [f"{CATALOG_VERSION_TABLE}_{event}" for event in ("insert", "update", "delete")] + list(
+            SQLITE_FTS_TRIGGERS
+        ):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    op.drop_table(CATALOG_VERSION_TABLE)
+    # Колонки version і updated_at лишаються: їх читає модель Book
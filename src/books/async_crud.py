@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas, search
+
+# Async-версії функцій crud.py для роутів, що працюють на event loop
+
+
+async def get_book(db: AsyncSession, book_id: int) -> Optional[models.Book]:
+    return await db.scalar(select(models.Book).where(models.Book.id == book_id))
+
+
+async def get_book_version(db: AsyncSession, book_id: int) -> Optional[int]:
+    return await db.scalar(select(models.Book.version).where(models.Book.id == book_id))
+
+
+async def get_catalog_version(db: AsyncSession) -> int:
+    return await db.scalar(select(func.sum(models.BookCatalogVersion.version))) or 0
+
+
+async def get_books(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Book]:
+    return list(await db.scalars(select(models.Book).order_by(models.Book.id).offset(skip).limit(limit)))
+
+
+async def get_books_after(db: AsyncSession, after_id: Optional[int] = None, limit: int = 100) -> List[models.Book]:
+    stmt = select(models.Book)
+    if after_id is not None:
+        stmt = stmt.where(models.Book.id > after_id)
+    return list(await db.scalars(stmt.order_by(models.Book.id).limit(limit)))
+
+
+async def get_books_by_author(db: AsyncSession, author: str, skip: int = 0, limit: int = 100) -> List[models.Book]:
+    # Діалектна логіка пошуку спільна з sync-шляхом, run_sync не блокує event loop
+    return await db.run_sync(search.search_by_author, author, skip=skip, limit=limit)
+
+
+async def get_book_by_isbn(db: AsyncSession, isbn: str) -> Optional[models.Book]:
+    return await db.scalar(select(models.Book).where(models.Book.isbn == isbn))
+
+
+async def get_books_by_ids(db: AsyncSession, book_ids: List[int]) -> Dict[int, models.Book]:
+    if not book_ids:
+        return {}
+    books = await db.scalars(select(models.Book).where(models.Book.id.in_(book_ids)))
+    return {book.id: book for book in books}
+
+
+async def get_books_by_isbns(db: AsyncSession, isbns: List[str]) -> Dict[str, models.Book]:
+    if not isbns:
+        return {}
+    books = await db.scalars(select(models.Book).where(models.Book.isbn.in_(isbns)))
+    return {book.isbn: book for book in books}
+
+
+async def create_book(db: AsyncSession, book: schemas.BookCreate) -> models.Book:
+    try:
+        row = (await db.execute(crud.create_book_statement(db.bind.dialect.name, book))).first()
+    except IntegrityError as e:
+        await db.rollback()
+        if crud.is_isbn_conflict(e):
+            row = None
+        else:
+            raise
+    if row is None:
+        await db.rollback()
+        raise ValueError(f"Book with ISBN {book.isbn} already exists")
+    await db.commit()
+    return crud.book_from_row(row)
+
+
+async def create_books_bulk(db: AsyncSession, books: List[schemas.BookCreate]) -> Dict[str, int]:
+    return await db.run_sync(crud.create_books_bulk, books)
+
+
+async def update_book(db: AsyncSession, book_id: int, book_update: schemas.BookUpdate) -> Optional[models.Book]:
+    try:
+        row = (await db.execute(crud.update_book_statement(book_id, book_update))).first()
+    except IntegrityError as e:
+        await db.rollback()
+        if crud.is_isbn_conflict(e):
+            raise ValueError(f"Book with ISBN {book_update.isbn} already exists")
+        raise
+    await db.commit()
+    return None if row is None else crud.book_from_row(row)
+
+
+async def delete_book(db: AsyncSession, book_id: int) -> bool:
+    row = (await db.execute(crud.delete_book_statement(book_id))).first()
+    await db.commit()
+    return row is not None
+
+
+async def search_books(db: AsyncSession, query: str, skip: int = 0, limit: int = 100) -> List[models.Book]:
+    return await db.run_sync(search.search_books, query, skip=skip, limit=limit)
@@ -0,0 +1,138 @@
+from functools import partial
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Ті самі ендпоінти, що й у routes.py, але на async-сесії (вмикається BOOKS_ASYNC_DB=true);
+# спільна логіка - у handlers.py, тут лише виклики БД
+from . import async_crud, batch, bulk, export, handlers, schemas
+from .database import get_async_db
+
+router = APIRouter(prefix="/books", tags=["books"])
+
+
+@router.post("/", response_model=schemas.BookResponse, status_code=status.HTTP_201_CREATED)
+async def create_book(book: schemas.BookCreate, db: AsyncSession = Depends(get_async_db)):
+    return await handlers.create_book(partial(async_crud.create_book, db=db, book=book))
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResponse)
+async def bulk_create_books(
+    request: Request,
+    chunk_size: int = Query(1000, ge=1, le=10000, description="Rows per INSERT/commit"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Import books from a JSON array or an NDJSON stream (Content-Type: application/x-ndjson)
+    """
+    importer = bulk.BulkImporter(db, chunk_size=chunk_size)
+    return await handlers.bulk_import(request, importer, importer.flush_async)
+
+
+@router.get("/", response_model=List[schemas.BookResponse])
+async def read_books(
+    request: Request,
+    skip: int = Query(0, ge=0, description="Skip records"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit records"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header (skip is ignored)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if cursor is not None:
+        after_id = handlers.cursor_position(cursor)
+        load = partial(async_crud.get_books_after, db, after_id=after_id, limit=limit)
+    else:
+        load = partial(async_crud.get_books, db, skip=skip, limit=limit)
+
+    version = partial(async_crud.get_catalog_version, db)
+    return await handlers.book_list(request, version, load, "list", skip, limit, cursor, limit=limit)
+
+
+@router.get("/export")
+async def export_books(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Export format"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Stream the whole catalogue as NDJSON or CSV (gzip when the client accepts it)
+    """
+    return handlers.export_response(
+        request, format, export.iter_export_async(db.bind, format), export.gzip_chunks_async
+    )
+
+
+@router.get("/batch", response_model=List[Optional[schemas.BookResponse]])
+async def read_books_batch(
+    ids: List[str] = Query([], description="Book ids, repeated or comma-separated"),
+    isbns: List[str] = Query([], description="ISBNs, repeated or comma-separated"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Resolve many books with one IN (...) query; results follow the requested order, null for missing ones
+    """
+    book_ids, isbn_keys = handlers.batch_keys(ids, isbns)
+    if book_ids:
+        return handlers.in_order(await async_crud.get_books_by_ids(db, book_ids), book_ids)
+    return handlers.in_order(await async_crud.get_books_by_isbns(db, isbn_keys), isbn_keys)
+
+
+@router.get("/cache/stats")
+async def book_cache_stats():
+    """Hit/miss counters of the single-book cache and lookup coalescing stats"""
+    return handlers.cache_stats(batch.async_id_loader, batch.async_isbn_loader)
+
+
+@router.get("/{book_id}", response_model=schemas.BookResponse)
+async def read_book(book_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    return await handlers.read_book(
+        book_id,
+        request,
+        response,
+        partial(async_crud.get_book_version, db, book_id),
+        lambda: batch.async_id_loader.load(db, book_id),
+    )
+
+
+@router.get("/author/{author}", response_model=List[schemas.BookResponse])
+async def read_books_by_author(
+    author: str,
+    request: Request,
+    skip: int = Query(0, ge=0, description="Skip records"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit records"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    version = partial(async_crud.get_catalog_version, db)
+    load = partial(async_crud.get_books_by_author, db, author=author, skip=skip, limit=limit)
+    return await handlers.book_list(request, version, load, "author", author, skip, limit)
+
+
+@router.get("/isbn/{isbn}", response_model=schemas.BookResponse)
+async def read_book_by_isbn(isbn: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    return await handlers.read_book_by_isbn(isbn, request, response, lambda: batch.async_isbn_loader.load(db, isbn))
+
+
+@router.put("/{book_id}", response_model=schemas.BookResponse)
+async def update_book(
+    book_id: int, book_update: schemas.BookUpdate, response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    update = partial(async_crud.update_book, db, book_id=book_id, book_update=book_update)
+    return await handlers.update_book(book_id, response, update)
+
+
+@router.delete("/{book_id}")
+async def delete_book(book_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await handlers.delete_book(book_id, partial(async_crud.delete_book, db, book_id=book_id))
+
+
+@router.get("/search/{query}", response_model=List[schemas.BookResponse])
+async def search_books(
+    query: str,
+    request: Request,
+    skip: int = Query(0, ge=0, description="Skip records"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit records"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    version = partial(async_crud.get_catalog_version, db)
+    load = partial(async_crud.search_books, db, query=query, skip=skip, limit=limit)
+    return await handlers.book_list(request, version, load, "search", query, skip, limit)
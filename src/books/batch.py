@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import async_crud, crud
+
+MAX_BATCH_SIZE = 1000
+
+FetchMany = Callable[[Any, List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+def parse_keys(values: List[str], cast=str) -> list:
+    """Accept both ?ids=1&ids=2 and ?ids=1,2 forms, keeping order and dropping duplicates"""
+    keys = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if part:
+                keys.append(cast(part))
+    keys = list(dict.fromkeys(keys))
+    if len(keys) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} keys per request")
+    return keys
+
+
+class BatchLoader:
+    """
+    DataLoader-style coalescing: lookups that arrive within one event-loop tick
+    are resolved by a single fetch_many(bind, keys) call (one IN (...) query).
+    The batch gets the engine of the first caller's session, not the session itself:
+    it serves other requests too and may outlive the request that started it.
+    """
+
+    def __init__(self, fetch_many: FetchMany):
+        self._fetch_many = fetch_many
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._bind = None
+        self._task = None
+        self.loads = 0
+        self.batches = 0
+
+    async def load(self, db, key: Hashable) -> Any:
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                # Пакет стартує на наступному кроці циклу
+                self._bind = db.bind
+                self._task = loop.create_task(self._dispatch())
+            future = loop.create_future()
+            self._pending[key] = future
+        # shield: скасування одного запиту не скасовує результат для решти
+        return await asyncio.shield(future)
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        bind, self._bind = self._bind, None
+        self.batches += 1
+        try:
+            results = await self._fetch_many(bind, list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self) -> dict:
+        return {"loads": self.loads, "batches": self.batches}
+
+
+def _in_session(fetch, bind, keys):
+    # Своя сесія на кожен пакет: Session не потокобезпечна, а сесію запиту закривають після відповіді
+    with Session(bind=bind, autoflush=False) as db:
+        return fetch(db, keys)
+
+
+async def _in_async_session(fetch, bind, keys):
+    async with AsyncSession(bind, autoflush=False, expire_on_commit=False) as db:
+        return await fetch(db, keys)
+
+
+id_loader = BatchLoader(lambda bind, ids: run_in_threadpool(_in_session, crud.get_books_by_ids, bind, ids))
+isbn_loader = BatchLoader(lambda bind, isbns: run_in_threadpool(_in_session, crud.get_books_by_isbns, bind, isbns))
+async_id_loader = BatchLoader(lambda bind, ids: _in_async_session(async_crud.get_books_by_ids, bind, ids))
+async_isbn_loader = BatchLoader(lambda bind, isbns: _in_async_session(async_crud.get_books_by_isbns, bind, isbns))
@@ -0,0 +1,134 @@
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from fastapi import Request
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import async_crud, crud, schemas
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def read_rows(request: Request) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Yield (row, error) pairs from a JSON array body or a streamed NDJSON body"""
+    content_type = request.headers.get("content-type", "")
+
+    if not content_type.startswith(NDJSON_CONTENT_TYPES):
+        try:
+            rows = json.loads(await request.body())
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+        if not isinstance(rows, list):
+            raise ValueError("Expected a JSON array of books")
+        for row in rows:
+            yield row, None
+        return
+
+    # NDJSON читаємо потоково, не буферизуючи все тіло запиту
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _decode_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"Invalid JSON line: {e}"
+
+
+class BulkImporter:
+    """Validates incoming rows and writes them in chunks, one commit per chunk"""
+
+    def __init__(self, db: Union[Session, AsyncSession], chunk_size: int = 1000):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.results: List[schemas.BulkRowResult] = []
+        self._pending: List[Tuple[int, schemas.BookCreate]] = []
+        self._seen_isbns = set()
+        self._started = time.perf_counter()
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._pending) >= self.chunk_size
+
+    def add(self, row: Any, error: Optional[str] = None) -> None:
+        index = len(self.results)
+        if error is None:
+            try:
+                book = schemas.BookCreate.model_validate(row)
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+
+        if error is not None:
+            self.results.append(schemas.BulkRowResult(index=index, status="invalid", error=error))
+            return
+
+        result = schemas.BulkRowResult(index=index, status="duplicate", isbn=book.isbn)
+        self.results.append(result)
+        # Повтори ISBN всередині самого імпорту - перший рядок виграє
+        if book.isbn not in self._seen_isbns:
+            self._seen_isbns.add(book.isbn)
+            self._pending.append((index, book))
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            created = crud.create_books_bulk(self.db, [book for _, book in pending])
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            self._record_error(pending, e)
+            return
+        self._record_created(pending, created)
+
+    async def flush_async(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            created = await async_crud.create_books_bulk(self.db, [book for _, book in pending])
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            self._record_error(pending, e)
+            return
+        self._record_created(pending, created)
+
+    def _record_created(self, pending: List[Tuple[int, schemas.BookCreate]], created: Dict[str, int]) -> None:
+        for index, book in pending:
+            if book.isbn in created:
+                self.results[index].status = "created"
+                self.results[index].id = created[book.isbn]
+
+    def _record_error(self, pending: List[Tuple[int, schemas.BookCreate]], error: SQLAlchemyError) -> None:
+        for index, _ in pending:
+            self.results[index].status = "error"
+            self.results[index].error = str(error.__cause__ or error).strip()
+
+    def summary(self) -> schemas.BulkImportResponse:
+        elapsed = time.perf_counter() - self._started
+        counts = {status: 0 for status in ("created", "duplicate", "invalid", "error")}
+        for result in self.results:
+            counts[result.status] += 1
+
+        return schemas.BulkImportResponse(
+            total=len(self.results),
+            created=counts["created"],
+            duplicates=counts["duplicate"],
+            invalid=counts["invalid"],
+            errors=counts["error"],
+            elapsed_ms=round(elapsed * 1000, 2),
+            rows_per_second=round(len(self.results) / elapsed, 1) if elapsed else 0.0,
+            results=self.results,
+        )
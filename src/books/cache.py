@@ -0,0 +1,202 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from core.cache import cache_delete, cache_get, cache_set
+from core.response_cache import ResponseCache
+
+from . import models, pagination, schemas
+
+BOOK_CACHE_TTL = int(os.getenv("BOOK_CACHE_TTL", "300"))
+# Розмір in-process рівня (0 - вимкнено) і його TTL; короткий, бо інші воркери його не інвалідовують
+BOOK_CACHE_LOCAL_SIZE = int(os.getenv("BOOK_CACHE_LOCAL_SIZE", "0"))
+BOOK_CACHE_LOCAL_TTL = int(os.getenv("BOOK_CACHE_LOCAL_TTL", "5"))
+# Скільки секунд після запису ключ не можна заповнювати - відсікає читачів, що встигли прочитати старий рядок
+BOOK_CACHE_TOMBSTONE_TTL = int(os.getenv("BOOK_CACHE_TOMBSTONE_TTL", "5"))
+# Готові тіла сторінок списків; ключ - ETag з версією каталогу, тож після запису старі тіла просто не читаються
+BOOK_LIST_RESPONSE_TTL = int(os.getenv("BOOK_LIST_RESPONSE_TTL", "300"))
+
+TOMBSTONE = {"invalidated": True}
+
+Loader = Callable[[], Awaitable[Optional[models.Book]]]
+ListLoader = Callable[[], Awaitable[List[models.Book]]]
+
+BOOK_LIST = TypeAdapter(List[schemas.BookResponse])
+
+
+class BookCache:
+    """Read-through cache for single-book lookups (Redis + optional in-process tier)"""
+
+    def __init__(
+        self,
+        ttl: int = BOOK_CACHE_TTL,
+        local_size: int = BOOK_CACHE_LOCAL_SIZE,
+        local_ttl: int = BOOK_CACHE_LOCAL_TTL,
+        tombstone_ttl: int = BOOK_CACHE_TOMBSTONE_TTL,
+    ):
+        self.ttl = ttl
+        self.local_size = local_size
+        self.local_ttl = min(local_ttl, ttl)
+        self.tombstone_ttl = tombstone_ttl
+        self.redis_enabled = bool(os.getenv("REDIS_URL"))
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def id_key(book_id: int) -> str:
+        return f"books:entity:id:{book_id}"
+
+    @staticmethod
+    def isbn_key(isbn: str) -> str:
+        return f"books:entity:isbn:{isbn}"
+
+    def _local_get(self, key: str) -> Optional[Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _local_set(self, key: str, value: Any, ttl: int, overwrite: bool = True) -> None:
+        if not self.local_size:
+            return
+        if not overwrite and self._local_get(key) is not None:
+            return
+        self._local[key] = (time.monotonic() + min(ttl, self.local_ttl), value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def _get(self, key: str) -> Optional[Any]:
+        value = self._local_get(key)
+        if value is not None:
+            if value != TOMBSTONE:
+                self.local_hits += 1
+            return value
+        if not self.redis_enabled:
+            return None
+        try:
+            value = await cache_get(key)
+        except Exception as e:
+            print(f"⚠️ Book cache get error: {e}")
+            return None
+        if value is not None and value != TOMBSTONE:
+            self._local_set(key, value, self.ttl)
+        return value
+
+    async def _fill(self, key: str, value: Any, overwrite: bool = False) -> None:
+        # NX: не перезаписуємо tombstone, який поставив паралельний запис
+        self._local_set(key, value, self.ttl, overwrite=overwrite)
+        if self.redis_enabled:
+            try:
+                await cache_set(key, value, self.ttl, nx=not overwrite)
+            except Exception as e:
+                print(f"⚠️ Book cache set error: {e}")
+
+    async def _store(self, db_book: models.Book, overwrite_pointer: bool = False) -> dict:
+        payload = schemas.BookResponse.model_validate(db_book).model_dump(mode="json")
+        await self._fill(self.id_key(db_book.id), payload)
+        await self._fill(self.isbn_key(db_book.isbn), db_book.id, overwrite=overwrite_pointer)
+        return payload
+
+    async def peek(self, book_id: int) -> Optional[dict]:
+        """Return the cached payload without touching the database"""
+        payload = await self._get(self.id_key(book_id))
+        return None if payload is None or payload == TOMBSTONE else payload
+
+    async def get_by_id(self, book_id: int, loader: Loader) -> Optional[dict]:
+        payload = await self.peek(book_id)
+        if payload is not None:
+            self.hits += 1
+            return payload
+
+        self.misses += 1
+        db_book = await loader()
+        return None if db_book is None else await self._store(db_book)
+
+    async def get_by_isbn(self, isbn: str, loader: Loader) -> Optional[dict]:
+        # ISBN-ключ зберігає лише id; запис перевіряємо, щоб не віддати книгу, якій змінили ISBN
+        book_id = await self._get(self.isbn_key(isbn))
+        stale_pointer = False
+        if isinstance(book_id, int):
+            payload = await self.peek(book_id)
+            if payload is not None and payload["isbn"] == isbn:
+                self.hits += 1
+                return payload
+            stale_pointer = payload is not None
+
+        self.misses += 1
+        db_book = await loader()
+        return None if db_book is None else await self._store(db_book, overwrite_pointer=stale_pointer)
+
+    async def invalidate(self, book_id: Optional[int] = None, *isbns: Optional[str], tombstone: bool = True) -> None:
+        """
+        Drop entries after a write. With tombstone=True refills are blocked for tombstone_ttl seconds,
+        so a reader that loaded the old row before the write cannot put it back.
+        """
+        keys = [self.isbn_key(isbn) for isbn in set(isbns) if isbn]
+        if book_id is not None:
+            keys.append(self.id_key(book_id))
+        if not keys:
+            return
+
+        for key in keys:
+            if tombstone:
+                self._local_set(key, TOMBSTONE, self.tombstone_ttl)
+            else:
+                self._local.pop(key, None)
+        if not self.redis_enabled:
+            return
+        try:
+            if tombstone:
+                for key in keys:
+                    await cache_set(key, TOMBSTONE, self.tombstone_ttl)
+            else:
+                await cache_delete(*keys)
+        except Exception as e:
+            print(f"⚠️ Book cache invalidate error: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            # Ключі (запис або ISBN-вказівник), знайдені в in-process рівні без походу в Redis
+            "local_hits": self.local_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "redis_enabled": self.redis_enabled,
+            "local_size": len(self._local),
+            "local_capacity": self.local_size,
+        }
+
+
+book_cache = BookCache()
+list_responses = ResponseCache(BOOK_LIST_RESPONSE_TTL)
+
+
+async def list_response(request: Request, etag: str, load: ListLoader, limit: Optional[int] = None) -> Response:
+    """
+    A list page as a raw response: the stored body for this ETag, or load() rendered once and stored.
+    With limit, a full page gets X-Next-Cursor (kept with the stored body).
+    """
+    key = "books:list:" + etag.strip('"')
+    cached = await list_responses.get(key, request)
+    if cached is not None:
+        return cached
+
+    books = await load()
+    headers = {"ETag": etag}
+    if limit is not None and len(books) == limit:
+        headers["X-Next-Cursor"] = pagination.encode_cursor(books[-1].id)
+    body = BOOK_LIST.dump_json(BOOK_LIST.validate_python(books, from_attributes=True))
+    return await list_responses.store(key, request, body, headers)
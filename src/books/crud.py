@@ -1,77 +1,183 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from sqlalchemy import or_
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from . import models, schemas
+from . import models, schemas, search
 
 
 def get_book(db: Session, book_id: int) -> Optional[models.Book]:
     return db.query(models.Book).filter(models.Book.id == book_id).first()
 
 
+def get_book_version(db: Session, book_id: int) -> Optional[int]:
+    # Лише одна колонка - для перевірки If-None-Match без завантаження всього рядка
+    return db.scalar(select(models.Book.version).where(models.Book.id == book_id))
+
+
+def get_catalog_version(db: Session) -> int:
+    # Сума шардів лічильника: тригер збільшує випадковий рядок, тож сума зростає з кожним записом
+    return db.scalar(select(func.sum(models.BookCatalogVersion.version))) or 0
+
+
 def get_books(db: Session, skip: int = 0, limit: int = 100) -> List[models.Book]:
-    return db.query(models.Book).offset(skip).limit(limit).all()
+    return db.query(models.Book).order_by(models.Book.id).offset(skip).limit(limit).all()
 
 
-def get_books_by_author(db: Session, author: str) -> List[models.Book]:
-    return db.query(models.Book).filter(models.Book.author.ilike(f"%{author}%")).all()
+def get_books_after(db: Session, after_id: Optional[int] = None, limit: int = 100) -> List[models.Book]:
+    # Keyset-пагінація: шукаємо по індексу первинного ключа замість OFFSET
+    query = db.query(models.Book)
+    if after_id is not None:
+        query = query.filter(models.Book.id > after_id)
+    return query.order_by(models.Book.id).limit(limit).all()
+
+
+def get_books_by_author(db: Session, author: str, skip: int = 0, limit: int = 100) -> List[models.Book]:
+    return search.search_by_author(db, author, skip=skip, limit=limit)
 
 
 def get_book_by_isbn(db: Session, isbn: str) -> Optional[models.Book]:
     return db.query(models.Book).filter(models.Book.isbn == isbn).first()
 
 
-def create_book(db: Session, book: schemas.BookCreate) -> models.Book:
-    # Перевіряємо, чи книга з таким ISBN вже існує
-    existing_book = get_book_by_isbn(db, book.isbn)
-    if existing_book:
-        raise ValueError(f"Book with ISBN {book.isbn} already exists")
+def get_books_by_ids(db: Session, book_ids: List[int]) -> Dict[int, models.Book]:
+    # Один запит IN (...) замість N окремих get_book
+    if not book_ids:
+        return {}
+    return {book.id: book for book in db.scalars(select(models.Book).where(models.Book.id.in_(book_ids)))}
 
-    # Створюємо книгу без зайвих полів
-    db_book = models.Book(title=book.title, author=book.author, year=book.year, isbn=book.isbn)
-    db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
-    return db_book
 
+def get_books_by_isbns(db: Session, isbns: List[str]) -> Dict[str, models.Book]:
+    if not isbns:
+        return {}
+    return {book.isbn: book for book in db.scalars(select(models.Book).where(models.Book.isbn.in_(isbns)))}
 
-def update_book(db: Session, book_id: int, book_update: schemas.BookUpdate) -> Optional[models.Book]:
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if not db_book:
-        return None
 
-    update_data = book_update.model_dump(exclude_unset=True)
+def _dialect_insert(dialect: str):
+    """INSERT with ON CONFLICT support for the given dialect (None if unsupported)"""
+    return {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
 
-    # Перевіряємо унікальність ISBN при оновленні
-    if "isbn" in update_data and update_data["isbn"] != db_book.isbn:
-        existing_book = get_book_by_isbn(db, update_data["isbn"])
-        if existing_book:
-            raise ValueError(f"Book with ISBN {update_data['isbn']} already exists")
 
-    # Оновлюємо тільки ті поля, які є в моделі
-    for field, value in update_data.items():
-        if hasattr(db_book, field):
-            setattr(db_book, field, value)
+def is_isbn_conflict(error: IntegrityError) -> bool:
+    return "isbn" in str(error.orig).lower()
 
-    db.commit()
-    db.refresh(db_book)
-    return db_book
 
+def book_from_row(row) -> models.Book:
+    # Об'єкт поза сесією: commit не робить його expired, тож не потрібен refresh()
+    return models.Book(**row._mapping)
 
-def delete_book(db: Session, book_id: int) -> bool:
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if not db_book:
-        return False
 
-    db.delete(db_book)
-    db.commit()
-    return True
+def create_book_statement(dialect: str, book: schemas.BookCreate):
+    now = datetime.utcnow()
+    values = {
+        "title": book.title,
+        "author": book.author,
+        "year": book.year,
+        "isbn": book.isbn,
+        "created_at": now,
+        "updated_at": now,
+    }
+    table = models.Book.__table__
+    dialect_insert = _dialect_insert(dialect)
+    if dialect_insert is None:
+        return insert(table).values(**values).returning(*table.c)
+    return dialect_insert(table).values(**values).on_conflict_do_nothing(index_elements=["isbn"]).returning(*table.c)
 
 
-def search_books(db: Session, query: str) -> List[models.Book]:
+def update_book_statement(book_id: int, book_update: schemas.BookUpdate):
+    table = models.Book.__table__
+    # Оновлюємо тільки ті поля, які є в моделі; версію інкрементуємо атомарно в SQL
+    values = {field: value for field, value in book_update.model_dump(exclude_unset=True).items() if field in table.c}
+    if not values:
+        # Порожнє оновлення: рядок як є, без зміни версії книги і каталогу (ETag і кешовані списки лишаються)
+        return select(*table.c).where(table.c.id == book_id)
     return (
-        db.query(models.Book)
-        .filter(or_(models.Book.title.ilike(f"%{query}%"), models.Book.author.ilike(f"%{query}%")))
-        .all()
+        update(table)
+        .where(table.c.id == book_id)
+        .values(**values, version=table.c.version + 1, updated_at=datetime.utcnow())
+        .returning(*table.c)
     )
+
+
+def delete_book_statement(book_id: int):
+    table = models.Book.__table__
+    return delete(table).where(table.c.id == book_id).returning(table.c.id)
+
+
+def create_book(db: Session, book: schemas.BookCreate) -> models.Book:
+    # Один INSERT ... ON CONFLICT (isbn) DO NOTHING RETURNING замість SELECT + INSERT + refresh
+    try:
+        row = db.execute(create_book_statement(db.get_bind().dialect.name, book)).first()
+    except IntegrityError as e:
+        db.rollback()
+        if is_isbn_conflict(e):
+            row = None
+        else:
+            raise
+    if row is None:
+        db.rollback()
+        raise ValueError(f"Book with ISBN {book.isbn} already exists")
+    db.commit()
+    return book_from_row(row)
+
+
+def create_books_bulk(db: Session, books: List[schemas.BookCreate]) -> Dict[str, int]:
+    """Insert books in one statement, skipping ISBNs that already exist; returns {isbn: id} of inserted rows"""
+    if not books:
+        return {}
+
+    table = models.Book.__table__
+    now = datetime.utcnow()
+    values = [
+        {
+            "title": book.title,
+            "author": book.author,
+            "year": book.year,
+            "isbn": book.isbn,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for book in books
+    ]
+
+    dialect_insert = _dialect_insert(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        # INSERT ... ON CONFLICT (isbn) DO NOTHING RETURNING: дублікати відсіює сама база, без окремих SELECT
+        stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=["isbn"])
+    else:
+        existing = set(db.scalars(select(table.c.isbn).where(table.c.isbn.in_([v["isbn"] for v in values]))))
+        values = [v for v in values if v["isbn"] not in existing]
+        stmt = insert(table)
+
+    if not values:
+        return {}
+
+    rows = db.execute(stmt.returning(table.c.id, table.c.isbn), values).all()
+    db.commit()
+    return {isbn: book_id for book_id, isbn in rows}
+
+
+def update_book(db: Session, book_id: int, book_update: schemas.BookUpdate) -> Optional[models.Book]:
+    # UPDATE ... RETURNING; унікальність ISBN перевіряє сам індекс, без гонки між SELECT і UPDATE
+    try:
+        row = db.execute(update_book_statement(book_id, book_update)).first()
+    except IntegrityError as e:
+        db.rollback()
+        if is_isbn_conflict(e):
+            raise ValueError(f"Book with ISBN {book_update.isbn} already exists")
+        raise
+    db.commit()
+    return None if row is None else book_from_row(row)
+
+
+def delete_book(db: Session, book_id: int) -> bool:
+    row = db.execute(delete_book_statement(book_id)).first()
+    db.commit()
+    return row is not None
+
+
+def search_books(db: Session, query: str, skip: int = 0, limit: int = 100) -> List[models.Book]:
+    return search.search_books(db, query, skip=skip, limit=limit)
@@ -2,44 +2,75 @@ import os
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if not DATABASE_URL:
-    raise ValueError("❌ DATABASE_URL not found in environment variables")
+# Роути books на event loop (asyncpg / aiosqlite) замість threadpool + psycopg2
+BOOKS_ASYNC_DB = os.getenv("BOOKS_ASYNC_DB", "false").lower() in ("1", "true", "yes")
 
-print(f"🔗 Connecting to: {DATABASE_URL.split('@')[-1]}")
+# SQL-лог усіх запитів - лише для налагодження
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
 
-try:
-    engine = create_engine(
-        DATABASE_URL,
-        pool_pre_ping=True,
-        echo=True,
-        connect_args={
-            "connect_timeout": 10,
-            "keepalives": 1,
-            "keepalives_idle": 30,
-            "keepalives_interval": 10,
-            "keepalives_count": 5,
-        },
-        pool_recycle=300,
-    )
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+_engine = None
 
-    with engine.connect() as conn:
-        print("✅ Database connection successful!")
 
-except Exception as e:
-    print(f"❌ Database connection failed: {e}")
-    raise
+def _connect_args(url: str) -> dict:
+    # TCP keepalive параметри підтримує лише psycopg2; для локального SQLite їх не передаємо
+    if url.startswith("sqlite"):
+        return {"check_same_thread": False}
+    return {
+        "connect_timeout": 10,
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 5,
+    }
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def get_engine() -> Engine:
+    """Create the engine on first use; no connection is opened until a query needs one"""
+    global _engine
+    if _engine is None:
+        if not DATABASE_URL:
+            raise ValueError("❌ DATABASE_URL not found in environment variables")
+        print(f"🔗 Database: {DATABASE_URL.split('@')[-1]}")
+        _engine = create_engine(
+            DATABASE_URL,
+            pool_pre_ping=True,
+            echo=DB_ECHO,
+            connect_args=_connect_args(DATABASE_URL),
+            pool_recycle=300,
+        )
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def check_connection() -> None:
+    """Open one connection to fail fast in the readiness phase"""
+    try:
+        with get_engine().connect():
+            print("✅ Database connection successful!")
+    except Exception as e:
+        print(f"❌ Database connection failed: {e}")
+        raise
+
+
+def __getattr__(name: str):
+    # Сумісність зі старим `from books.database import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
@@ -49,3 +80,49 @@ def get_db():
         raise
     finally:
         db.close()
+
+
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+_async_engine = None
+
+
+def _async_engine_args(url: str):
+    """Translate the sync DATABASE_URL into an async driver URL and its connect_args"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite"), {}
+
+    if backend == "postgresql":
+        # asyncpg не знає параметра sslmode з URL psycopg2, передаємо його як ssl
+        sslmode = url.query.get("sslmode")
+        connect_args = {"timeout": 10}
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        return url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode"]), connect_args
+
+    return url, {}
+
+
+def get_async_engine() -> AsyncEngine:
+    """Create the async engine on first use"""
+    global _async_engine
+    if _async_engine is None:
+        url, connect_args = _async_engine_args(DATABASE_URL)
+        _async_engine = create_async_engine(
+            url, pool_pre_ping=True, echo=DB_ECHO, pool_recycle=300, connect_args=connect_args
+        )
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            print(f"Database error: {e}")
+            await db.rollback()
+            raise
@@ -0,0 +1,63 @@
+import os
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# Схему books змінюють лише міграції (migrations/, alembic upgrade head); тут - перевірка і запуск для тестів
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+
+CATALOG_VERSION_TABLE = "books_catalog_version"
+
+# Без цих тригерів версія каталогу не змінюється, і ETag списків та збережені тіла сторінок застаріли б назавжди
+CATALOG_VERSION_TRIGGERS = {
+    "postgresql": [f"{CATALOG_VERSION_TABLE}_bump"],
+    "sqlite": [f"{CATALOG_VERSION_TABLE}_{event}" for event in ("insert", "update", "delete")],
+}
+
+TRIGGERS_SQL = {
+    "postgresql": "SELECT tgname FROM pg_trigger WHERE tgrelid = 'books'::regclass AND NOT tgisinternal",
+    "sqlite": "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'books'",
+}
+
+
+class SchemaNotMigrated(RuntimeError):
+    pass
+
+
+def missing_schema(engine: Engine) -> List[str]:
+    """Parts of the migrated books schema that the database lacks (empty when it is up to date)"""
+    inspector = inspect(engine)
+    if not inspector.has_table("books"):
+        return ["books"]
+    columns = {column["name"] for column in inspector.get_columns("books")}
+    missing = [f"books.{name}" for name in ("updated_at", "version") if name not in columns]
+    if not inspector.has_table(CATALOG_VERSION_TABLE):
+        missing.append(CATALOG_VERSION_TABLE)
+
+    dialect = engine.dialect.name
+    if dialect in TRIGGERS_SQL:
+        with engine.connect() as conn:
+            triggers = {row[0] for row in conn.execute(text(TRIGGERS_SQL[dialect]))}
+        missing += [f"trigger {name}" for name in CATALOG_VERSION_TRIGGERS[dialect] if name not in triggers]
+    return missing
+
+
+def check_schema(engine: Engine) -> None:
+    """Fail startup when migrations are not applied instead of serving queries or list ETags that cannot work"""
+    missing = missing_schema(engine)
+    if missing:
+        raise SchemaNotMigrated(
+            f"Books schema is not migrated (missing: {', '.join(missing)}); run `alembic upgrade head`"
+        )
+
+
+def migrate(engine: Engine) -> None:
+    """Apply migrations/ up to head on engine (tests, benchmarks, local SQLite databases)"""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
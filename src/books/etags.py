@@ -0,0 +1,26 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+
+def book_etag(book_id: int, version: Optional[int]) -> str:
+    return f'"book-{book_id}-v{version or 1}"'
+
+
+def collection_etag(catalog_version: int, *params) -> str:
+    """ETag of a list response: catalog version + the parameters that select the page"""
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+    return f'"books-{catalog_version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match використовує слабке порівняння, тому префікс W/ ігноруємо
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Iterable, Iterator, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from . import models
+
+EXPORT_COLUMNS = ("id", "title", "author", "year", "isbn", "created_at")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Скільки рядків тягнемо з серверного курсора за раз
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_statement():
+    table = models.Book.__table__
+    return select(*[table.c[name] for name in EXPORT_COLUMNS]).order_by(table.c.id)
+
+
+def _encode_ndjson(rows: Sequence[Row]) -> bytes:
+    lines = []
+    for row in rows:
+        record = row._asdict()
+        if record["created_at"] is not None:
+            record["created_at"] = record["created_at"].isoformat()
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _encode_csv(rows: Sequence[Row], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _encode(fmt: str, rows: Sequence[Row]) -> bytes:
+    return _encode_ndjson(rows) if fmt == "ndjson" else _encode_csv(rows)
+
+
+def iter_export(engine: Engine, fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Stream the catalogue as NDJSON/CSV chunks using a server-side cursor (no ORM objects)"""
+    if fmt == "csv":
+        yield _encode_csv([], header=True)
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(_export_statement())
+        for rows in result.partitions():
+            yield _encode(fmt, rows)
+
+
+async def iter_export_async(engine: AsyncEngine, fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Async variant of iter_export for the event-loop router"""
+    if fmt == "csv":
+        yield _encode_csv([], header=True)
+
+    async with engine.connect() as conn:
+        result = await conn.stream(_export_statement(), execution_options={"yield_per": batch_size})
+        async for rows in result.partitions():
+            yield _encode(fmt, rows)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def gzip_chunks_async(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def export_headers(fmt: str, gzip: bool) -> dict:
+    headers = {"Content-Disposition": f'attachment; filename="books.{fmt}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return headers
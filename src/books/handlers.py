@@ -0,0 +1,131 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from . import batch, bulk, etags, export, pagination
+from .cache import ListLoader, book_cache, list_response, list_responses
+
+# Спільна логіка ендпоінтів routes.py і async_routes.py; роутери передають лише виклики БД
+Call = Callable[[], Awaitable[Any]]
+
+
+async def create_book(create: Call):
+    try:
+        db_book = await create()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Нова книга: старих версій немає, достатньо прибрати можливий ISBN-вказівник
+    await book_cache.invalidate(None, db_book.isbn, tombstone=False)
+    return db_book
+
+
+async def bulk_import(request: Request, importer: bulk.BulkImporter, flush: Call):
+    try:
+        async for row, error in bulk.read_rows(request):
+            importer.add(row, error)
+            if importer.is_full:
+                await flush()
+        await flush()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return importer.summary()
+
+
+def cursor_position(cursor: Optional[str]) -> Optional[int]:
+    try:
+        return pagination.decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def book_list(
+    request: Request, catalog_version: Call, load: ListLoader, *params, limit: Optional[int] = None
+) -> Response:
+    """List response for a page selected by params; 304 while the catalog version has not changed"""
+    # Версія каталогу - один маленький запит; якщо сторінка не змінилась, рядки не читаємо
+    etag = etags.collection_etag(await catalog_version(), *params)
+    if etags.etag_matches(request.headers.get("if-none-match"), etag):
+        return etags.not_modified(etag)
+    # З limit повна сторінка отримує курсор на наступну
+    return await list_response(request, etag, load, limit=limit)
+
+
+def export_response(request: Request, format: str, chunks, gzip_chunks) -> StreamingResponse:
+    gzip = export.accepts_gzip(request.headers.get("accept-encoding", ""))
+    if gzip:
+        chunks = gzip_chunks(chunks)
+    return StreamingResponse(chunks, media_type=export.MEDIA_TYPES[format], headers=export.export_headers(format, gzip))
+
+
+def batch_keys(ids: List[str], isbns: List[str]) -> Tuple[List[int], List[str]]:
+    """Parsed ids or isbns of a batch request (exactly one of them is non-empty)"""
+    try:
+        book_ids = batch.parse_keys(ids, cast=int)
+        isbn_keys = batch.parse_keys(isbns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if bool(book_ids) == bool(isbn_keys):
+        raise HTTPException(status_code=400, detail="Pass either ids or isbns")
+    return book_ids, isbn_keys
+
+
+def in_order(found: Dict[Hashable, Any], keys: List[Hashable]) -> list:
+    return [found.get(key) for key in keys]
+
+
+def cache_stats(id_loader: batch.BatchLoader, isbn_loader: batch.BatchLoader) -> dict:
+    return {
+        **book_cache.stats(),
+        "loader": {"id": id_loader.stats(), "isbn": isbn_loader.stats()},
+        "responses": list_responses.stats(),
+    }
+
+
+async def read_book(book_id: int, request: Request, response: Response, book_version: Call, load: Call):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Версію беремо з кешу або однією колонкою з БД, без завантаження і серіалізації книги
+        cached = await book_cache.peek(book_id)
+        version = cached.get("version") if cached is not None else await book_version()
+        if version is not None and etags.etag_matches(if_none_match, etags.book_etag(book_id, version)):
+            return etags.not_modified(etags.book_etag(book_id, version))
+
+    db_book = await book_cache.get_by_id(book_id, load)
+    if db_book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    response.headers["ETag"] = etags.book_etag(book_id, db_book.get("version"))
+    return db_book
+
+
+async def read_book_by_isbn(isbn: str, request: Request, response: Response, load: Call):
+    db_book = await book_cache.get_by_isbn(isbn, load)
+    if db_book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    etag = etags.book_etag(db_book["id"], db_book.get("version"))
+    if etags.etag_matches(request.headers.get("if-none-match"), etag):
+        return etags.not_modified(etag)
+    response.headers["ETag"] = etag
+    return db_book
+
+
+async def update_book(book_id: int, response: Response, update: Call):
+    # Старий ISBN беремо з кешу, щоб інвалідувати і його ключ
+    cached = await book_cache.peek(book_id)
+    try:
+        db_book = await update()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if db_book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    await book_cache.invalidate(book_id, cached and cached["isbn"], db_book.isbn)
+    response.headers["ETag"] = etags.book_etag(book_id, db_book.version)
+    return db_book
+
+
+async def delete_book(book_id: int, delete: Call):
+    cached = await book_cache.peek(book_id)
+    if not await delete():
+        raise HTTPException(status_code=404, detail="Book not found")
+    await book_cache.invalidate(book_id, cached and cached["isbn"])
+    return {"message": "Book deleted successfully"}
@@ -1,35 +1,55 @@
+from .async_routes import router as async_router
 from .crud import (
     create_book,
+    create_books_bulk,
     delete_book,
     get_book,
     get_book_by_isbn,
+    get_book_version,
     get_books,
+    get_books_after,
     get_books_by_author,
+    get_books_by_ids,
+    get_books_by_isbns,
+    get_catalog_version,
     search_books,
     update_book,
 )
-from .database import SessionLocal, engine, get_db
-from .models import Base, Book
+from .database import AsyncSessionLocal, SessionLocal, get_async_db, get_async_engine, get_db, get_engine
+from .models import Base, Book, BookCatalogVersion
 from .routes import router
-from .schemas import BookBase, BookCreate, BookResponse, BookUpdate
+from .schemas import BookBase, BookCreate, BookResponse, BookUpdate, BulkImportResponse, BulkRowResult
 
 __all__ = [
     "Book",
+    "BookCatalogVersion",
     "Base",
     "BookBase",
     "BookCreate",
     "BookUpdate",
     "BookResponse",
+    "BulkImportResponse",
+    "BulkRowResult",
     "get_book",
     "get_books",
+    "get_books_after",
     "get_books_by_author",
+    "get_books_by_ids",
+    "get_books_by_isbns",
     "get_book_by_isbn",
+    "get_book_version",
+    "get_catalog_version",
     "create_book",
+    "create_books_bulk",
     "update_book",
     "delete_book",
     "search_books",
     "get_db",
-    "engine",
+    "get_engine",
     "SessionLocal",
+    "get_async_db",
+    "get_async_engine",
+    "AsyncSessionLocal",
     "router",
+    "async_router",
 ]
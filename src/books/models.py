@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -15,6 +15,21 @@ class Book(Base):
     year = Column(Integer)
     isbn = Column(String(20), unique=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Збільшується при кожному оновленні, з нього будується ETag книги
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     def __repr__(self):
         return f"<Book(id={self.id}, title='{self.title}', author='{self.author}')>"
+
+
+class BookCatalogVersion(Base):
+    """
+    Catalog version for list ETags: a trigger on every write to books bumps one random row, the version
+    is the sum of all rows (sharded, so concurrent writers do not queue on a single row lock)
+    """
+
+    __tablename__ = "books_catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
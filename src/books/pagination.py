@@ -0,0 +1,24 @@
+import base64
+import json
+from typing import Optional
+
+
+def encode_cursor(book_id: int) -> str:
+    """Build an opaque cursor pointing right after the given book id"""
+    raw = json.dumps({"id": book_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """Return the last seen book id from a cursor (None for the first page)"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        book_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+    # bool - підклас int: {"id": true} не повинен читатись як id=1
+    if not isinstance(book_id, int) or isinstance(book_id, bool):
+        raise ValueError("Invalid pagination cursor")
+    return book_id
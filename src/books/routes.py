@@ -1,75 +1,135 @@
-from typing import List
+from functools import partial
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 # Відносні імпорти всередині папки books
-from . import crud, schemas
+from . import batch, bulk, crud, export, handlers, schemas
 from .database import get_db
 
 router = APIRouter(prefix="/books", tags=["books"])
 
 
 @router.post("/", response_model=schemas.BookResponse, status_code=status.HTTP_201_CREATED)
-def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
-    try:
-        return crud.create_book(db=db, book=book)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
+    return await handlers.create_book(partial(run_in_threadpool, crud.create_book, db=db, book=book))
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResponse)
+async def bulk_create_books(
+    request: Request,
+    chunk_size: int = Query(1000, ge=1, le=10000, description="Rows per INSERT/commit"),
+    db: Session = Depends(get_db),
+):
+    """
+    Import books from a JSON array or an NDJSON stream (Content-Type: application/x-ndjson)
+    """
+    importer = bulk.BulkImporter(db, chunk_size=chunk_size)
+    return await handlers.bulk_import(request, importer, partial(run_in_threadpool, importer.flush))
 
 
 @router.get("/", response_model=List[schemas.BookResponse])
-def read_books(
+async def read_books(
+    request: Request,
     skip: int = Query(0, ge=0, description="Skip records"),
     limit: int = Query(100, ge=1, le=1000, description="Limit records"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header (skip is ignored)"),
+    db: Session = Depends(get_db),
+):
+    if cursor is not None:
+        after_id = handlers.cursor_position(cursor)
+        load = partial(run_in_threadpool, crud.get_books_after, db, after_id=after_id, limit=limit)
+    else:
+        load = partial(run_in_threadpool, crud.get_books, db, skip=skip, limit=limit)
+
+    version = partial(run_in_threadpool, crud.get_catalog_version, db)
+    return await handlers.book_list(request, version, load, "list", skip, limit, cursor, limit=limit)
+
+
+@router.get("/export")
+def export_books(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Export format"),
     db: Session = Depends(get_db),
 ):
-    books = crud.get_books(db, skip=skip, limit=limit)
-    return books
+    """
+    Stream the whole catalogue as NDJSON or CSV (gzip when the client accepts it)
+    """
+    # Сесія із Depends закривається до відправки тіла, тому генератор відкриває власне з'єднання
+    return handlers.export_response(request, format, export.iter_export(db.get_bind(), format), export.gzip_chunks)
+
+
+@router.get("/batch", response_model=List[Optional[schemas.BookResponse]])
+def read_books_batch(
+    ids: List[str] = Query([], description="Book ids, repeated or comma-separated"),
+    isbns: List[str] = Query([], description="ISBNs, repeated or comma-separated"),
+    db: Session = Depends(get_db),
+):
+    """
+    Resolve many books with one IN (...) query; results follow the requested order, null for missing ones
+    """
+    book_ids, isbn_keys = handlers.batch_keys(ids, isbns)
+    if book_ids:
+        return handlers.in_order(crud.get_books_by_ids(db, book_ids), book_ids)
+    return handlers.in_order(crud.get_books_by_isbns(db, isbn_keys), isbn_keys)
+
+
+@router.get("/cache/stats")
+async def book_cache_stats():
+    """Hit/miss counters of the single-book cache and lookup coalescing stats"""
+    return handlers.cache_stats(batch.id_loader, batch.isbn_loader)
 
 
 @router.get("/{book_id}", response_model=schemas.BookResponse)
-def read_book(book_id: int, db: Session = Depends(get_db)):
-    db_book = crud.get_book(db, book_id=book_id)
-    if db_book is None:
-        raise HTTPException(status_code=404, detail="Book not found")
-    return db_book
+async def read_book(book_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    return await handlers.read_book(
+        book_id,
+        request,
+        response,
+        partial(run_in_threadpool, crud.get_book_version, db, book_id),
+        lambda: batch.id_loader.load(db, book_id),
+    )
 
 
 @router.get("/author/{author}", response_model=List[schemas.BookResponse])
-def read_books_by_author(author: str, db: Session = Depends(get_db)):
-    books = crud.get_books_by_author(db, author=author)
-    return books
+async def read_books_by_author(
+    author: str,
+    request: Request,
+    skip: int = Query(0, ge=0, description="Skip records"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit records"),
+    db: Session = Depends(get_db),
+):
+    version = partial(run_in_threadpool, crud.get_catalog_version, db)
+    load = partial(run_in_threadpool, crud.get_books_by_author, db, author=author, skip=skip, limit=limit)
+    return await handlers.book_list(request, version, load, "author", author, skip, limit)
 
 
 @router.get("/isbn/{isbn}", response_model=schemas.BookResponse)
-def read_book_by_isbn(isbn: str, db: Session = Depends(get_db)):
-    db_book = crud.get_book_by_isbn(db, isbn=isbn)
-    if db_book is None:
-        raise HTTPException(status_code=404, detail="Book not found")
-    return db_book
+async def read_book_by_isbn(isbn: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    return await handlers.read_book_by_isbn(isbn, request, response, lambda: batch.isbn_loader.load(db, isbn))
 
 
 @router.put("/{book_id}", response_model=schemas.BookResponse)
-def update_book(book_id: int, book_update: schemas.BookUpdate, db: Session = Depends(get_db)):
-    try:
-        db_book = crud.update_book(db, book_id=book_id, book_update=book_update)
-        if db_book is None:
-            raise HTTPException(status_code=404, detail="Book not found")
-        return db_book
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def update_book(book_id: int, book_update: schemas.BookUpdate, response: Response, db: Session = Depends(get_db)):
+    update = partial(run_in_threadpool, crud.update_book, db, book_id=book_id, book_update=book_update)
+    return await handlers.update_book(book_id, response, update)
 
 
 @router.delete("/{book_id}")
-def delete_book(book_id: int, db: Session = Depends(get_db)):
-    success = crud.delete_book(db, book_id=book_id)
-    if not success:
-        raise HTTPException(status_code=404, detail="Book not found")
-    return {"message": "Book deleted successfully"}
+async def delete_book(book_id: int, db: Session = Depends(get_db)):
+    return await handlers.delete_book(book_id, partial(run_in_threadpool, crud.delete_book, db, book_id=book_id))
 
 
 @router.get("/search/{query}", response_model=List[schemas.BookResponse])
-def search_books(query: str, db: Session = Depends(get_db)):
-    books = crud.search_books(db, query=query)
-    return books
+async def search_books(
+    query: str,
+    request: Request,
+    skip: int = Query(0, ge=0, description="Skip records"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit records"),
+    db: Session = Depends(get_db),
+):
+    version = partial(run_in_threadpool, crud.get_catalog_version, db)
+    load = partial(run_in_threadpool, crud.search_books, db, query=query, skip=skip, limit=limit)
+    return await handlers.book_list(request, version, load, "search", query, skip, limit)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -27,3 +27,24 @@ class BookResponse(BookBase):
 
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    version: int = 1
+
+
+class BulkRowResult(BaseModel):
+    index: int
+    status: Literal["created", "duplicate", "invalid", "error"]
+    isbn: Optional[str] = None
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkImportResponse(BaseModel):
+    total: int
+    created: int
+    duplicates: int
+    invalid: int
+    errors: int
+    elapsed_ms: float
+    rows_per_second: float
+    results: List[BulkRowResult]
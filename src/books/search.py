@@ -0,0 +1,93 @@
+from typing import List
+
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Вираз має збігатися з індексом ix_books_search_tsv (див. migrations/versions/0001), інакше PostgreSQL його не використає
+SEARCH_VECTOR_SQL = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, ''))"
+FTS_TABLE = "books_fts"
+
+# Триграмний токенізатор FTS5 не індексує запити коротші за 3 символи
+MIN_FTS_QUERY_LENGTH = 3
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _has_fts_table(db: Session) -> bool:
+    return (
+        db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        is not None
+    )
+
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _ilike_search(db: Session, columns, query: str, skip: int, limit: int) -> List[models.Book]:
+    pattern = f"%{query}%"
+    stmt = (
+        select(models.Book)
+        .where(or_(*[column.ilike(pattern) for column in columns]))
+        .order_by(models.Book.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(db.scalars(stmt))
+
+
+def _fts_search(db: Session, match: str, skip: int, limit: int) -> List[models.Book]:
+    fts = table(FTS_TABLE, column("rowid"))
+    fts_ref = literal_column(FTS_TABLE)
+    stmt = (
+        select(models.Book)
+        .join(fts, fts.c.rowid == models.Book.id)
+        .where(fts_ref.op("MATCH")(match))
+        .order_by(func.bm25(fts_ref), models.Book.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(db.scalars(stmt))
+
+
+def _use_fts(db: Session, query: str) -> bool:
+    return len(query) >= MIN_FTS_QUERY_LENGTH and _dialect(db) == "sqlite" and _has_fts_table(db)
+
+
+def search_books(db: Session, query: str, skip: int = 0, limit: int = 100) -> List[models.Book]:
+    """Ranked search by title and author"""
+    dialect = _dialect(db)
+
+    if dialect == "postgresql":
+        # GIN-індекс по tsvector для слів + pg_trgm-індекси для підрядків (ILIKE '%q%')
+        vector = literal_column(SEARCH_VECTOR_SQL)
+        tsquery = func.plainto_tsquery(literal_column("'simple'"), query)
+        pattern = f"%{query}%"
+        stmt = (
+            select(models.Book)
+            .where(or_(vector.op("@@")(tsquery), models.Book.title.ilike(pattern), models.Book.author.ilike(pattern)))
+            .order_by(func.ts_rank(vector, tsquery).desc(), models.Book.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return list(db.scalars(stmt))
+
+    if _use_fts(db, query):
+        return _fts_search(db, _fts_phrase(query), skip, limit)
+
+    return _ilike_search(db, [models.Book.title, models.Book.author], query, skip, limit)
+
+
+def search_by_author(db: Session, author: str, skip: int = 0, limit: int = 100) -> List[models.Book]:
+    """Search by author substring"""
+    if _use_fts(db, author):
+        return _fts_search(db, f"author : {_fts_phrase(author)}", skip, limit)
+
+    # На PostgreSQL ILIKE '%q%' обслуговує триграмний індекс ix_books_author_trgm
+    return _ilike_search(db, [models.Book.author], author, skip, limit)
@@ -1,36 +1,453 @@
+import asyncio
 import json
 import os
-from typing import Any, Optional
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
 
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from .codec import codec
+from .disk_cache import DiskCache
+from .local_cache import LocalCache
 from .redis_client import get_redis
+from .resilience import CircuitBreaker, CircuitOpenError
 
 # Час життя кешу з .env або за замовчуванням
 REDIS_TTL = int(os.getenv("REDIS_TTL", "60"))
 
+# L1 - in-process рівень перед Redis (0 записів - вимкнено); TTL запису не більший за TTL у Redis
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1000"))
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(16 * 1024 * 1024)))
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "5"))
+# Канал pub/sub, через який воркери скидають L1-копії змінених ключів
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+
+# Дисковий рівень (SQLite, спільний для воркерів одного хоста; порожній шлях - вимкнено).
+# З REDIS_URL пишеться разом із Redis і читається, коли Redis недоступний; без REDIS_URL - єдиний спільний рівень
+CACHE_DISK_PATH = os.getenv("CACHE_DISK_PATH", "")
+CACHE_DISK_MAX_BYTES = int(os.getenv("CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_DISK_COMPACT_INTERVAL = float(os.getenv("CACHE_DISK_COMPACT_INTERVAL", "60"))
+# Після стількох помилок з'єднання поспіль Redis пропускаємо на CACHE_REDIS_RETRY_AFTER секунд
+CACHE_REDIS_FAILURE_THRESHOLD = int(os.getenv("CACHE_REDIS_FAILURE_THRESHOLD", "3"))
+CACHE_REDIS_RETRY_AFTER = float(os.getenv("CACHE_REDIS_RETRY_AFTER", "10"))
+
+l1 = LocalCache(CACHE_L1_MAX_ENTRIES, CACHE_L1_MAX_BYTES, CACHE_L1_TTL)
+disk = DiskCache(CACHE_DISK_PATH, CACHE_DISK_MAX_BYTES) if CACHE_DISK_PATH else None
+# Недоступний Redis не повинен коштувати таймауту з'єднання на кожен виклик кешу
+redis_breaker = CircuitBreaker(
+    "redis",
+    CACHE_REDIS_FAILURE_THRESHOLD,
+    CACHE_REDIS_RETRY_AFTER,
+    is_failure=lambda e: isinstance(e, (RedisConnectionError, RedisTimeoutError, OSError)),
+)
+_stats = {"l1_hits": 0, "l2_hits": 0, "disk_hits": 0, "misses": 0}
+# Ідентифікатор процесу: власні повідомлення про інвалідацію пропускаємо
+_origin = uuid.uuid4().hex
+_listener: Optional[asyncio.Task] = None
+_compactor: Optional[asyncio.Task] = None
+# Усі звернення до SQLite - в одному потоці: event loop не чекає на busy_timeout, записи йдуть у порядку викликів
+_disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+_disk_writes: Set[asyncio.Future] = set()
+
+
+def _invalidation_message(keys) -> str:
+    return json.dumps({"origin": _origin, "keys": list(keys)})
+
+
+def _redis_enabled() -> bool:
+    # Без дискового рівня - як і раніше, Redis пробуємо завжди
+    return disk is None or bool(os.getenv("REDIS_URL"))
+
+
+def _log_error(operation: str, e: Exception) -> None:
+    # Поки запобіжник відкритий, про кожен пропущений виклик не пишемо
+    if not isinstance(e, CircuitOpenError):
+        print(f"❌ Cache {operation} error: {e}")
+
+
+def _on_disk(fn: Callable[[], Any]) -> Awaitable[Any]:
+    return asyncio.get_running_loop().run_in_executor(_disk_executor, fn)
 
-async def cache_get(key: str) -> Optional[Any]:
-    """Get data from cache by key"""
+
+async def _disk_get_many(keys, raw: bool = False) -> Dict[str, Any]:
+    if disk is None:
+        return {}
+    try:
+        rows = await _on_disk(lambda: disk.get_many(keys))
+    except Exception as e:
+        print(f"❌ Disk cache get error: {e}")
+        return {}
+    found = {}
+    for key in keys:
+        if key in rows:
+            cached_data, ttl = rows[key]
+            found[key] = cached_data if raw else codec.decode(cached_data)
+            _stats["disk_hits"] += 1
+            l1.set(key, found[key], len(cached_data), ttl=ttl)
+        else:
+            _stats["misses"] += 1
+    return found
+
+
+async def _disk_set_many(payloads: Dict[str, bytes], ttl: int, nx: bool = False) -> bool:
+    if disk is None:
+        return False
+    try:
+        if nx:
+            return await _on_disk(lambda: all([disk.add(key, payload, ttl) for key, payload in payloads.items()]))
+        await _on_disk(lambda: disk.set_many(payloads, ttl))
+        return True
+    except Exception as e:
+        print(f"❌ Disk cache set error: {e}")
+        return False
+
+
+def _disk_write_behind(payloads: Dict[str, bytes], ttl: int) -> None:
+    # Redis уже зберіг значення - копію на диск пишемо у фоні, не чекаючи SQLite
+    if disk is None:
+        return
+    write = _on_disk(lambda: disk.set_many(payloads, ttl))
+    _disk_writes.add(write)
+    write.add_done_callback(_disk_write_done)
+
+
+def _disk_write_done(write: asyncio.Future) -> None:
+    _disk_writes.discard(write)
+    if not write.cancelled() and write.exception() is not None:
+        print(f"❌ Disk cache set error: {write.exception()}")
+
+
+async def flush_disk_writes() -> None:
+    """Wait for the background copies of Redis writes to reach the disk tier"""
+    if _disk_writes:
+        await asyncio.gather(*_disk_writes, return_exceptions=True)
+
+
+async def _redis_get(key: str):
     redis = get_redis()
+    if l1.enabled:
+        # GET і PTTL за один round trip: L1-копія не переживе запис у Redis
+        async with redis.pipeline(transaction=False) as pipe:
+            return await pipe.get(key).pttl(key).execute()
+    return await redis.get(key), -1
+
+
+async def cache_get(key: str, raw: bool = False) -> Optional[Any]:
+    """
+    Get data from cache by key (L1, then Redis; the disk tier if Redis is unavailable).
+    raw=True returns the stored bytes as they are - for keys written with cache_set(..., raw=True).
+    """
+    value = l1.get(key)
+    if value is not None:
+        _stats["l1_hits"] += 1
+        return value
+
+    if not _redis_enabled():
+        return (await _disk_get_many([key], raw)).get(key)
     try:
-        cached_data = await redis.get(key)
+        cached_data, pttl = await redis_breaker.call(lambda: _redis_get(key))
         if cached_data:
-            return json.loads(cached_data)
+            value = cached_data if raw else codec.decode(cached_data)
+            _stats["l2_hits"] += 1
+            l1.set(key, value, len(cached_data), ttl=pttl / 1000 if pttl > 0 else None)
+            return value
+        _stats["misses"] += 1
         return None
     except Exception as e:
-        print(f"❌ Cache get error: {e}")
-        return None
-    finally:
-        await redis.close()
+        _log_error("get", e)
+        return (await _disk_get_many([key], raw)).get(key)
 
 
-async def cache_set(key: str, data: Any, ttl: int = REDIS_TTL) -> bool:
-    """Set data to cache with TTL"""
+async def _redis_set(key: str, payload: bytes, ttl: int, nx: bool) -> bool:
     redis = get_redis()
+    if nx:
+        # NX пише лише відсутній ключ - актуальних L1-копій в інших воркерів бути не може
+        return bool(await redis.set(key, payload, ex=ttl, nx=True))
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(key, payload, ex=ttl)
+        pipe.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message([key]))
+        return bool((await pipe.execute())[0])
+
+
+async def cache_set(key: str, data: Any, ttl: int = REDIS_TTL, nx: bool = False, raw: bool = False) -> bool:
+    """Set data to cache with TTL (nx=True writes only if the key does not exist; raw=True stores bytes as is)"""
+    payload = data if raw else codec.encode(data)
+    stored = None
+    if _redis_enabled():
+        try:
+            stored = await redis_breaker.call(lambda: _redis_set(key, payload, ttl, nx))
+        except Exception as e:
+            _log_error("set", e)
+    if stored is None:
+        # Redis недоступний - вирішує диск
+        stored = await _disk_set_many({key: payload}, ttl, nx=nx)
+    elif stored:
+        # Redis записав - копія на диск на випадок його падіння
+        _disk_write_behind({key: payload}, ttl)
+    if stored:
+        l1.set(key, data, len(payload), ttl=ttl)
+    else:
+        l1.discard(key)
+    return bool(stored)
+
+
+async def _redis_delete(keys) -> None:
+    async with get_redis().pipeline(transaction=False) as pipe:
+        pipe.delete(*keys)
+        pipe.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message(keys))
+        await pipe.execute()
+
+
+async def cache_delete(*keys: str) -> bool:
+    """Delete keys from cache"""
+    l1.discard(*keys)
+    deleted = True
+    if disk is not None:
+        try:
+            # Той самий потік, що й фонові записи: видалення не обжене копію, яка ще в черзі
+            await _on_disk(lambda: disk.delete(*keys))
+        except Exception as e:
+            print(f"❌ Disk cache delete error: {e}")
+            deleted = False
+    if _redis_enabled():
+        try:
+            await redis_breaker.call(lambda: _redis_delete(keys))
+        except Exception as e:
+            _log_error("delete", e)
+            return False
+    return deleted
+
+
+async def _redis_get_many(missing):
+    async with get_redis().pipeline(transaction=False) as pipe:
+        pipe.mget(missing)
+        for key in missing:
+            pipe.pttl(key)
+        return await pipe.execute()
+
+
+async def cache_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """Get many keys in one round trip (L1, then MGET); returns only the keys that were found"""
+    found, missing = {}, []
+    for key in dict.fromkeys(keys):
+        value = l1.get(key)
+        if value is not None:
+            _stats["l1_hits"] += 1
+            found[key] = value
+        else:
+            missing.append(key)
+    if not missing:
+        return found
+
+    if not _redis_enabled():
+        return {**found, **(await _disk_get_many(missing))}
+    try:
+        cached, *pttls = await redis_breaker.call(lambda: _redis_get_many(missing))
+    except Exception as e:
+        _log_error("get_many", e)
+        return {**found, **(await _disk_get_many(missing))}
+
+    for key, cached_data, pttl in zip(missing, cached, pttls):
+        if cached_data:
+            value = codec.decode(cached_data)
+            _stats["l2_hits"] += 1
+            l1.set(key, value, len(cached_data), ttl=pttl / 1000 if pttl > 0 else None)
+            found[key] = value
+        else:
+            _stats["misses"] += 1
+    return found
+
+
+async def _redis_set_many(payloads: Dict[str, bytes], ttl: int) -> None:
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for key, payload in payloads.items():
+            pipe.set(key, payload, ex=ttl)
+        pipe.publish(CACHE_INVALIDATION_CHANNEL, _invalidation_message(payloads))
+        await pipe.execute()
+
+
+async def cache_set_many(items: Dict[str, Any], ttl: int = REDIS_TTL) -> bool:
+    """Set many keys with the same TTL in one pipelined round trip"""
+    if not items:
+        return True
+    payloads = {key: codec.encode(data) for key, data in items.items()}
+    stored = False
+    if _redis_enabled():
+        try:
+            await redis_breaker.call(lambda: _redis_set_many(payloads, ttl))
+            stored = True
+        except Exception as e:
+            _log_error("set_many", e)
+    if stored:
+        _disk_write_behind(payloads, ttl)
+    else:
+        stored = await _disk_set_many(payloads, ttl)
+    if not stored:
+        l1.discard(*payloads)
+        return False
+    for key, payload in payloads.items():
+        l1.set(key, items[key], len(payload), ttl=ttl)
+    return True
+
+
+async def cache_stats() -> dict:
+    """Hit ratios of the L1 (in-process), L2 (Redis) and disk tiers"""
+    lookups = _stats["l1_hits"] + _stats["l2_hits"] + _stats["disk_hits"] + _stats["misses"]
+    l2_lookups = _stats["l2_hits"] + _stats["misses"]
+    stats = {
+        **_stats,
+        "l1_hit_ratio": round(_stats["l1_hits"] / lookups, 4) if lookups else 0.0,
+        # Частка звернень до Redis, які знайшли ключ
+        "l2_hit_ratio": round(_stats["l2_hits"] / l2_lookups, 4) if l2_lookups else 0.0,
+        "hit_ratio": round((lookups - _stats["misses"]) / lookups, 4) if lookups else 0.0,
+        "l1_entries": len(l1),
+        "l1_bytes": l1.bytes,
+        "l1_evictions": l1.evictions,
+        "l1_max_entries": l1.max_entries,
+        "l1_max_bytes": l1.max_bytes,
+        "redis": redis_breaker.stats() if _redis_enabled() else "disabled",
+    }
+    if disk is not None:
+        try:
+            # Як і решта звернень до SQLite - у потоці дискового рівня
+            stats["disk"] = await _on_disk(disk.stats)
+        except Exception as e:
+            stats["disk"] = {"error": str(e)}
+    return stats
+
+
+async def _listen_invalidations() -> None:
+    while True:
+        redis = get_redis()
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            # Поки не були підписані, могли пропустити повідомлення - L1 починаємо з нуля
+            l1.clear()
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = json.loads(message["data"])
+                if data.get("origin") != _origin:
+                    l1.discard(*data.get("keys", []))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Cache invalidation listener error: {e}")
+            l1.clear()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
+
+
+async def start_invalidation_listener() -> None:
+    """Subscribe to cross-worker L1 invalidations (called from the app lifespan)"""
+    global _listener
+    if _listener is None and l1.enabled and os.getenv("REDIS_URL"):
+        _listener = asyncio.create_task(_listen_invalidations())
+        print("✅ Cache L1 invalidation listener started")
+
+
+async def stop_invalidation_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+
+
+async def _disk_compaction_loop() -> None:
+    while True:
+        await asyncio.sleep(CACHE_DISK_COMPACT_INTERVAL)
+        try:
+            # У фоновому потоці: видалення і checkpoint WAL не блокують event loop
+            result = await asyncio.to_thread(disk.compact, CACHE_DISK_COMPACT_INTERVAL * 0.9)
+            if result and result["evicted"]:
+                print(f"🧹 Disk cache over {disk.max_bytes} bytes, evicted {result['evicted']} entries")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Disk cache compaction error: {e}")
+
+
+async def start_disk_cache() -> None:
+    """Open the disk tier and start its background compaction (called from the app lifespan)"""
+    global _compactor
+    if disk is not None and _compactor is None:
+        # Файл і схема створюються під час старту, а не на першому запиті
+        disk.conn
+        _compactor = asyncio.create_task(_disk_compaction_loop())
+        mode = "fallback for Redis" if os.getenv("REDIS_URL") else "standalone"
+        print(f"✅ Disk cache at {disk.path} ({mode})")
+
+
+async def stop_disk_cache() -> None:
+    global _compactor
+    await flush_disk_writes()
+    if _compactor is not None:
+        _compactor.cancel()
+        try:
+            await _compactor
+        except asyncio.CancelledError:
+            pass
+        _compactor = None
+
+
+async def _redis_lock(key: str, token: str, ttl: int) -> bool:
+    # Напряму в Redis, без L1: лок має сенс лише як спільний для всіх воркерів
+    return bool(await get_redis().set(key, json.dumps(token), ex=ttl, nx=True))
+
+
+async def cache_lock(key: str, ttl: int) -> Optional[str]:
+    """
+    Acquire a short-lived lock (SET NX EX); returns the owner token or None if it is already held.
+    Without Redis the lock lives in the disk tier and is shared by the workers of this host only.
+    """
+    token = uuid.uuid4().hex
+    if _redis_enabled():
+        try:
+            return token if await redis_breaker.call(lambda: _redis_lock(key, token, ttl)) else None
+        except Exception as e:
+            _log_error("lock", e)
+    if disk is None:
+        return None
     try:
-        await redis.set(key, json.dumps(data), ex=ttl)
+        return token if await _on_disk(lambda: disk.add(key, json.dumps(token).encode(), ttl)) else None
+    except Exception as e:
+        print(f"❌ Disk cache lock error: {e}")
+        return None
+
+
+async def _redis_unlock(key: str, token: str) -> bool:
+    async with get_redis().pipeline() as pipe:
+        await pipe.watch(key)
+        if await pipe.get(key) != json.dumps(token).encode():
+            # Лок уже протух і його взяв інший воркер - не чіпаємо
+            return False
+        pipe.multi()
+        pipe.delete(key)
+        await pipe.execute()
         return True
+
+
+async def cache_unlock(key: str, token: str) -> bool:
+    """Release the lock only if it is still ours (compare-and-delete under WATCH)"""
+    if _redis_enabled():
+        try:
+            if await redis_breaker.call(lambda: _redis_unlock(key, token)):
+                return True
+        except Exception as e:
+            _log_error("unlock", e)
+    if disk is None:
+        return False
+    try:
+        # Лок міг бути взятий на диску, поки Redis був недоступний
+        return await _on_disk(lambda: disk.delete_if(key, json.dumps(token).encode()))
     except Exception as e:
-        print(f"❌ Cache set error: {e}")
+        print(f"❌ Disk cache unlock error: {e}")
         return False
-    finally:
-        await redis.close()
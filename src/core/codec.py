@@ -0,0 +1,109 @@
+import json
+import os
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# Формат нових записів: json, orjson або msgpack (якщо бібліотеки немає - json)
+CACHE_CODEC = os.getenv("CACHE_CODEC", "orjson")
+# Стиснення записів, більших за поріг: zlib, zstd або none
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib")
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+# Рівень стиснення (порожньо - 1 для zlib і 3 для zstd: стиснення йде в event loop, тож швидкі рівні)
+CACHE_COMPRESS_LEVEL = os.getenv("CACHE_COMPRESS_LEVEL", "")
+
+# Байт 0xC1 не зустрічається ні в UTF-8, ні в msgpack - старі json-записи з нього не починаються
+MAGIC = 0xC1
+VERSION = 1
+
+Dumps = Callable[[Any], bytes]
+Loads = Callable[[bytes], Any]
+Transform = Callable[[bytes], bytes]
+
+
+def _serializers() -> Dict[str, Tuple[int, Dumps, Loads]]:
+    serializers = {"json": (1, lambda value: json.dumps(value, ensure_ascii=False).encode(), json.loads)}
+    try:
+        import orjson
+
+        # Нестрокові ключі словників json.dumps перетворює на рядки - orjson має робити так само
+        serializers["orjson"] = (2, lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS), orjson.loads)
+    except ImportError:
+        pass
+    try:
+        import msgpack
+
+        serializers["msgpack"] = (
+            3,
+            msgpack.packb,
+            lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False),
+        )
+    except ImportError:
+        pass
+    return serializers
+
+
+def _compressors(level: Optional[int]) -> Dict[str, Tuple[int, Transform, Transform]]:
+    compressors = {
+        "none": (0, lambda data: data, lambda data: data),
+        "zlib": (1, lambda data: zlib.compress(data, 1 if level is None else level), zlib.decompress),
+    }
+    try:
+        import zstandard
+
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        decompressor = zstandard.ZstdDecompressor()
+        compressors["zstd"] = (2, compressor.compress, decompressor.decompress)
+    except ImportError:
+        pass
+    return compressors
+
+
+class Codec:
+    """
+    Encodes cache values as bytes with a 4-byte header (magic, version, serializer, compression).
+    Values without the header are legacy json.dumps text and still decode.
+    """
+
+    def __init__(
+        self,
+        serializer: str = CACHE_CODEC,
+        compression: str = CACHE_COMPRESSION,
+        min_compress_bytes: int = CACHE_COMPRESS_MIN_BYTES,
+        level: Optional[int] = int(CACHE_COMPRESS_LEVEL) if CACHE_COMPRESS_LEVEL else None,
+    ):
+        serializers = _serializers()
+        compressors = _compressors(level)
+        if serializer not in serializers:
+            print(f"⚠️ Cache codec '{serializer}' is not available, using json")
+            serializer = "json"
+        if compression not in compressors:
+            print(f"⚠️ Cache compression '{compression}' is not available, using none")
+            compression = "none"
+        self.serializer = serializer
+        self.compression = compression
+        self.min_compress_bytes = min_compress_bytes
+        self._serializer_id, self._dumps, _ = serializers[serializer]
+        self._compression_id, self._compress, _ = compressors[compression]
+        # Декодуємо все, що вміємо, - записи інших воркерів можуть бути в іншому форматі
+        self._loads = {id_: loads for id_, _, loads in serializers.values()}
+        self._decompress = {id_: decompress for id_, _, decompress in compressors.values()}
+
+    def encode(self, value: Any) -> bytes:
+        data = self._dumps(value)
+        compression_id = 0
+        if self._compression_id and len(data) >= self.min_compress_bytes:
+            compressed = self._compress(data)
+            if len(compressed) < len(data):
+                data, compression_id = compressed, self._compression_id
+        return bytes((MAGIC, VERSION, self._serializer_id, compression_id)) + data
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str) or not data or data[0] != MAGIC:
+            return json.loads(data)
+        version, serializer_id, compression_id = data[1], data[2], data[3]
+        if version != VERSION or serializer_id not in self._loads or compression_id not in self._decompress:
+            raise ValueError(f"Unsupported cache entry format {version}/{serializer_id}/{compression_id}")
+        return self._loads[serializer_id](self._decompress[compression_id](data[4:]))
+
+
+codec = Codec()
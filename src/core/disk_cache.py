@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL NOT NULL);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('compacted_at', 0);
+"""
+
+# Запис, якщо ключа немає або він протух; інакше - нічого (для NX і локів)
+ADD = """
+INSERT INTO cache (key, value, size, expires_at) VALUES (?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, expires_at = excluded.expires_at
+WHERE cache.expires_at <= ?
+"""
+
+
+class DiskCache:
+    """
+    Persistent cache in a local SQLite file in WAL mode, shared by all workers on the host.
+    Entries expire by TTL; compact() removes expired entries and, above max_bytes, the ones
+    closest to expiry, so reads never have to write.
+    """
+
+    def __init__(self, path: str, max_bytes: int, busy_timeout: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        # auto_vacuum діє лише для нового файлу - тоді incremental_vacuum повертає місце після compact()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Кеш можна втратити при збої живлення - fsync на кожен запис не потрібен
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Після fork воркера з'єднання батьківського процесу використовувати не можна
+        if self._conn is None or self._pid != os.getpid():
+            self._conn, self._pid = self.connect(), os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # Кілька записів - одна транзакція (і один запис у WAL) замість автокоміту кожного
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """(value, seconds left) or None"""
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return (row[0], row[1] - now) if row else None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[bytes, float]]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        rows = self.conn.execute(
+            f"SELECT key, value, expires_at FROM cache WHERE key IN ({placeholders}) AND expires_at > ?",
+            (*keys, now),
+        )
+        return {key: (value, expires_at - now) for key, value, expires_at in rows}
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, bytes], ttl: float) -> None:
+        expires_at = time.time() + ttl
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at) VALUES (?, ?, ?, ?)",
+                [(key, value, len(value), expires_at) for key, value in items.items()],
+            )
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Write only if the key is missing or expired; True if written"""
+        now = time.time()
+        return self.conn.execute(ADD, (key, value, len(value), now + ttl, now)).rowcount > 0
+
+    def delete(self, *keys: str) -> None:
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        """Delete the key only if it still holds value (lock release)"""
+        return self.conn.execute("DELETE FROM cache WHERE key = ? AND value = ?", (key, value)).rowcount > 0
+
+    def compact(self, interval: float = 0) -> Optional[dict]:
+        """
+        Drop expired entries, evict by nearest expiry down to 90% of max_bytes, checkpoint the WAL.
+        With interval, only one worker per interval does it; returns None if it was not this one.
+        """
+        # Окреме з'єднання: compact() виконується у фоновому потоці
+        conn = self.connect()
+        try:
+            now = time.time()
+            claimed = conn.execute(
+                "UPDATE meta SET value = ? WHERE name = 'compacted_at' AND value <= ?", (now, now - interval)
+            ).rowcount
+            if not claimed:
+                return None
+            expired = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            evicted = 0
+            if total > self.max_bytes:
+                excess = total - int(self.max_bytes * 0.9)
+                evicted = conn.execute(
+                    """
+                    DELETE FROM cache WHERE key IN (
+                        SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY expires_at, key) - size AS before
+                                         FROM cache)
+                        WHERE before < ?
+                    )
+                    """,
+                    (excess,),
+                ).rowcount
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+            return {"expired": expired, "evicted": evicted}
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes}
@@ -1,10 +1,5 @@
 import os
 
-import sentry_sdk
-from sentry_sdk.integrations.fastapi import FastApiIntegration
-from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
-from sentry_sdk.integrations.starlette import StarletteIntegration
-
 
 def init_sentry() -> None:
     """
@@ -16,6 +11,12 @@ def init_sentry() -> None:
         print("⚠️ Sentry DSN not found, Sentry monitoring disabled")
         return
 
+    # Імпорт sentry_sdk важкий - платимо за нього лише коли моніторинг увімкнено
+    import sentry_sdk
+    from sentry_sdk.integrations.fastapi import FastApiIntegration
+    from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+    from sentry_sdk.integrations.starlette import StarletteIntegration
+
     sentry_sdk.init(
         dsn=sentry_dsn,
         integrations=[
@@ -0,0 +1,26 @@
+import asyncio
+from typing import Any, Set
+
+# Задачі закриття старих клієнтів: без посилання задачу може прибрати GC до завершення
+_closing: Set[asyncio.Future] = set()
+
+
+async def _aclose_quietly(client: Any) -> None:
+    try:
+        await client.aclose()
+    except Exception as e:
+        print(f"⚠️ Closing a client from another event loop failed: {e}")
+
+
+def close_stale_client(client: Any, loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Close a pooled client (httpx / redis) whose connections belong to another event loop.
+    aclose() runs on that loop while it is still running; after the loop is closed it runs on the
+    current one, where transports that can no longer be closed cleanly are released quietly.
+    """
+    if loop.is_running() and not loop.is_closed():
+        future = asyncio.run_coroutine_threadsafe(_aclose_quietly(client), loop)
+    else:
+        future = asyncio.get_running_loop().create_task(_aclose_quietly(client))
+    _closing.add(future)
+    future.add_done_callback(_closing.discard)
@@ -0,0 +1,69 @@
+import os
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from .redis_client import get_redis
+
+# Скільки найпопулярніших ключів тримає sorted set у Redis і скільки різних ключів буферизує воркер
+POPULARITY_CAPACITY = int(os.getenv("POPULARITY_CAPACITY", "1000"))
+POPULARITY_BUFFER_SIZE = int(os.getenv("POPULARITY_BUFFER_SIZE", "10000"))
+# Множник рахунків на кожен decay(): старі сплески популярності поступово забуваються
+POPULARITY_DECAY = float(os.getenv("POPULARITY_DECAY", "0.9"))
+
+
+class PopularityTracker:
+    """
+    Approximate top-K of request keys shared by all workers: a Redis sorted set trimmed to `capacity`
+    members. record() only counts in memory; flush() sends the buffered counts in one pipeline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int = POPULARITY_CAPACITY,
+        buffer_size: int = POPULARITY_BUFFER_SIZE,
+        decay: float = POPULARITY_DECAY,
+    ):
+        self.key = f"popularity:{name}"
+        self.capacity = capacity
+        self.buffer_size = buffer_size
+        self.decay_factor = decay
+        self._buffer: Counter = Counter()
+        self.dropped = 0
+
+    def record(self, member: str) -> None:
+        if member in self._buffer or len(self._buffer) < self.buffer_size:
+            self._buffer[member] += 1
+        else:
+            # Буфер повний - нові рідкісні ключі до топу однаково не потрапили б
+            self.dropped += 1
+
+    async def flush(self) -> Dict[str, int]:
+        """Send buffered counts to Redis; returns what was flushed"""
+        counts, self._buffer = self._buffer, Counter()
+        if not counts:
+            return {}
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for member, count in counts.items():
+                    pipe.zincrby(self.key, count, member)
+                # Лишаємо capacity найпопулярніших
+                pipe.zremrangebyrank(self.key, 0, -self.capacity - 1)
+                await pipe.execute()
+        except Exception as e:
+            print(f"❌ Popularity flush error: {e}")
+        return dict(counts)
+
+    async def decay(self) -> None:
+        try:
+            await get_redis().zunionstore(self.key, {self.key: self.decay_factor})
+        except Exception as e:
+            print(f"❌ Popularity decay error: {e}")
+
+    async def top(self, k: int) -> List[Tuple[str, float]]:
+        try:
+            members = await get_redis().zrevrange(self.key, 0, k - 1, withscores=True)
+        except Exception as e:
+            print(f"❌ Popularity top error: {e}")
+            return []
+        return [(member.decode() if isinstance(member, bytes) else member, score) for member, score in members]
@@ -1,14 +1,62 @@
+import asyncio
 import os
+from typing import Optional
 
 from redis import asyncio as aioredis
 
+from .loop_bound import close_stale_client
 
-def get_redis() -> aioredis.Redis:
-    """Підключення до Upstash Redis"""
+# Розмір пулу з'єднань до Redis на воркер
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+
+_redis: Optional[aioredis.Redis] = None
+_redis_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_redis() -> aioredis.Redis:
+    """Підключення до Upstash Redis з пулом з'єднань"""
     redis_url = os.getenv("REDIS_URL")
+    # Вимкнути перевірку SSL для Upstash; для redis:// без TLS параметр не приймається
+    ssl_args = {"ssl_cert_reqs": None} if redis_url and redis_url.startswith("rediss://") else {}
     return aioredis.from_url(
         redis_url,
+        # Значення кешу - байти (див. core.codec), тому відповіді не декодуємо
         encoding="utf-8",
-        decode_responses=True,
-        ssl_cert_reqs=None,  # Вимкнути перевірку SSL для Upstash
+        decode_responses=False,
+        **ssl_args,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30,
     )
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Shared pooled client; do not close it after use.
+    З'єднання пулу прив'язані до event loop, тому в новому циклі (напр. TestClient без lifespan) клієнт новий.
+    """
+    global _redis, _redis_loop
+    loop = asyncio.get_running_loop()
+    if _redis is None or _redis_loop is not loop:
+        if _redis is not None:
+            # Пул старого циклу інакше лишився б відкритим
+            close_stale_client(_redis, _redis_loop)
+        _redis, _redis_loop = create_redis(), loop
+    return _redis
+
+
+async def start_redis() -> None:
+    """Create the shared client (called from the app lifespan); connections open on first use"""
+    if os.getenv("REDIS_URL"):
+        get_redis()
+        print("✅ Redis connection pool created")
+
+
+async def close_redis() -> None:
+    global _redis, _redis_loop
+    if _redis is not None:
+        await _redis.aclose()
+        _redis, _redis_loop = None, None
+        print("🔌 Redis connection pool closed")
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional
+
+# Запобіжник: скільки помилок поспіль відкривають його і скільки секунд він відкритий
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RECOVERY_TIMEOUT = float(os.getenv("BREAKER_RECOVERY_TIMEOUT", "30"))
+# AIMD-ліміт одночасних запитів: росте на 1/limit за успіх, ділиться навпіл при помилці чи повільній відповіді
+LIMITER_INITIAL = int(os.getenv("LIMITER_INITIAL", "10"))
+LIMITER_MIN = int(os.getenv("LIMITER_MIN", "1"))
+LIMITER_MAX = int(os.getenv("LIMITER_MAX", "100"))
+LIMITER_LATENCY_TARGET = float(os.getenv("LIMITER_LATENCY_TARGET", "2"))
+LIMITER_BACKOFF = float(os.getenv("LIMITER_BACKOFF", "0.5"))
+# Скільки секунд виклик понад ліміт чекає на вільне місце, перш ніж отримати відмову (0 - відмова одразу)
+LIMITER_QUEUE_TIMEOUT = float(os.getenv("LIMITER_QUEUE_TIMEOUT", "5"))
+
+Call = Callable[[], Awaitable[Any]]
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream call was not attempted; the caller should fail fast or serve stale data"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class ConcurrencyLimitExceeded(UpstreamUnavailable):
+    pass
+
+
+class CachedFailure(Exception):
+    """A recent call for the same key failed and the failure is still cached (status - upstream HTTP status)"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def outage(self) -> bool:
+        # Мережа, 429 чи 5xx - збій upstream; 4xx - відмова на сам запит, повтор через Retry-After не допоможе
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+class CircuitBreaker:
+    """
+    closed -> open after failure_threshold consecutive failures; open rejects calls for
+    recovery_timeout seconds, then half-open lets one probe through: success closes, failure reopens.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT,
+        is_failure: Callable[[Exception], bool] = lambda e: True,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.is_failure = is_failure
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    async def call(self, fn: Call) -> Any:
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open", retry_after=self.retry_after())
+
+        probe = state == self.HALF_OPEN
+        self._probe_in_flight = probe
+        try:
+            result = await fn()
+        except UpstreamUnavailable:
+            # Запит до upstream не відбувся (напр. відхилив лімітер) - ні успіх, ні помилка
+            raise
+        except Exception as e:
+            if self.is_failure(e):
+                self._record_failure(probe)
+            elif probe:
+                self._close()
+            raise
+        else:
+            self._close()
+            return result
+        finally:
+            if probe:
+                self._probe_in_flight = False
+
+    def _record_failure(self, probe: bool) -> None:
+        self.consecutive_failures += 1
+        if probe or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN or probe:
+                self.opened += 1
+                print(f"🔌 {self.name} circuit opened after {self.consecutive_failures} failures")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def _close(self) -> None:
+        if self._state != self.CLOSED:
+            print(f"✅ {self.name} circuit closed")
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def stats(self) -> dict:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 2) if state != self.CLOSED else 0.0,
+        }
+
+
+class AIMDLimiter:
+    """
+    Adaptive cap on concurrent upstream calls. Calls over the current limit wait in a FIFO queue
+    for up to queue_timeout seconds and are rejected only then, so a burst of cold searches is
+    delayed rather than failed while a slow upstream still sheds load. The limit is cut at most once
+    per window: failures of calls started before the last cut were already seen at the old limit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = LIMITER_INITIAL,
+        minimum: int = LIMITER_MIN,
+        maximum: int = LIMITER_MAX,
+        latency_target: float = LIMITER_LATENCY_TARGET,
+        backoff: float = LIMITER_BACKOFF,
+        queue_timeout: float = LIMITER_QUEUE_TIMEOUT,
+        is_failure: Callable[[Exception], bool] = lambda e: True,
+    ):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.is_failure = is_failure
+        self.in_flight = 0
+        self.rejected = 0
+        self._decreased_at = float("-inf")
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def _acquire(self) -> None:
+        # Нові виклики стають у чергу за тими, що вже чекають
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if self.queue_timeout > 0:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, self.queue_timeout)
+                return
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                self._leave(waiter)
+                raise
+            # Місце могли передати в ту ж мить, коли сплив таймаут
+            if waiter.done() and not waiter.cancelled():
+                return
+            self._leave(waiter)
+        self.rejected += 1
+        raise ConcurrencyLimitExceeded(f"{self.name} concurrency limit {int(self.limit)} reached")
+
+    def _leave(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # Місце вже передано цьому виклику - віддаємо його наступному
+            self._release()
+        elif waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        # Місце переходить до першого в черзі разом з in_flight, щоб новий виклик його не перехопив
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def run(self, fn: Call) -> Any:
+        await self._acquire()
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except Exception as e:
+            if self.is_failure(e):
+                self._decrease(start)
+            raise
+        else:
+            if time.monotonic() - start > self.latency_target:
+                self._decrease(start)
+            else:
+                self.limit = min(self.limit + 1 / self.limit, self.maximum)
+            return result
+        finally:
+            self._release()
+
+    def _decrease(self, start: float) -> None:
+        # Одночасні збої однієї хвилі зменшують ліміт один раз, а не backoff^N разів
+        if start < self._decreased_at:
+            return
+        self.limit = max(self.limit * self.backoff, self.minimum)
+        self._decreased_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+        }
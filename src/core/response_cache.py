@@ -0,0 +1,162 @@
+import gzip
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from .cache import cache_get, cache_set
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+# Менші тіла не стискаємо: заголовки gzip з'їдають виграш
+RESPONSE_CACHE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_CACHE_COMPRESS_MIN_BYTES", "1024"))
+# Стискаємо один раз при записі, тож рівні вищі, ніж у core.codec
+RESPONSE_CACHE_GZIP_LEVEL = int(os.getenv("RESPONSE_CACHE_GZIP_LEVEL", "6"))
+RESPONSE_CACHE_BROTLI_QUALITY = int(os.getenv("RESPONSE_CACHE_BROTLI_QUALITY", "5"))
+
+# Порядок переваги, коли клієнт приймає кілька кодувань
+ENCODINGS = ("br", "gzip")
+
+Variants = Dict[str, bytes]
+
+
+def accepted_encodings(header: Optional[str]) -> set:
+    """Codings from Accept-Encoding, without the ones refused with q=0"""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding == "*":
+            accepted.update(ENCODINGS)
+        elif coding:
+            accepted.add(coding)
+    return accepted
+
+
+def compress(body: bytes, min_bytes: int = RESPONSE_CACHE_COMPRESS_MIN_BYTES) -> Variants:
+    """identity plus the br/gzip variants worth storing for a body"""
+    variants = {"identity": body}
+    if len(body) < min_bytes:
+        return variants
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=RESPONSE_CACHE_BROTLI_QUALITY)
+    # mtime=0: однакове тіло - однакові байти в усіх воркерів
+    variants["gzip"] = gzip.compress(body, compresslevel=RESPONSE_CACHE_GZIP_LEVEL, mtime=0)
+    return variants
+
+
+def pack(variants: Variants, headers: Dict[str, str]) -> bytes:
+    # Рядок JSON з заголовками і довжинами варіантів, далі самі варіанти підряд
+    sizes = [[name, len(body)] for name, body in variants.items()]
+    return json.dumps({"headers": headers, "sizes": sizes}).encode() + b"\n" + b"".join(variants.values())
+
+
+def unpack(entry: bytes) -> Tuple[Variants, Dict[str, str]]:
+    end = entry.index(b"\n")
+    meta = json.loads(entry[:end])
+    variants, offset = {}, end + 1
+    for name, size in meta["sizes"]:
+        variants[name] = entry[offset : offset + size]
+        offset += size
+    return variants, meta["headers"]
+
+
+def negotiate(variants: Variants, headers: Dict[str, str], accept_encoding: Optional[str], media_type: str) -> Response:
+    """Raw Response with the best stored variant the client accepts"""
+    headers = dict(headers)
+    if len(variants) > 1:
+        headers["Vary"] = "Accept-Encoding"
+        accepted = accepted_encodings(accept_encoding)
+        for coding in ENCODINGS:
+            if coding in variants and coding in accepted:
+                headers["Content-Encoding"] = coding
+                return Response(variants[coding], media_type=media_type, headers=headers)
+    return Response(variants["identity"], media_type=media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    Final response bodies in the shared cache (core.cache with raw=True): encoded once and, above
+    compress_min_bytes, compressed once into gzip (and brotli, if installed) variants. A hit is sent
+    as the stored bytes - no decoding, model validation or JSON rendering.
+    """
+
+    def __init__(
+        self,
+        ttl: int = RESPONSE_CACHE_TTL,
+        compress_min_bytes: int = RESPONSE_CACHE_COMPRESS_MIN_BYTES,
+        media_type: str = "application/json",
+        enabled: Optional[bool] = None,
+    ):
+        self.ttl = ttl
+        self.compress_min_bytes = compress_min_bytes
+        self.media_type = media_type
+        # Лише з Redis чи дисковим рівнем: без них cache_set нічого не зберігає
+        if enabled is None:
+            enabled = bool(os.getenv("REDIS_URL") or os.getenv("CACHE_DISK_PATH"))
+        self.enabled = enabled and ttl > 0
+        self.hits = 0
+        self.misses = 0
+        self.encodings: Dict[str, int] = {}
+
+    def _respond(self, variants: Variants, headers: Dict[str, str], request: Request) -> Response:
+        response = negotiate(variants, headers, request.headers.get("accept-encoding"), self.media_type)
+        coding = response.headers.get("content-encoding", "identity")
+        self.encodings[coding] = self.encodings.get(coding, 0) + 1
+        return response
+
+    async def get(self, key: str, request: Request) -> Optional[Response]:
+        """Stored response for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            entry = await cache_get(key, raw=True)
+            if entry is None:
+                self.misses += 1
+                return None
+            variants, headers = unpack(entry)
+        except Exception as e:
+            print(f"⚠️ Response cache get error: {e}")
+            return None
+        self.hits += 1
+        return self._respond(variants, headers, request)
+
+    async def store(
+        self, key: str, request: Request, body: bytes, headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Store an encoded body (with the headers to replay on hits) and return it as this request's response"""
+        headers = headers or {}
+        if not self.enabled:
+            # Стиснення окупається лише тоді, коли його результат перевикористовується
+            return self._respond({"identity": body}, headers, request)
+        variants = compress(body, self.compress_min_bytes)
+        try:
+            await cache_set(key, pack(variants, headers), self.ttl, raw=True)
+        except Exception as e:
+            print(f"⚠️ Response cache set error: {e}")
+        return self._respond(variants, headers, request)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl": self.ttl,
+            "brotli": brotli is not None,
+            # Скільки відповідей віддано в кожному кодуванні
+            "encodings": self.encodings,
+        }
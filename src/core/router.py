@@ -4,6 +4,8 @@ import os
 
 from fastapi import APIRouter
 
+from .cache import cache_stats
+
 router = APIRouter(prefix="/common", tags=["common"])
 
 
@@ -90,6 +92,14 @@ def memory_info():
     }
 
 
+@router.get("/cache-stats")
+async def cache_hit_ratios():
+    """
+    Hit ratios of the in-process (L1), Redis (L2) and disk cache tiers in this worker
+    """
+    return await cache_stats()
+
+
 @router.get("/services-status")
 def services_status():
     """
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .cache import CACHE_DISK_PATH, cache_lock, cache_unlock
+
+# Розподілений лок між воркерами/репліками - лише коли є Redis
+SINGLE_FLIGHT_REDIS = os.getenv("SINGLE_FLIGHT_REDIS", "true").lower() in ("1", "true", "yes")
+SINGLE_FLIGHT_LOCK_TTL = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "15"))
+SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", "10"))
+SINGLE_FLIGHT_POLL = float(os.getenv("SINGLE_FLIGHT_POLL", "0.05"))
+
+
+class SingleFlight:
+    """
+    At most one in-flight call per key: concurrent callers in this process await the leader's result.
+    With a Redis lock, callers in other workers wait for the leader to fill the shared cache (via peek)
+    instead of calling upstream themselves; if it does not appear in time they fetch on their own.
+    """
+
+    def __init__(
+        self,
+        distributed: Optional[bool] = None,
+        lock_ttl: int = SINGLE_FLIGHT_LOCK_TTL,
+        wait_timeout: float = SINGLE_FLIGHT_WAIT,
+        poll_interval: float = SINGLE_FLIGHT_POLL,
+    ):
+        if distributed is None:
+            # Без Redis лок на дисковому рівні об'єднує воркери одного хоста
+            distributed = SINGLE_FLIGHT_REDIS and bool(os.getenv("REDIS_URL") or CACHE_DISK_PATH)
+        self.distributed = distributed
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.remote_coalesced = 0
+        self.lock_timeouts = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        peek: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Запит належить групі, а не лідеру: скасування лідера не зачіпає решту очікувачів
+            task = asyncio.create_task(self._run(key, fn, peek))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # shield: скасування одного очікувача не скасовує запит для решти
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Позначаємо виняток як отриманий, навіть якщо всі очікувачі пішли
+            task.exception()
+
+    async def _run(self, key: str, fn, peek) -> Any:
+        if not self.distributed or peek is None:
+            self.leaders += 1
+            return await fn()
+
+        lock_key = f"lock:{key}"
+        token = await cache_lock(lock_key, self.lock_ttl)
+        if token is None:
+            # Інший воркер уже йде в upstream - чекаємо, поки він заповнить кеш
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.wait_timeout
+            while loop.time() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                value = await peek()
+                if value is not None:
+                    self.remote_coalesced += 1
+                    return value
+            self.lock_timeouts += 1
+
+        self.leaders += 1
+        try:
+            return await fn()
+        finally:
+            if token is not None:
+                await cache_unlock(lock_key, token)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "remote_coalesced": self.remote_coalesced,
+            "lock_timeouts": self.lock_timeouts,
+        }
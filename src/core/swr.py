@@ -0,0 +1,202 @@
+import asyncio
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .cache import cache_get, cache_lock, cache_set, cache_unlock
+from .resilience import CachedFailure
+from .single_flight import SingleFlight
+
+# Свіжість за замовчуванням: до soft TTL запис свіжий, між soft і hard - віддаємо застарілий і оновлюємо у фоні
+CACHE_SWR_SOFT_TTL = int(os.getenv("CACHE_SWR_SOFT_TTL", "60"))
+CACHE_SWR_HARD_TTL = int(os.getenv("CACHE_SWR_HARD_TTL", "3600"))
+# Вікна для окремих префіксів ключів: "books:raw:=60/3600,books:processed:=120/3600"
+CACHE_SWR_WINDOWS = os.getenv("CACHE_SWR_WINDOWS", "")
+# Після невдалого оновлення застарілий запис лишається, наступна спроба - через стільки секунд
+CACHE_SWR_RETRY_AFTER = int(os.getenv("CACHE_SWR_RETRY_AFTER", "10"))
+
+Fetch = Callable[[], Awaitable[Any]]
+Fallback = Callable[[], Awaitable[Optional[Any]]]
+# TTL для окремого результату чи помилки (None - звичайне вікно / помилку не кешуємо)
+ValueTTL = Callable[[Any], Optional[float]]
+ErrorTTL = Callable[[Exception], Optional[float]]
+
+
+def error_status(error: Exception) -> Optional[int]:
+    # HTTP-статус відповіді upstream (httpx.HTTPStatusError), щоб повтор з кешу відповідав так само
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def parse_windows(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse 'prefix=soft/hard,...' into {prefix: (soft, hard)}"""
+    windows = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        prefix, _, ttls = item.strip().rpartition("=")
+        soft, _, hard = ttls.partition("/")
+        soft = int(soft)
+        windows[prefix] = (soft, max(int(hard or soft), soft))
+    return windows
+
+
+class StaleWhileRevalidate:
+    """
+    Cache entries with soft and hard TTLs. Past the soft TTL the cached value is still returned
+    and a single background task refreshes it; Redis drops the entry at the hard TTL.
+    Misses go through single-flight, so only one upstream fetch per key is in flight.
+    Optional negative caching: a failed miss is remembered for error_ttl(error) seconds and replayed
+    as CachedFailure with the upstream status; value_ttl(value) gives short-lived values (e.g. empty results) their own TTL.
+    """
+
+    def __init__(
+        self,
+        single_flight: Optional[SingleFlight] = None,
+        windows: Optional[Dict[str, Tuple[int, int]]] = None,
+        soft_ttl: int = CACHE_SWR_SOFT_TTL,
+        hard_ttl: int = CACHE_SWR_HARD_TTL,
+        retry_after: int = CACHE_SWR_RETRY_AFTER,
+        value_ttl: Optional[ValueTTL] = None,
+        error_ttl: Optional[ErrorTTL] = None,
+    ):
+        self.single_flight = single_flight or SingleFlight()
+        self.windows = parse_windows(CACHE_SWR_WINDOWS) if windows is None else windows
+        self.default_window = (soft_ttl, max(hard_ttl, soft_ttl))
+        self.retry_after = retry_after
+        self.value_ttl = value_ttl
+        self.error_ttl = error_ttl
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.fallback_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.negative_hits = 0
+        self.negative_stored = 0
+
+    def window(self, key: str) -> Tuple[int, int]:
+        # Найдовший префікс, з якого починається ключ
+        matches = [prefix for prefix in self.windows if key.startswith(prefix)]
+        return self.windows[max(matches, key=len)] if matches else self.default_window
+
+    async def get(self, key: str, fetch: Fetch, fallback: Optional[Fallback] = None) -> Any:
+        """Cached value for key; on a miss try fallback() (e.g. a derivable cached entry), then fetch()"""
+        return await self.from_entry(key, await cache_get(key), fetch, fallback=fallback)
+
+    async def from_entry(self, key: str, entry: Any, fetch: Fetch, fallback: Optional[Fallback] = None) -> Any:
+        """get() for an entry the caller has already read (e.g. with cache_get_many); None is a miss"""
+        self._raise_if_negative(entry)
+        if self._is_entry(entry):
+            if entry["soft_expires_at"] > time.time():
+                self.fresh_hits += 1
+            else:
+                self.stale_hits += 1
+                self._schedule_refresh(key, fetch, entry["value"])
+            return entry["value"]
+
+        if fallback is not None:
+            value = await fallback()
+            if value is not None:
+                self.fallback_hits += 1
+                return value
+
+        self.misses += 1
+        return await self.single_flight.do(
+            key, lambda: self._fetch_and_store(key, fetch, remember_failure=True), peek=lambda: self.peek(key)
+        )
+
+    async def peek(self, key: str) -> Optional[Any]:
+        entry = await cache_get(key)
+        # Лідер в іншому воркері отримав помилку - очікувачі отримують її ж, а не чекають до таймауту
+        self._raise_if_negative(entry)
+        return entry["value"] if self._is_entry(entry) else None
+
+    async def soft_ttl_left(self, key: str) -> Optional[float]:
+        """Seconds until the entry goes stale (negative once it is stale); None if there is no entry"""
+        entry = await cache_get(key)
+        return entry["soft_expires_at"] - time.time() if self._is_entry(entry) else None
+
+    async def refresh(self, key: str, fetch: Fetch) -> Any:
+        """Fetch and store now, whatever the age of the entry; concurrent misses for the key join this fetch"""
+        return await self.single_flight.do(key, lambda: self._fetch_and_store(key, fetch))
+
+    def fresh_value(self, entry: Any) -> Optional[Any]:
+        """Value of a raw cache entry if it is within its soft TTL"""
+        if self._is_entry(entry) and entry["soft_expires_at"] > time.time():
+            return entry["value"]
+        return None
+
+    @staticmethod
+    def _is_entry(entry: Any) -> bool:
+        # Записи старого формату (без soft TTL) вважаємо промахом
+        return isinstance(entry, dict) and "soft_expires_at" in entry and "value" in entry
+
+    def _raise_if_negative(self, entry: Any) -> None:
+        if isinstance(entry, dict) and "error" in entry and "soft_expires_at" in entry:
+            retry_after = entry["soft_expires_at"] - time.time()
+            if retry_after > 0:
+                self.negative_hits += 1
+                raise CachedFailure(entry["error"], status=entry.get("status"), retry_after=retry_after)
+
+    async def _store(
+        self, key: str, value: Any, soft_ttl: Optional[float] = None, hard_ttl: Optional[float] = None
+    ) -> None:
+        soft, hard = self.window(key)
+        entry = {"value": value, "soft_expires_at": time.time() + (soft if soft_ttl is None else soft_ttl)}
+        await cache_set(key, entry, hard if hard_ttl is None else max(math.ceil(hard_ttl), 1))
+
+    async def _fetch_and_store(self, key: str, fetch: Fetch, remember_failure: bool = False) -> Any:
+        try:
+            value = await fetch()
+        except Exception as e:
+            ttl = self.error_ttl(e) if remember_failure and self.error_ttl is not None else None
+            if ttl:
+                # Негативний запис: без застарілої фази, Redis видаляє його разом із soft TTL
+                self.negative_stored += 1
+                entry = {"error": str(e), "status": error_status(e), "soft_expires_at": time.time() + ttl}
+                await cache_set(key, entry, max(math.ceil(ttl), 1))
+            raise
+        ttl = self.value_ttl(value) if self.value_ttl is not None else None
+        await self._store(key, value, soft_ttl=ttl, hard_ttl=ttl)
+        return value
+
+    def _schedule_refresh(self, key: str, fetch: Fetch, stale_value: Any) -> None:
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(key, fetch, stale_value))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(self, key: str, fetch: Fetch, stale_value: Any) -> None:
+        token = None
+        if self.single_flight.distributed:
+            token = await cache_lock(f"refresh:{key}", self.single_flight.lock_ttl)
+            if token is None:
+                # Інший воркер уже оновлює цей ключ
+                return
+        try:
+            await self._fetch_and_store(key, fetch)
+            self.refreshes += 1
+        except Exception as e:
+            # Помилку не показуємо клієнтам: продовжуємо застарілий запис і повторимо пізніше
+            self.refresh_failures += 1
+            print(f"⚠️ Background refresh failed for {key}: {e}")
+            await self._store(key, stale_value, soft_ttl=self.retry_after)
+        finally:
+            if token is not None:
+                await cache_unlock(f"refresh:{key}", token)
+
+    def stats(self) -> dict:
+        return {
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "fallback_hits": self.fallback_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "refreshing": len(self._refreshing),
+            "negative_hits": self.negative_hits,
+            "negative_stored": self.negative_stored,
+        }
@@ -17,5 +17,8 @@ class BooksConfig:
     min_isbn_length: int = 10
     max_isbn_length: int = 13
 
+    max_batch_size: int = 20
+    max_batch_results: int = 40
+
 
 books_config = BooksConfig()
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+
+from core.loop_bound import close_stale_client
+
+# Налаштування пулу з'єднань до Google Books API з .env або за замовчуванням
+GOOGLE_BOOKS_API_URL = os.getenv("GOOGLE_BOOKS_API_URL", "https://www.googleapis.com/books/v1/volumes")
+HTTP_TIMEOUT = float(os.getenv("GOOGLE_BOOKS_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("GOOGLE_BOOKS_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("GOOGLE_BOOKS_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("GOOGLE_BOOKS_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("GOOGLE_BOOKS_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("GOOGLE_BOOKS_HTTP2", "false").lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        print("⚠️ GOOGLE_BOOKS_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+        return False
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Async client with keep-alive pooling. The client talks to a single host,
+    so the pool limits are effectively per-host limits.
+    """
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared client (called from the app lifespan)"""
+    client = get_http_client()
+    print("✅ HTTP client pool started")
+    return client
+
+
+async def close_http_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client, _client_loop = None, None
+        print("🔌 HTTP client pool closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared client; created on first use when the lifespan did not run.
+    З'єднання пулу прив'язані до event loop, тому в новому циклі (напр. TestClient без lifespan) клієнт новий.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        if _client is not None:
+            # Пул старого циклу інакше лишився б відкритим
+            close_stale_client(_client, _client_loop)
+        _client, _client_loop = create_http_client(), loop
+    return _client
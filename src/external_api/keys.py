@@ -0,0 +1,45 @@
+import hashlib
+import os
+import re
+import unicodedata
+from typing import List, Tuple
+
+# Довші ключі хешуємо: Redis приймає й довгі, але вони дорожчі в пам'яті та в L1
+MAX_KEY_LENGTH = int(os.getenv("EXTERNAL_CACHE_MAX_KEY_LENGTH", "200"))
+# Розміри відповідей, кешовану більшу з яких можна обрізати під менший max_results
+SUPERSET_SIZES = sorted(int(size) for size in os.getenv("EXTERNAL_SUPERSET_SIZES", "10,20,40").split(",") if size)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a search query: NFKC, case-folded, single spaces, trimmed"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query).casefold()).strip()
+
+
+def cache_key(kind: str, query: str, max_results: int, **params) -> str:
+    """
+    books:{kind}:{query}:{max_results}[:name=value...] with the query normalised and extra
+    parameters sorted by name; keys longer than MAX_KEY_LENGTH become books:{kind}:h:{sha256}.
+    """
+    parts = [normalize_query(query), str(max_results)]
+    parts += [f"{name}={params[name]}" for name in sorted(params) if params[name] is not None]
+    key = f"books:{kind}:" + ":".join(parts)
+    if len(key) <= MAX_KEY_LENGTH:
+        return key
+    return f"books:{kind}:h:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def superset_sizes(max_results: int) -> List[int]:
+    """Larger cached sizes that can answer max_results, smallest first"""
+    return [size for size in SUPERSET_SIZES if size > max_results]
+
+
+def popularity_member(query: str, max_results: int) -> str:
+    """Member of the popularity top-K for a processed search: '{max_results}:{normalised query}'"""
+    return f"{max_results}:{normalize_query(query)}"
+
+
+def parse_popularity_member(member: str) -> Tuple[str, int]:
+    max_results, _, query = member.partition(":")
+    return query, int(max_results)
@@ -32,7 +32,8 @@ class BookItem(BaseModel):
 class GoogleBooksResponse(BaseModel):
     kind: str = Field(..., description="API response kind")
     totalItems: int = Field(..., description="Total items found")
-    items: List[BookItem] = Field(..., description="List of books")
+    # Google не надсилає items, коли нічого не знайдено
+    items: List[BookItem] = Field(default=[], description="List of books")
 
 
 class ProcessedBook(BaseModel):
@@ -52,3 +53,16 @@ class ProcessedBook(BaseModel):
 class ProcessedBooksResponse(BaseModel):
     total_books: int = Field(..., description="Total books processed")
     books: List[ProcessedBook] = Field(..., description="Processed books list")
+
+
+class BatchSearchItem(BaseModel):
+    query: str = Field(..., min_length=1, description="Search query")
+    max_results: int = Field(default=10, ge=1, le=cfg.max_batch_results, description="Number of results")
+
+
+class BatchSearchResult(BaseModel):
+    query: str = Field(..., description="Search query as requested")
+    max_results: int = Field(..., description="Number of results as requested")
+    status_code: int = Field(default=200, description="HTTP status this search would have on its own")
+    result: Optional[ProcessedBooksResponse] = Field(default=None, description="Processed books, if found")
+    error: Optional[str] = Field(default=None, description="Error message, if the search failed")
@@ -1,15 +1,29 @@
+import math
 import random
+from typing import List
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Body, HTTPException, Query
 
-from src.external_api.models import GoogleBooksResponse, ProcessedBooksResponse
-from src.external_api.service import books_service
+from core.resilience import CachedFailure, UpstreamUnavailable
+
+from .config import books_config as cfg
+from .models import BatchSearchItem, BatchSearchResult, GoogleBooksResponse, ProcessedBooksResponse
+from .service import books_service
 
 router = APIRouter(prefix="/external", tags=["External Books API"])
 
 
+def upstream_error(e: Exception) -> HTTPException:
+    # Запобіжник відкритий, ліміт вичерпано чи збій Google ще в негативному кеші: 503 з Retry-After
+    if isinstance(e, UpstreamUnavailable) or (isinstance(e, CachedFailure) and e.outage):
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        return HTTPException(status_code=503, detail=f"Google Books API недоступний: {str(e)}", headers=headers)
+    # Закешована відмова на сам запит (4xx) відповідає так само, як перша, некешована
+    return HTTPException(status_code=500, detail=f"Помилка при пошуку книг: {str(e)}")
+
+
 @router.get("/data", response_model=GoogleBooksResponse)
-def get_raw_books_data(
+async def get_raw_books_data(
     query: str = Query("python programming", description="Search query for books"),
     max_results: int = Query(5, ge=1, le=20, description="Number of results (1-20)"),
 ) -> GoogleBooksResponse:
@@ -17,13 +31,13 @@ def get_raw_books_data(
     Get raw data from Google Books API
     """
     try:
-        return books_service.search_books(query, max_results)
+        return await books_service.search_books(query, max_results)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching books data: {str(e)}")
+        raise upstream_error(e)
 
 
 @router.get("/processed", response_model=ProcessedBooksResponse)
-def get_processed_books_data(
+async def get_processed_books_data(
     query: str = Query("python programming", description="Search query for books"),
     max_results: int = Query(5, ge=1, le=20, description="Number of results (1-20)"),
 ) -> ProcessedBooksResponse:
@@ -31,13 +45,36 @@ def get_processed_books_data(
     Get processed and transformed books data
     """
     try:
-        return books_service.process_books_data(query, max_results)
+        return await books_service.process_books_data(query, max_results)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing books data: {str(e)}")
+        raise upstream_error(e)
+
+
+@router.post("/books/batch", response_model=List[BatchSearchResult])
+async def search_books_batch(
+    searches: List[BatchSearchItem] = Body(..., min_length=1, max_length=cfg.max_batch_size),
+) -> List[BatchSearchResult]:
+    """
+    Several searches in one request: cached results are read in one Redis round trip, the rest are
+    fetched concurrently. Results keep the request order; a failed search gets its own error.
+    """
+    results = await books_service.process_books_batch([(item.query, item.max_results) for item in searches])
+    response = []
+    for item, result in zip(searches, results):
+        if isinstance(result, Exception):
+            error = upstream_error(result)
+            response.append(
+                BatchSearchResult(
+                    query=item.query, max_results=item.max_results, status_code=error.status_code, error=error.detail
+                )
+            )
+        else:
+            response.append(BatchSearchResult(query=item.query, max_results=item.max_results, result=result))
+    return response
 
 
 @router.get("/books/random")
-def get_random_book():
+async def get_random_book():
     """
     Get a random book from popular programming topics.
     """
@@ -45,7 +82,7 @@ def get_random_book():
         topics = ["python", "javascript", "java", "programming", "computer science"]
         topic = random.choice(topics)
 
-        result = books_service.process_books_data(topic, max_results=5)
+        result = await books_service.process_books_data(topic, max_results=5)
         if result.books:
             random_book = random.choice(result.books)
             return {
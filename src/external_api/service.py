@@ -1,9 +1,23 @@
-import requests
+import asyncio
+import os
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 
+import httpx
+from pydantic import TypeAdapter
+
+from core.resilience import AIMDLimiter, CircuitBreaker
+from core.single_flight import SingleFlight
+
+from . import keys
+from .http_client import GOOGLE_BOOKS_API_URL, get_http_client
 from .models import GoogleBooksResponse, ProcessedBook, ProcessedBooksResponse
 
 try:
-    from core.cache import cache_get, cache_set
+    from core.cache import cache_get, cache_get_many
+    from core.popularity import PopularityTracker
+    from core.response_cache import ResponseCache
+    from core.swr import StaleWhileRevalidate
 
     CACHE_AVAILABLE = True
     print("✅ Redis cache modules imported successfully")
@@ -13,48 +27,140 @@ except ImportError as e:
 
 print(f"🎯 Final cache status: {CACHE_AVAILABLE}")
 
+# Google Books віддає не більше 40 результатів за запит; більші вибірки збираємо з кількох сторінок
+PAGE_SIZE = 40
+FANOUT_MAX_RESULTS = int(os.getenv("GOOGLE_BOOKS_FANOUT_MAX_RESULTS", "400"))
+FANOUT_CONCURRENCY = int(os.getenv("GOOGLE_BOOKS_FANOUT_CONCURRENCY", "4"))
+# 0 - кешуємо лише сирі відповіді Google, оброблений вигляд будуємо з них при читанні (вдвічі менше пам'яті Redis)
+CACHE_PROCESSED = os.getenv("EXTERNAL_CACHE_PROCESSED", "1") == "1"
+# Скільки пошуків пакетного запиту, яких немає в кеші, виконуються одночасно
+BATCH_CONCURRENCY = int(os.getenv("GOOGLE_BOOKS_BATCH_CONCURRENCY", "4"))
+# Готові тіла відповідей /api/external/books; не довше за soft TTL, інакше оновлення кешу не дійде до клієнтів
+EXTERNAL_RESPONSE_TTL = int(os.getenv("EXTERNAL_RESPONSE_TTL", "30"))
+
+# Негативний кеш: порожні результати, відмови Google (4xx) і збої (429/5xx/мережа) живуть недовго і по-різному
+EXTERNAL_EMPTY_TTL = int(os.getenv("EXTERNAL_EMPTY_TTL", "300"))
+EXTERNAL_CLIENT_ERROR_TTL = int(os.getenv("EXTERNAL_CLIENT_ERROR_TTL", "60"))
+EXTERNAL_UPSTREAM_ERROR_TTL = int(os.getenv("EXTERNAL_UPSTREAM_ERROR_TTL", "5"))
+# ±частка TTL, щоб негативні записи для хвилі однакових запитів не зникали одночасно
+EXTERNAL_NEGATIVE_TTL_JITTER = float(os.getenv("EXTERNAL_NEGATIVE_TTL_JITTER", "0.2"))
+
+# Схема сторінки оброблених книг компілюється один раз, а не на кожен запит
+PROCESSED_BOOKS = TypeAdapter(List[ProcessedBook])
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Errors that mean Google is down or throttling us (a 404 or a bad query is not a failure)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def _jittered(ttl: float) -> float:
+    return ttl * random.uniform(1 - EXTERNAL_NEGATIVE_TTL_JITTER, 1 + EXTERNAL_NEGATIVE_TTL_JITTER)
+
+
+def empty_result_ttl(value) -> Optional[float]:
+    """Raw or processed result without books: cached for EXTERNAL_EMPTY_TTL instead of the usual window"""
+    if isinstance(value, dict) and not (value.get("items") or value.get("books")):
+        return _jittered(EXTERNAL_EMPTY_TTL)
+    return None
+
+
+def failure_ttl(error: Exception) -> Optional[float]:
+    """How long a failed fetch is remembered (None - not cached, e.g. an open breaker)"""
+    if is_upstream_failure(error):
+        return _jittered(EXTERNAL_UPSTREAM_ERROR_TTL)
+    if isinstance(error, httpx.HTTPStatusError):
+        return _jittered(EXTERNAL_CLIENT_ERROR_TTL)
+    return None
+
 
 class GoogleBooksService:
     """Service for interacting with Google Books API"""
 
-    base_url: str = "https://www.googleapis.com/books/v1/volumes"
+    base_url: str = GOOGLE_BOOKS_API_URL
 
-    async def search_books(self, query: str = "python programming", max_results: int = 10) -> GoogleBooksResponse:
+    def __init__(self):
+        # Один запит до upstream на ключ; решта чекає на його результат
+        self.single_flight = SingleFlight()
+        # Поки Google лежить чи обмежує нас - відмовляємо одразу замість очікування таймауту
+        self.breaker = CircuitBreaker("google_books", is_failure=is_upstream_failure)
+        self.limiter = AIMDLimiter("google_books", is_failure=is_upstream_failure)
+        # Після soft TTL запис віддаємо одразу, а оновлюємо у фоні
+        self.cache = (
+            StaleWhileRevalidate(self.single_flight, value_ttl=empty_result_ttl, error_ttl=failure_ttl)
+            if CACHE_AVAILABLE
+            else None
+        )
+        # Частота запитів для прогріву кешу (external_api.warmer)
+        self.popularity = PopularityTracker("external_books") if CACHE_AVAILABLE else None
+        self.responses = ResponseCache(EXTERNAL_RESPONSE_TTL) if CACHE_AVAILABLE else None
+
+    async def _cached(self, cache_key: str, fetch, fallback=None, found: Optional[Dict[str, Any]] = None):
+        if self.cache is None:
+            return await self.single_flight.do(cache_key, fetch)
+        if found is not None:
+            # Ключ уже прочитано одним MGET з рештою пакета - вдруге в Redis не йдемо
+            return await self.cache.from_entry(cache_key, found.get(cache_key), fetch, fallback=fallback)
+        return await self.cache.get(cache_key, fetch, fallback=fallback)
+
+    async def _cached_superset(self, query: str, max_results: int):
+        """Slice a fresh cached response for a larger max_results instead of calling the API"""
+        candidates = [keys.cache_key("raw", query, size) for size in keys.superset_sizes(max_results)]
+        if not candidates:
+            return None
+        found = await cache_get_many(candidates)
+        for key in candidates:
+            data = self.cache.fresh_value(found.get(key))
+            if data is not None:
+                print(f"📚 Serving {max_results} results from cached {key}")
+                return {**data, "items": data.get("items", [])[:max_results]}
+        return None
+
+    async def search_books(
+        self, query: str = "python programming", max_results: int = 10, start_index: int = 0
+    ) -> GoogleBooksResponse:
         """
         Search books using Google Books API
         """
+        return GoogleBooksResponse.model_validate(await self._search_raw(query, max_results, start_index))
+
+    async def _search_raw(
+        self, query: str, max_results: int, start_index: int = 0, found: Optional[Dict[str, Any]] = None
+    ) -> dict:
+        """Raw API response from cache or Google; validated once before it is cached"""
         print(f"🔍 Searching books: '{query}', max_results: {max_results}, cache: {CACHE_AVAILABLE}")
 
-        # Ключ для кешу
-        cache_key = f"books:raw:{query}:{max_results}"
-
-        # Перевіряємо кеш
-        if CACHE_AVAILABLE:
-            try:
-                cached = await cache_get(cache_key)
-                if cached:
-                    print("📚 Returning cached raw books data")
-                    return GoogleBooksResponse(**cached)
-                else:
-                    print("💡 No cache found, fetching from API")
-            except Exception as e:
-                print(f"⚠️ Cache get error: {e}")
+        # Нормалізований запит: "Python", " python " і "python" - один ключ і один запит до API
+        query = keys.normalize_query(query)
+        cache_key = keys.cache_key("raw", query, max_results, start=start_index or None)
+
+        return await self._cached(
+            cache_key,
+            lambda: self._fetch_raw(query, max_results, start_index),
+            # Обрізати більшу відповідь можна лише для першої сторінки
+            fallback=None if start_index else lambda: self._cached_superset(query, max_results),
+            found=found,
+        )
 
+    async def _fetch_raw(self, query: str, max_results: int, start_index: int = 0) -> dict:
         params = {"q": query, "maxResults": max_results, "printType": "books"}
+        if start_index:
+            params["startIndex"] = start_index
 
-        response = requests.get(self.base_url, params=params, timeout=10)
-        response.raise_for_status()
+        response = await self.breaker.call(lambda: self.limiter.run(lambda: self._get(params)))
+        print("🌐 Fetched books data from Google Books API")
         data = response.json()
+        # Перевіряємо відповідь до запису в кеш - далі кешованим даним довіряємо без повторної валідації
+        GoogleBooksResponse.model_validate(data)
+        return data
 
-        # Зберігаємо в кеш
-        if CACHE_AVAILABLE:
-            try:
-                await cache_set(cache_key, data, 60)
-                print("💾 Cached raw books data")
-            except Exception as e:
-                print(f"⚠️ Cache set error: {e}")
-
-        return GoogleBooksResponse(**data)
+    async def _get(self, params: dict) -> httpx.Response:
+        # Спільний async-клієнт: event loop не блокується, з'єднання перевикористовуються
+        response = await get_http_client().get(self.base_url, params=params)
+        response.raise_for_status()
+        return response
 
     async def process_books_data(
         self, query: str = "python programming", max_results: int = 10
@@ -62,66 +168,177 @@ class GoogleBooksService:
         """
         Process and transform books data
         """
+        if max_results > PAGE_SIZE:
+            books = [book async for book in self.stream_books(query, max_results)]
+            return ProcessedBooksResponse(total_books=len(books), books=books)
+
+        query = keys.normalize_query(query)
+        self.record_request(query, max_results)
+        return await self._process_page(query, max_results)
+
+    async def _process_page(
+        self, query: str, max_results: int, found: Optional[Dict[str, Any]] = None
+    ) -> ProcessedBooksResponse:
+        """One page (max_results <= PAGE_SIZE) of a normalized query; found - entries already read by MGET"""
+        if not CACHE_PROCESSED:
+            # Оброблений вигляд будуємо з кешованої сирої відповіді
+            return self._processed_response(self._process_raw(await self._search_raw(query, max_results, found=found)))
+
         # Ключ для кешу оброблених даних
-        cache_key = f"books:processed:{query}:{max_results}"
+        cache_key = keys.cache_key("processed", query, max_results)
+        data = await self._cached(cache_key, lambda: self._build_processed(query, max_results), found=found)
+        return self._processed_response(data["books"])
 
-        # Перевіряємо кеш
-        if CACHE_AVAILABLE:
-            try:
-                cached = await cache_get(cache_key)
-                if cached:
-                    print("📚 Returning cached processed books data")
-                    return ProcessedBooksResponse(**cached)
-            except Exception as e:
-                print(f"⚠️ Cache get error: {e}")
+    async def process_books_batch(
+        self, searches: List[Tuple[str, int]]
+    ) -> List[Union[ProcessedBooksResponse, Exception]]:
+        """
+        Processed results for many searches, in the same order: all cache keys are read in one round
+        trip, the rest run concurrently (at most BATCH_CONCURRENCY); a failed search returns its exception
+        """
+        searches = [(keys.normalize_query(query), max_results) for query, max_results in searches]
+        results: List[Union[ProcessedBooksResponse, Exception, None]] = [None] * len(searches)
+        found = None
+
+        if self.cache is not None:
+            cache_keys = [self.warm_key(query, max_results) for query, max_results in searches]
+            found = await cache_get_many(key for key, (_, size) in zip(cache_keys, searches) if size <= PAGE_SIZE)
+            for i, ((query, max_results), key) in enumerate(zip(searches, cache_keys)):
+                data = self.cache.fresh_value(found.get(key))
+                if data is None:
+                    continue
+                self.popularity.record(keys.popularity_member(query, max_results))
+                results[i] = self._processed_response(data["books"] if CACHE_PROCESSED else self._process_raw(data))
+
+        # Промахи і застарілі записи - звичайним шляхом (SWR, single-flight, fan-out), але з уже прочитаним записом
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def run(i: int) -> None:
+            query, max_results = searches[i]
+            async with semaphore:
+                try:
+                    if found is None or max_results > PAGE_SIZE:
+                        results[i] = await self.process_books_data(query, max_results)
+                    else:
+                        self.record_request(query, max_results)
+                        results[i] = await self._process_page(query, max_results, found)
+                except Exception as e:
+                    results[i] = e
+
+        await asyncio.gather(*(run(i) for i, result in enumerate(results) if result is None))
+        return results
+
+    async def _build_processed(self, query: str, max_results: int) -> dict:
+        if self.cache is None:
+            raw = await self._search_raw(query, max_results)
+        else:
+            # Лише свіжий сирий запис: із застарілого оброблений отримав би ще один повний soft TTL
+            raw_key = keys.cache_key("raw", query, max_results)
+            raw = self.cache.fresh_value(await cache_get(raw_key))
+            if raw is None:
+                raw = await self._cached_superset(query, max_results)
+            if raw is None:
+                raw = await self.cache.refresh(raw_key, lambda: self._fetch_raw(query, max_results))
+        books = self._process_raw(raw)
+        return {"total_books": len(books), "books": books}
+
+    def record_request(self, query: str, max_results: int) -> None:
+        """Count a processed search for warming (also for responses served from the response cache)"""
+        if self.popularity is not None and max_results <= PAGE_SIZE:
+            self.popularity.record(keys.popularity_member(query, max_results))
+
+    @staticmethod
+    def response_key(query: str, max_results: int) -> str:
+        return keys.cache_key("response", query, max_results)
+
+    def warm_key(self, query: str, max_results: int) -> str:
+        """Cache key that process_books_data reads for this query"""
+        return keys.cache_key("processed" if CACHE_PROCESSED else "raw", query, max_results)
+
+    async def warm(self, query: str, max_results: int) -> None:
+        """Re-fetch a search from Google (one upstream request) and rewrite its raw and processed entries"""
+        query = keys.normalize_query(query)
+        await self.cache.refresh(keys.cache_key("raw", query, max_results), lambda: self._fetch_raw(query, max_results))
+        if CACHE_PROCESSED:
+            # Сирий запис щойно оновлено - оброблений будується з нього без запиту до Google
+            await self.cache.refresh(
+                keys.cache_key("processed", query, max_results), lambda: self._build_processed(query, max_results)
+            )
+
+    async def stream_books(self, query: str, max_results: int) -> AsyncIterator[ProcessedBook]:
+        """
+        Fetch startIndex pages concurrently (at most FANOUT_CONCURRENCY at a time) and yield
+        books deduplicated by id, in page order, as soon as each page arrives
+        """
+        max_results = min(max_results, FANOUT_MAX_RESULTS)
+        semaphore = asyncio.Semaphore(FANOUT_CONCURRENCY)
+
+        async def fetch_page(start: int, size: int) -> dict:
+            async with semaphore:
+                return await self._search_raw(query, size, start_index=start)
+
+        pages = [(start, min(PAGE_SIZE, max_results - start)) for start in range(0, max_results, PAGE_SIZE)]
+        tasks = [asyncio.create_task(fetch_page(start, size)) for start, size in pages]
+        seen = set()
+        try:
+            for (start, size), task in zip(pages, tasks):
+                raw_data = await task
+                for book in PROCESSED_BOOKS.validate_python(self._process_raw(raw_data)):
+                    if book.id not in seen:
+                        seen.add(book.id)
+                        yield book
+                # Google віддає короткі сторінки й посеред вибірки, тож кінець - лише порожня сторінка або totalItems
+                total_items = raw_data.get("totalItems")
+                if not raw_data.get("items") or (isinstance(total_items, int) and start + size >= total_items):
+                    # Результати закінчились - решту сторінок не чекаємо
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
-        raw_data = await self.search_books(query, max_results)
+    @staticmethod
+    def _processed_response(books: List[dict]) -> ProcessedBooksResponse:
+        # Одна валідація плоских словників у pydantic-core швидша за model_construct на кожну книгу
+        return ProcessedBooksResponse.model_validate({"total_books": len(books), "books": books})
 
+    @staticmethod
+    def _process_raw(raw_data: dict) -> List[dict]:
+        """
+        ProcessedBook fields for each item of a validated raw response, in one pass over plain dicts
+        (links stay strings instead of a round trip through HttpUrl)
+        """
         processed_books = []
 
-        for book in raw_data.items:
-            volume_info = book.volumeInfo
+        for book in raw_data.get("items") or []:
+            volume_info = book["volumeInfo"]
 
             # Extract publication year
             published_year = None
-            if volume_info.publishedDate:
+            published_date = volume_info.get("publishedDate")
+            if published_date:
                 try:
-                    published_year = int(volume_info.publishedDate[:4])
-                except (ValueError, TypeError):
+                    published_year = int(published_date[:4])
+                except ValueError:
                     published_year = None
 
-            thumbnail = None
-            if volume_info.imageLinks and volume_info.imageLinks.get("thumbnail"):
-                thumbnail = volume_info.imageLinks["thumbnail"]
-
-            categories = volume_info.categories or []
+            image_links = volume_info.get("imageLinks") or {}
 
-            authors = volume_info.authors or ["Unknown Author"]
-
-            processed_book = ProcessedBook(
-                id=book.id,
-                title=volume_info.title,
-                authors=authors,
-                published_year=published_year,
-                page_count=volume_info.pageCount,
-                categories=categories,
-                thumbnail=thumbnail,
-                preview_link=str(volume_info.previewLink) if volume_info.previewLink else None,
-                language=volume_info.language,
+            processed_books.append(
+                {
+                    "id": book["id"],
+                    "title": volume_info["title"],
+                    "authors": volume_info.get("authors") or ["Unknown Author"],
+                    "published_year": published_year,
+                    "page_count": volume_info.get("pageCount"),
+                    "categories": volume_info.get("categories") or [],
+                    "thumbnail": image_links.get("thumbnail") or None,
+                    "preview_link": volume_info.get("previewLink") or None,
+                    "language": volume_info.get("language"),
+                }
             )
-            processed_books.append(processed_book)
-
-        result = ProcessedBooksResponse(total_books=len(processed_books), books=processed_books)
-
-        # Зберігаємо оброблені дані в кеш
-        if CACHE_AVAILABLE:
-            try:
-                await cache_set(cache_key, result.dict(), 60)
-                print("💾 Cached processed books data")
-            except Exception as e:
-                print(f"⚠️ Cache set error: {e}")
 
-        return result
+        return processed_books
 
 
 books_service = GoogleBooksService()
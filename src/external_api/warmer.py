@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+from core.cache import cache_lock
+
+from . import keys
+from .service import CACHE_AVAILABLE, GoogleBooksService, books_service
+
+# Скільки найпопулярніших пошуків тримати теплими (0 - прогрів вимкнено)
+EXTERNAL_WARM_TOP_K = int(os.getenv("EXTERNAL_WARM_TOP_K", "200"))
+EXTERNAL_WARM_INTERVAL = float(os.getenv("EXTERNAL_WARM_INTERVAL", "10"))
+# Оновлюємо запис, якщо до кінця його soft TTL лишилось менше стількох секунд
+EXTERNAL_WARM_LEAD = float(os.getenv("EXTERNAL_WARM_LEAD", "15"))
+# Не більше стількох запитів до Google за один цикл прогріву
+EXTERNAL_WARM_BUDGET = int(os.getenv("EXTERNAL_WARM_BUDGET", "20"))
+
+WARMER_LOCK = "lock:external:warmer"
+
+
+class CacheWarmer:
+    """
+    Re-fetches the most requested external searches shortly before their cache entries go stale.
+    Every worker flushes its popularity counts each interval; one worker per interval (Redis lock)
+    walks the top-K, hottest first, until the upstream request budget is spent.
+    """
+
+    def __init__(
+        self,
+        service: GoogleBooksService,
+        top_k: int = EXTERNAL_WARM_TOP_K,
+        interval: float = EXTERNAL_WARM_INTERVAL,
+        lead: float = EXTERNAL_WARM_LEAD,
+        budget: int = EXTERNAL_WARM_BUDGET,
+    ):
+        self.service = service
+        self.top_k = top_k
+        self.interval = interval
+        self.lead = lead
+        self.budget = budget
+        # Пошуки, прогріті цим воркером, і до якого часу їхній запис свіжий
+        self._warm_until: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.warmed = 0
+        self.failures = 0
+        self.over_budget = 0
+        self.spent = 0
+        self.requests = 0
+        self.warm_hits = 0
+
+    async def run_once(self) -> None:
+        tracker = self.service.popularity
+        now = time.time()
+        for member, count in (await tracker.flush()).items():
+            self.requests += count
+            if self._warm_until.get(member, 0) > now:
+                self.warm_hits += count
+
+        if await cache_lock(WARMER_LOCK, max(int(self.interval), 1)) is None:
+            # Цей цикл прогріває інший воркер; лок не знімаємо - він сам протухне до наступного циклу
+            return
+        self.cycles += 1
+        self._warm_until = {member: until for member, until in self._warm_until.items() if until > now}
+
+        budget = self.budget
+        for member, _ in await tracker.top(self.top_k):
+            query, max_results = keys.parse_popularity_member(member)
+            cache_key = self.service.warm_key(query, max_results)
+            left = await self.service.cache.soft_ttl_left(cache_key)
+            if left is not None and left > self.lead:
+                continue
+            if budget <= 0:
+                self.over_budget += 1
+                continue
+            budget -= 1
+            self.spent += 1
+            try:
+                await self.service.warm(query, max_results)
+                self.warmed += 1
+                self._warm_until[member] = time.time() + self.service.cache.window(cache_key)[0]
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️ Cache warming failed for '{query}': {e}")
+        await tracker.decay()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Cache warmer error: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print(f"✅ Cache warmer started: top {self.top_k}, budget {self.budget} per {self.interval:g}s")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "cycles": self.cycles,
+            "warmed": self.warmed,
+            "failures": self.failures,
+            # Запити до Google, витрачені на прогрів, і пропущені через вичерпаний бюджет
+            "upstream_requests": self.spent,
+            "budget_per_cycle": self.budget,
+            "over_budget": self.over_budget,
+            "tracked_requests": self.requests,
+            # Частка запитів до популярних пошуків, що прийшли на прогрітий цим воркером запис
+            "hit_ratio": round(self.warm_hits / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+cache_warmer = CacheWarmer(books_service)
+
+
+async def start_cache_warmer() -> None:
+    """Start the warming loop (called from the app lifespan); needs Redis for the shared top-K"""
+    if CACHE_AVAILABLE and EXTERNAL_WARM_TOP_K > 0 and os.getenv("REDIS_URL"):
+        cache_warmer.start()
+
+
+async def stop_cache_warmer() -> None:
+    await cache_warmer.stop()
@@ -6,24 +6,38 @@ sys.path.append(current_dir)
 
 from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from books.database import engine, get_db
+from books.async_routes import router as async_books_router
+from books.database import BOOKS_ASYNC_DB, check_connection, get_db, get_engine
+from books.ddl import SchemaNotMigrated, check_schema
 from books.routes import router
+from core.cache import start_disk_cache, start_invalidation_listener, stop_disk_cache, stop_invalidation_listener
 from core.logging.logging_config import setup_logging
 from core.logging.sentry import init_sentry
+from core.redis_client import close_redis, start_redis
 from core.router import router as core_router
 
 try:
+    from external_api.http_client import close_http_client, start_http_client
     from external_api.models import ProcessedBooksResponse
-    from external_api.service import CACHE_AVAILABLE, books_service
+    from external_api.router import router as external_router
+    from external_api.router import upstream_error
+    from external_api.service import CACHE_AVAILABLE, FANOUT_MAX_RESULTS, books_service
+    from external_api.warmer import cache_warmer, start_cache_warmer, stop_cache_warmer
 
     EXTERNAL_API_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ External API modules not available: {e}")
     EXTERNAL_API_AVAILABLE = False
 
+# Пропустити лише огляд БД при старті (check_connection і has_table). Схему цей прапорець не чіпає:
+# її змінює тільки `alembic upgrade head` (migrations/), який CMD у Dockerfile запускає перед uvicorn,
+# а перевірка міграції (check_schema) виконується завжди
+SKIP_SCHEMA_INSPECTION = os.getenv("SKIP_SCHEMA_INSPECTION", "false").lower() in ("1", "true", "yes")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -36,25 +50,41 @@ async def lifespan(app: FastAPI):
 
     init_sentry()
 
-    try:
-        from sqlalchemy import inspect
+    if SKIP_SCHEMA_INSPECTION:
+        print("⏭️ Schema inspection skipped (SKIP_SCHEMA_INSPECTION)")
+    else:
+        try:
+            from sqlalchemy import inspect
 
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
-        print(f"📋 Available tables: {tables}")
+            check_connection()
+            engine = get_engine()
+            # has_table - один запит по конкретній таблиці замість переліку всіх таблиць
+            if inspect(engine).has_table("books"):
+                print("Books table exists and ready to use!")
+            else:
+                print(" Books table not found, but other tables exist")
 
-        if "books" in tables:
-            print("Books table exists and ready to use!")
-        else:
-            print(" Books table not found, but other tables exist")
+        except Exception as e:
+            print(f" Database inspection failed: {e}")
 
+    # Без міграції не стартуємо: запити до books падали б, а ETag списків не змінювались би ніколи
+    try:
+        check_schema(get_engine())
+    except SchemaNotMigrated:
+        raise
     except Exception as e:
-        print(f" Database inspection failed: {e}")
+        print(f"⚠️ Books schema check failed: {e}")
 
     print(" Connected to Render.com PostgreSQL")
     print(" Database: hpk_db_nyor")
 
+    await start_redis()
+    await start_disk_cache()
+    await start_invalidation_listener()
+
     if EXTERNAL_API_AVAILABLE:
+        await start_http_client()
+        await start_cache_warmer()
         print(" External APIs: Google Books API")
         if CACHE_AVAILABLE:
             print(" Cache: Redis enabled")
@@ -72,6 +102,16 @@ async def lifespan(app: FastAPI):
 
     print(" Shutting down Bookstore API...")
 
+    if EXTERNAL_API_AVAILABLE:
+        await stop_cache_warmer()
+
+    await stop_invalidation_listener()
+    await stop_disk_cache()
+    await close_redis()
+
+    if EXTERNAL_API_AVAILABLE:
+        await close_http_client()
+
 
 app = FastAPI(
     title="Bookstore API",
@@ -81,8 +121,8 @@ app = FastAPI(
     lifespan=lifespan,  # Додайте lifespan тут
 )
 
-# Підключаємо всі роути
-app.include_router(router)
+# Підключаємо всі роути; books - sync або async реалізація залежно від BOOKS_ASYNC_DB
+app.include_router(async_books_router if BOOKS_ASYNC_DB else router)
 app.include_router(core_router)  # Додайте цей рядок
 
 
@@ -105,8 +145,11 @@ async def root():
             {
                 "search_books": "/api/external/books",
                 "search_books_raw": "/api/external/books/raw",
+                "search_books_stream": "/api/external/books/stream",
+                "search_books_batch": "/api/external/books/batch",
                 "external_health": "/api/external/health",
                 "cache_test": "/api/external/cache-test",
+                "external_stats": "/api/external/stats",
             }
         )
 
@@ -193,17 +236,55 @@ def database_info(db: Session = Depends(get_db)):
 
 
 if EXTERNAL_API_AVAILABLE:
+    # /api/external/data, /processed, /books/batch, /books/random
+    app.include_router(external_router, prefix="/api")
 
     @app.get("/api/external/books", response_model=ProcessedBooksResponse)
-    async def search_books(query: str = "python programming", max_results: int = 10):
+    async def search_books(request: Request, query: str = "python programming", max_results: int = 10):
         """
         Пошук книг через Google Books API з кешуванням
         """
+        responses = books_service.responses
+        # Готове (і вже стиснене) тіло з кешу відповідей: без json.loads, валідації моделі й рендерингу JSON
+        response_key = books_service.response_key(query, max_results)
+        if responses is not None:
+            cached = await responses.get(response_key, request)
+            if cached is not None:
+                books_service.record_request(query, max_results)
+                return cached
         try:
             result = await books_service.process_books_data(query=query, max_results=max_results)
+        except Exception as e:
+            raise upstream_error(e)
+        if responses is None:
             return result
+        return await responses.store(response_key, request, result.model_dump_json().encode())
+
+    @app.get("/api/external/books/stream")
+    async def stream_external_books(
+        query: str = "python programming",
+        max_results: int = Query(100, ge=1, le=FANOUT_MAX_RESULTS),
+    ):
+        """
+        Великі вибірки: сторінки Google Books завантажуються паралельно, книги віддаються як NDJSON
+        """
+        books = books_service.stream_books(query=query, max_results=max_results)
+        # Першу сторінку чекаємо до відповіді, щоб помилка upstream стала 500, а не обірваним потоком
+        try:
+            first = await books.__anext__()
+        except StopAsyncIteration:
+            first = None
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Помилка при пошуку книг: {str(e)}")
+            raise upstream_error(e)
+
+        async def ndjson():
+            if first is None:
+                return
+            yield first.model_dump_json() + "\n"
+            async for book in books:
+                yield book.model_dump_json() + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
     @app.get("/api/external/books/raw")
     async def search_books_raw(query: str = "python programming", max_results: int = 10):
@@ -214,33 +295,41 @@ if EXTERNAL_API_AVAILABLE:
             result = await books_service.search_books(query=query, max_results=max_results)
             return result
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Помилка при пошуку книг: {str(e)}")
+            raise upstream_error(e)
 
     @app.get("/api/external/health")
     async def external_apis_health():
         """
-        Перевірка стану зовнішніх API
+        Перевірка стану зовнішніх API за станом запобіжника, без запиту до Google
         """
-        try:
-            _ = await books_service.search_books(query="test", max_results=1)
-
-            return {
-                "status": "healthy",
-                "external_apis": {"google_books": {"status": "available", "test_query": "successful"}},
-                "cache": {
-                    "redis": "enabled" if CACHE_AVAILABLE else "disabled",
-                    "ttl": "60 seconds" if CACHE_AVAILABLE else "N/A",
-                },
-            }
-        except Exception as e:
-            return {
-                "status": "degraded",
-                "external_apis": {"google_books": {"status": "unavailable", "error": str(e)}},
-                "cache": {
-                    "redis": "enabled" if CACHE_AVAILABLE else "disabled",
-                    "ttl": "60 seconds" if CACHE_AVAILABLE else "N/A",
-                },
-            }
+        breaker = books_service.breaker.stats()
+        google_books = {"status": "available" if breaker["state"] == "closed" else "unavailable", **breaker}
+        return {
+            "status": "healthy" if breaker["state"] == "closed" else "degraded",
+            "external_apis": {"google_books": google_books},
+            "concurrency": books_service.limiter.stats(),
+            "cache": {
+                "redis": "enabled" if CACHE_AVAILABLE else "disabled",
+                "ttl": "60 seconds" if CACHE_AVAILABLE else "N/A",
+            },
+        }
+
+    @app.get("/api/external/stats")
+    async def external_apis_stats():
+        """
+        Лічильники звернень до Google Books API (скільки запитів об'єднано в один)
+        """
+        stats = {
+            "single_flight": books_service.single_flight.stats(),
+            "breaker": books_service.breaker.stats(),
+            "limiter": books_service.limiter.stats(),
+            "warmer": cache_warmer.stats(),
+        }
+        if books_service.responses is not None:
+            stats["responses"] = books_service.responses.stats()
+        if books_service.cache is not None:
+            stats["cache"] = books_service.cache.stats()
+        return stats
 
     @app.get("/api/external/cache-test")
     async def cache_test():
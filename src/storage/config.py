@@ -1,6 +1,5 @@
 import os
 
-from azure.storage.blob import BlobServiceClient
 from dotenv import load_dotenv
 
 
@@ -18,6 +17,8 @@ class AzureConfig:
     def blob_service_client(self):
         """Initialize and return the Azure BlobServiceClient."""
         if not self._blob_service_client:
+            from azure.storage.blob import BlobServiceClient
+
             self._blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
         return self._blob_service_client
 
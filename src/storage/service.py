@@ -6,8 +6,10 @@ from .config import azure_config
 class StorageService:
     """Business logic for working with Azure Blob Storage."""
 
-    def __init__(self):
-        self.container_client = azure_config.container_client
+    @property
+    def container_client(self):
+        """Azure client is created on the first storage call, not at import time."""
+        return azure_config.container_client
 
     def upload_file(self, file):
         """Upload file to Azure container."""
@@ -2,8 +2,14 @@ import asyncio
 import os
 
 import fakeredis.aioredis
+import httpx
 import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
 
 from src.main import app
 
@@ -16,12 +22,69 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture
+def db_session():
+    """SQLite-сесія в пам'яті для тестів CRUD"""
+    from books.ddl import migrate
+    from books.models import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    migrate(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def books_client(client, db_session):
+    """Тестовий клієнт, де роути books працюють з SQLite-сесією"""
+    from books.database import get_db
+
+    app.dependency_overrides[get_db] = lambda: db_session
+    yield client
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture
+def async_books_client(tmp_path):
+    """Тестовий клієнт для async-роутів books на aiosqlite"""
+    from books.async_routes import router
+    from books.database import get_async_db
+    from books.ddl import migrate
+    from books.models import Base
+
+    db_path = tmp_path / "books.db"
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(sync_engine)
+    migrate(sync_engine)
+    sync_engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    test_app = FastAPI()
+    test_app.include_router(router)
+    test_app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(test_app) as test_client:
+        yield test_client
+
+
 @pytest.fixture
 def fake_redis(monkeypatch):
     """Фейковий Redis для тестування кешу"""
-    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    from core.cache import l1
+
+    redis = fakeredis.aioredis.FakeRedis()
 
     monkeypatch.setattr("src.core.redis_client.get_redis", lambda: redis)
+    # L1 живе на рівні модуля - копії з попередніх тестів не повинні протікати
+    l1.clear()
 
     return redis
 
@@ -32,3 +95,56 @@ def event_loop():
     loop = asyncio.get_event_loop_policy().new_event_loop()
     yield loop
     loop.close()
+
+
+@pytest.fixture
+def book_cache(monkeypatch, fake_redis):
+    """Кеш книг з Redis на fakeredis і in-process рівнем"""
+    from books.cache import BookCache
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    cache = BookCache(local_size=100)
+    cache.redis_enabled = True
+    monkeypatch.setattr("books.handlers.book_cache", cache)
+    return cache
+
+
+GOOGLE_BOOKS_STUB = {
+    "kind": "books#volumes",
+    "totalItems": 1,
+    "items": [
+        {
+            "id": "stub-1",
+            "volumeInfo": {"title": "Stub Book", "authors": ["Stub Author"], "publishedDate": "2020-01-01"},
+        }
+    ],
+}
+
+
+@pytest.fixture
+def mock_google_books(monkeypatch):
+    """Підміняє Google Books API обробником на httpx.MockTransport; один клієнт на тест, закривається після нього"""
+    clients = []
+
+    def install(handler) -> None:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        clients.append(client)
+        monkeypatch.setattr("external_api.service.get_http_client", lambda: client)
+
+    yield install
+    for client in clients:
+        asyncio.run(client.aclose())
+
+
+@pytest.fixture
+def google_books_stub(monkeypatch, fake_redis, mock_google_books):
+    """Google Books API на httpx.MockTransport замість мережі; повертає список запитів до API"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json=GOOGLE_BOOKS_STUB)
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    mock_google_books(handler)
+    return calls
@@ -1,3 +1,8 @@
+import asyncio
+import base64
+import json
+
+
 def test_root_endpoint(client):
     """Тест головної сторінки"""
     response = client.get("/")
@@ -5,3 +10,325 @@ def test_root_endpoint(client):
     data = response.json()
     assert "message" in data
     assert "endpoints" in data
+
+
+def _create_books(client, count, start=0):
+    for i in range(start, start + count):
+        response = client.post("/books/", json={"title": f"Book {i}", "author": "Author", "isbn": f"isbn-{i}"})
+        assert response.status_code == 201
+
+
+def test_books_cursor_pagination(books_client):
+    """Тест keyset-пагінації через X-Next-Cursor"""
+    _create_books(books_client, 5)
+
+    first = books_client.get("/books/?limit=2")
+    assert [b["isbn"] for b in first.json()] == ["isbn-0", "isbn-1"]
+    cursor = first.headers["X-Next-Cursor"]
+
+    # Нові записи не зсувають наступні сторінки
+    _create_books(books_client, 1, start=5)
+
+    second = books_client.get(f"/books/?limit=2&cursor={cursor}")
+    assert [b["isbn"] for b in second.json()] == ["isbn-2", "isbn-3"]
+
+    third = books_client.get(f"/books/?limit=3&cursor={second.headers['X-Next-Cursor']}")
+    assert [b["isbn"] for b in third.json()] == ["isbn-4", "isbn-5"]
+    assert "X-Next-Cursor" not in third.headers
+
+
+def test_books_invalid_cursor(books_client):
+    """Тест некоректного курсора"""
+    response = books_client.get("/books/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+    # Коректний base64 і JSON, але id - булеве значення
+    cursor = base64.urlsafe_b64encode(b'{"id":true}').decode().rstrip("=")
+    assert books_client.get(f"/books/?cursor={cursor}").status_code == 400
+
+
+def test_books_search(books_client):
+    """Тест пошуку по назві та автору через FTS-індекс"""
+    books = [
+        ("Learning Python", "Mark Lutz", "s-1"),
+        ("Fluent Python", "Luciano Ramalho", "s-2"),
+        ("Clean Code", "Robert Martin", "s-3"),
+    ]
+    for title, author, isbn in books:
+        books_client.post("/books/", json={"title": title, "author": author, "isbn": isbn})
+
+    response = books_client.get("/books/search/python")
+    assert response.status_code == 200
+    assert {b["isbn"] for b in response.json()} == {"s-1", "s-2"}
+
+    # Підрядок всередині слова, як і з ILIKE '%q%'
+    assert [b["isbn"] for b in books_client.get("/books/search/mart").json()] == ["s-3"]
+    assert len(books_client.get("/books/search/python?limit=1").json()) == 1
+
+    # Короткі запити обробляються без індексу
+    assert {b["isbn"] for b in books_client.get("/books/search/lu").json()} == {"s-1", "s-2"}
+
+    assert [b["isbn"] for b in books_client.get("/books/author/ramalho").json()] == ["s-2"]
+
+
+def test_books_bulk_import_json(books_client):
+    """Тест масового імпорту з JSON-масиву"""
+    _create_books(books_client, 1)
+    rows = [
+        {"title": "New", "author": "A", "isbn": "bulk-1"},
+        {"title": "Existing", "author": "A", "isbn": "isbn-0"},
+        {"title": "Repeat", "author": "A", "isbn": "bulk-1"},
+        {"title": "No ISBN", "author": "A"},
+        {"title": "Second", "author": "B", "isbn": "bulk-2"},
+    ]
+    response = books_client.post("/books/bulk?chunk_size=2", json=rows)
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["status"] for r in data["results"]] == ["created", "duplicate", "duplicate", "invalid", "created"]
+    assert data["created"] == 2
+    assert data["rows_per_second"] > 0
+    assert books_client.get("/books/isbn/bulk-2").json()["id"] == data["results"][4]["id"]
+
+
+def test_books_bulk_import_ndjson(books_client):
+    """Тест масового імпорту з NDJSON-потоку"""
+    body = (
+        '{"title": "One", "author": "A", "isbn": "nd-1"}\nnot json\n\n{"title": "Two", "author": "A", "isbn": "nd-2"}'
+    )
+    response = books_client.post("/books/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["created", "invalid", "created"]
+
+    assert books_client.post("/books/bulk", json={"title": "One"}).status_code == 400
+
+
+def test_async_books_routes(async_books_client):
+    """Тест async-реалізації роутів books"""
+    client = async_books_client
+    _create_books(client, 3)
+    assert client.post("/books/", json={"title": "Dup", "author": "A", "isbn": "isbn-0"}).status_code == 400
+
+    first = client.get("/books/?limit=2")
+    second = client.get(f"/books/?limit=2&cursor={first.headers['X-Next-Cursor']}")
+    assert [b["isbn"] for b in second.json()] == ["isbn-2"]
+
+    book_id = client.get("/books/isbn/isbn-1").json()["id"]
+    assert client.get(f"/books/{book_id}").json()["title"] == "Book 1"
+    assert len(client.get("/books/search/book").json()) == 3
+
+    bulk = client.post("/books/bulk", json=[{"title": "Bulk", "author": "B", "isbn": "isbn-9"}]).json()
+    assert bulk["created"] == 1
+
+    updated = client.put(f"/books/{book_id}", json={"title": "Renamed"})
+    assert updated.json()["title"] == "Renamed"
+    assert client.get(f"/books/{book_id}", headers={"If-None-Match": updated.headers["ETag"]}).status_code == 304
+    assert client.delete(f"/books/{book_id}").status_code == 200
+    assert client.get(f"/books/{book_id}").status_code == 404
+
+
+def test_books_export(books_client):
+    """Тест потокового експорту каталогу"""
+    _create_books(books_client, 3)
+
+    response = books_client.get("/books/export", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["isbn"] for line in lines] == ["isbn-0", "isbn-1", "isbn-2"]
+
+    response = books_client.get("/books/export?format=csv", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    rows = response.text.splitlines()
+    assert rows[0] == "id,title,author,year,isbn,created_at"
+    assert len(rows) == 4
+
+
+def test_async_books_export(async_books_client):
+    """Тест потокового експорту в async-режимі"""
+    _create_books(async_books_client, 2)
+    response = async_books_client.get("/books/export")
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 2
+
+
+def test_book_cache_never_serves_stale_after_update(books_client, book_cache):
+    """Після оновлення кеш не віддає стару версію книги ні за id, ні за ISBN"""
+    book = books_client.post("/books/", json={"title": "Old", "author": "A", "isbn": "old-isbn"}).json()
+
+    assert books_client.get(f"/books/{book['id']}").json()["title"] == "Old"
+    assert books_client.get("/books/isbn/old-isbn").json()["title"] == "Old"
+    assert books_client.get(f"/books/{book['id']}").json()["title"] == "Old"
+    stats = books_client.get("/books/cache/stats").json()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+    response = books_client.put(f"/books/{book['id']}", json={"title": "New", "isbn": "new-isbn"})
+    assert response.status_code == 200
+
+    assert books_client.get(f"/books/{book['id']}").json()["title"] == "New"
+    assert books_client.get("/books/isbn/new-isbn").json()["title"] == "New"
+    assert books_client.get("/books/isbn/old-isbn").status_code == 404
+
+    # Навіть без інвалідації застарілий ISBN-вказівник не віддає чужу книгу
+    book_cache._local.clear()
+    book_cache._local_set(book_cache.isbn_key("old-isbn"), book["id"], 60)
+    assert books_client.get("/books/isbn/old-isbn").status_code == 404
+
+
+def test_books_conditional_get(books_client):
+    """Тест ETag / If-None-Match для книги та списку"""
+    book = books_client.post("/books/", json={"title": "Etag", "author": "A", "isbn": "etag-1"}).json()
+
+    first = books_client.get(f"/books/{book['id']}")
+    etag = first.headers["ETag"]
+    not_modified = books_client.get(f"/books/{book['id']}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    updated = books_client.put(f"/books/{book['id']}", json={"title": "Etag 2"})
+    assert updated.json()["version"] == 2
+    assert updated.headers["ETag"] != etag
+    assert books_client.get(f"/books/{book['id']}", headers={"If-None-Match": etag}).status_code == 200
+
+    list_etag = books_client.get("/books/").headers["ETag"]
+    assert books_client.get("/books/", headers={"If-None-Match": list_etag}).status_code == 304
+    assert books_client.get("/books/?limit=5", headers={"If-None-Match": list_etag}).status_code == 200
+
+    # Порожній PUT нічого не змінює: версія книги і ETag списку ті самі
+    unchanged = books_client.put(f"/books/{book['id']}", json={})
+    assert unchanged.status_code == 200 and unchanged.json()["version"] == 2
+    assert unchanged.headers["ETag"] == updated.headers["ETag"]
+    assert books_client.get("/books/", headers={"If-None-Match": list_etag}).status_code == 304
+    assert books_client.put("/books/9999", json={}).status_code == 404
+
+    _create_books(books_client, 1)
+    assert books_client.get("/books/", headers={"If-None-Match": list_etag}).status_code == 200
+
+
+def test_books_list_response_cache(books_client, book_cache, monkeypatch):
+    """Повторна сторінка списку - збережене тіло з тими ж заголовками; після запису - нове тіло"""
+    from core.response_cache import ResponseCache
+
+    responses = ResponseCache(compress_min_bytes=0, enabled=True)
+    monkeypatch.setattr("books.cache.list_responses", responses)
+    _create_books(books_client, 3)
+
+    first = books_client.get("/books/?limit=2", headers={"Accept-Encoding": "identity"})
+    second = books_client.get("/books/?limit=2", headers={"Accept-Encoding": "gzip"})
+    assert responses.hits == 1 and responses.misses == 1
+    assert second.headers["Content-Encoding"] == "gzip"
+    assert second.content == first.content
+    assert [b["isbn"] for b in second.json()] == ["isbn-0", "isbn-1"]
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+
+    # Запис змінює версію каталогу, а з нею і ключ
+    books_client.put(f"/books/{first.json()[0]['id']}", json={"title": "Renamed"})
+    assert books_client.get("/books/?limit=2").json()[0]["title"] == "Renamed"
+    assert books_client.get("/books/search/Book 2").json()[0]["isbn"] == "isbn-2"
+    assert responses.misses == 3
+
+
+def test_books_schema_migration():
+    """Міграція створює схему з нуля, повторний запуск нічого не ламає; без тригерів старт не проходить"""
+    import pytest
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+
+    from books import crud
+    from books.ddl import check_schema, migrate, missing_schema
+    from books.models import Base
+    from books.schemas import BookCreate
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    migrate(engine)
+    migrate(engine)
+    assert missing_schema(engine) == []
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM books_catalog_version")).scalar() == 16
+
+    with Session(engine) as db:
+        before = crud.get_catalog_version(db)
+        crud.create_book(db, BookCreate(title="T", author="A", isbn="schema-1"))
+        assert crud.get_catalog_version(db) == before + 1
+
+    unmigrated = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(unmigrated)
+    assert "trigger books_catalog_version_insert" in missing_schema(unmigrated)
+    with pytest.raises(RuntimeError, match="alembic upgrade head"):
+        check_schema(unmigrated)
+
+
+def test_books_write_errors(books_client):
+    """400/404 для записів однією інструкцією"""
+    _create_books(books_client, 2)
+    book_id = books_client.get("/books/isbn/isbn-1").json()["id"]
+
+    assert books_client.put(f"/books/{book_id}", json={"isbn": "isbn-0"}).status_code == 400
+    assert books_client.put(f"/books/{book_id}", json={"isbn": "isbn-1", "year": 2001}).json()["year"] == 2001
+    assert books_client.put("/books/9999", json={"title": "Missing"}).status_code == 404
+    assert books_client.delete("/books/9999").status_code == 404
+    assert books_client.delete(f"/books/{book_id}").status_code == 200
+    assert books_client.delete(f"/books/{book_id}").status_code == 404
+
+
+def test_books_batch_lookup(books_client):
+    """Пакетний пошук зберігає порядок запиту і повертає null для відсутніх"""
+    _create_books(books_client, 3)
+    ids = [books_client.get(f"/books/isbn/isbn-{i}").json()["id"] for i in range(3)]
+
+    response = books_client.get(f"/books/batch?ids={ids[2]},9999&ids={ids[0]}")
+    assert response.status_code == 200
+    assert [book and book["id"] for book in response.json()] == [ids[2], None, ids[0]]
+
+    response = books_client.get("/books/batch?isbns=isbn-1,missing")
+    assert [book and book["isbn"] for book in response.json()] == ["isbn-1", None]
+
+    assert books_client.get("/books/batch").status_code == 400
+    assert books_client.get("/books/batch?ids=abc").status_code == 400
+    assert books_client.get("/books/batch?ids=1&isbns=isbn-1").status_code == 400
+
+
+def test_batch_loader_coalesces_lookups():
+    """Одночасні load() в межах одного кроку циклу - один виклик fetch_many"""
+    from types import SimpleNamespace
+
+    from books.batch import BatchLoader
+
+    calls = []
+
+    async def fetch_many(bind, keys):
+        calls.append((bind, keys))
+        return {key: key * 10 for key in keys if key != 3}
+
+    async def run():
+        loader = BatchLoader(fetch_many)
+        db = SimpleNamespace(bind="engine")
+        results = await asyncio.gather(*(loader.load(db, key) for key in [1, 2, 3, 1]))
+        return loader, results
+
+    loader, results = asyncio.run(run())
+    assert results == [10, 20, None, 10]
+    assert calls == [("engine", [1, 2, 3])]
+    assert loader.stats() == {"loads": 4, "batches": 1}
+
+
+def test_batch_loader_uses_own_session(db_session, monkeypatch):
+    """Пакет читає у власній сесії на тому ж рушії, а не в сесії запиту, що його відкрив"""
+    from books import batch, crud
+    from books.schemas import BookCreate
+
+    book = crud.create_book(db_session, BookCreate(title="Dune", author="Frank Herbert", isbn="isbn-dune"))
+    sessions = []
+    get_books_by_ids = crud.get_books_by_ids
+
+    def spy(db, ids):
+        sessions.append(db)
+        return get_books_by_ids(db, ids)
+
+    monkeypatch.setattr(crud, "get_books_by_ids", spy)
+    found = asyncio.run(batch.id_loader.load(db_session, book.id))
+    assert found.title == "Dune"
+    assert len(sessions) == 1
+    assert sessions[0] is not db_session
+    assert sessions[0].bind is db_session.bind
@@ -0,0 +1,255 @@
+import asyncio
+import json
+
+
+def test_local_cache_bounds():
+    """L1 обмежений і кількістю записів, і сумарним розміром"""
+    from core.local_cache import LocalCache
+
+    cache = LocalCache(max_entries=3, max_bytes=100, ttl=60)
+    for i in range(4):
+        cache.set(f"k{i}", i, size=10)
+    assert cache.get("k0") is None
+    assert len(cache) == 3
+
+    cache.get("k1")
+    cache.set("big", "x", size=85)
+    # Витісняються найдавніше використані записи, доки не вміститься розмір
+    assert cache.get("k1") == 1
+    assert cache.get("k2") is None and cache.get("k3") is None
+    assert cache.bytes == 95
+
+    cache.set("huge", "x", size=101)
+    assert cache.get("huge") is None
+
+
+def test_two_tier_cache(monkeypatch, fake_redis):
+    """cache_get читає з L1 після першого звернення до Redis; запис з іншого воркера скидає L1"""
+    from core import cache
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    monkeypatch.setenv("REDIS_URL", "redis://fake")
+
+    async def run():
+        await cache.start_invalidation_listener()
+        await asyncio.sleep(0.05)
+        before = await cache.cache_stats()
+
+        assert await cache.cache_set("books:raw:q:10", {"items": [1]}, ttl=60)
+        cache.l1.clear()
+        assert await cache.cache_get("books:raw:q:10") == {"items": [1]}
+        assert await cache.cache_get("books:raw:q:10") == {"items": [1]}
+        after = await cache.cache_stats()
+        assert after["l2_hits"] - before["l2_hits"] == 1
+        assert after["l1_hits"] - before["l1_hits"] == 1
+
+        # Інший воркер перезаписав ключ: прийшло повідомлення - локальна копія скинута
+        await fake_redis.set("books:raw:q:10", json.dumps({"items": [2]}))
+        await fake_redis.publish(
+            cache.CACHE_INVALIDATION_CHANNEL, json.dumps({"origin": "other", "keys": ["books:raw:q:10"]})
+        )
+        await asyncio.sleep(0.05)
+        assert await cache.cache_get("books:raw:q:10") == {"items": [2]}
+
+        await cache.cache_delete("books:raw:q:10")
+        assert await cache.cache_get("books:raw:q:10") is None
+        await cache.stop_invalidation_listener()
+
+    asyncio.run(run())
+
+
+def test_cache_get_set_many(monkeypatch, fake_redis):
+    """Пакетні операції: один pipeline на запис і на читання, L1 заповнюється"""
+    from core import cache
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+
+    async def run():
+        assert await cache.cache_set_many({"a": 1, "b": {"x": 2}}, ttl=60)
+        cache.l1.clear()
+        assert await cache.cache_get_many(["a", "b", "missing", "a"]) == {"a": 1, "b": {"x": 2}}
+        assert cache.l1.get("b") == {"x": 2}
+        assert 0 < await fake_redis.ttl("a") <= 60
+
+    asyncio.run(run())
+
+
+def test_swr_windows_by_prefix():
+    from core.swr import StaleWhileRevalidate, parse_windows
+
+    windows = parse_windows("books:=60/600, books:raw:=30/3600,other:=10")
+    assert windows == {"books:": (60, 600), "books:raw:": (30, 3600), "other:": (10, 10)}
+    swr = StaleWhileRevalidate(windows=windows, soft_ttl=5, hard_ttl=50)
+    assert swr.window("books:raw:python:10") == (30, 3600)
+    assert swr.window("books:processed:python:10") == (60, 600)
+    assert swr.window("misc") == (5, 50)
+
+
+def test_swr_serves_stale_and_refreshes_in_background(monkeypatch, fake_redis):
+    """Між soft і hard TTL - застаріле значення одразу, оновлення у фоні; помилка оновлення не видна клієнту"""
+    import time
+
+    from core.codec import codec
+    from core.single_flight import SingleFlight
+    from core.swr import StaleWhileRevalidate
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    upstream = {"value": "new", "fail": False, "calls": 0}
+
+    async def fetch():
+        upstream["calls"] += 1
+        await asyncio.sleep(0.01)
+        if upstream["fail"]:
+            raise RuntimeError("upstream down")
+        return upstream["value"]
+
+    async def wait_refresh(swr):
+        while swr._refreshing:
+            await asyncio.sleep(0.01)
+
+    async def run():
+        swr = StaleWhileRevalidate(SingleFlight(distributed=False), windows={}, soft_ttl=60, hard_ttl=600)
+
+        await swr._store("key", "old", soft_ttl=-1)
+        assert await swr.get("key", fetch) == "old"
+        await wait_refresh(swr)
+        assert await swr.get("key", fetch) == "new"
+        assert upstream["calls"] == 1
+
+        upstream["fail"] = True
+        await swr._store("key", "new", soft_ttl=-1)
+        assert await swr.get("key", fetch) == "new"
+        await wait_refresh(swr)
+        entry = await fake_redis.get("key")
+        assert codec.decode(entry)["soft_expires_at"] > time.time()
+        assert await swr.get("key", fetch) == "new"
+        return swr.stats()
+
+    stats = asyncio.run(run())
+    assert stats["stale_hits"] == 2
+    assert stats["refreshes"] == 1
+    assert stats["refresh_failures"] == 1
+
+
+def test_codec_round_trip_and_legacy_entries():
+    """Великі записи стискаються, малі - ні; старі json-рядки без заголовка читаються"""
+    from core.codec import Codec
+
+    codec = Codec(serializer="json", compression="zlib", min_compress_bytes=100)
+    small = {"title": "Кобзар", "year": 1840}
+    large = {"items": [{"description": "слово " * 500}] * 5}
+
+    assert codec.decode(codec.encode(small)) == small
+    assert codec.encode(small)[3] == 0
+    encoded = codec.encode(large)
+    assert encoded[3] == 1 and len(encoded) < len(json.dumps(large)) / 10
+    assert codec.decode(encoded) == large
+
+    assert codec.decode(json.dumps(small)) == small
+    assert codec.decode(json.dumps(small).encode()) == small
+    # Недоступна бібліотека - запасний формат, а не помилка під час імпорту
+    assert Codec(serializer="missing", compression="missing").encode(small)[2:4] == bytes((1, 0))
+
+
+def test_disk_cache_ttl_locks_and_compaction(tmp_path):
+    """Два екземпляри на одному файлі - як два воркери; compact() тримає розмір у межах"""
+    import time
+
+    from core.disk_cache import DiskCache
+
+    path = str(tmp_path / "cache.db")
+    worker1, worker2 = DiskCache(path, max_bytes=1000), DiskCache(path, max_bytes=1000)
+
+    worker1.set("a", b"x" * 100, ttl=60)
+    value, ttl = worker2.get("a")
+    assert value == b"x" * 100 and 59 < ttl <= 60
+    worker1.set("gone", b"old", ttl=-1)
+    assert worker2.get("gone") is None
+
+    assert worker1.add("lock", b"t1", ttl=60)
+    assert not worker2.add("lock", b"t2", ttl=60)
+    assert not worker2.delete_if("lock", b"t2")
+    assert worker1.delete_if("lock", b"t1")
+    assert worker2.add("lock", b"t2", ttl=60)
+
+    worker2.set_many({f"k{i}": b"y" * 100 for i in range(10)}, ttl=120)
+    time.sleep(0.01)
+    assert worker1.compact(interval=60) == {"expired": 1, "evicted": 3}
+    # Інший воркер у тому ж інтервалі не повторює компакцію
+    assert worker2.compact(interval=60) is None
+    # Витіснено записи, що протухають найраніше
+    assert worker1.get("a") is None and worker1.get("k9") is not None
+    assert worker1.stats()["bytes"] <= 900
+
+
+def test_cache_falls_back_to_disk_when_redis_is_down(monkeypatch, tmp_path):
+    """Redis недоступний: записи й читання йдуть на диск, після порогу помилок Redis не смикаємо"""
+    import threading
+
+    from redis.exceptions import ConnectionError
+
+    from core import cache
+    from core.disk_cache import DiskCache
+    from core.resilience import CircuitBreaker
+
+    calls = []
+
+    def broken_redis():
+        calls.append(1)
+        raise ConnectionError("Connection refused")
+
+    monkeypatch.setattr(cache, "disk", DiskCache(str(tmp_path / "cache.db"), max_bytes=10**6))
+    monkeypatch.setattr(cache, "redis_breaker", CircuitBreaker("redis", 2, 60, is_failure=lambda e: True))
+    monkeypatch.setattr("core.cache.get_redis", broken_redis)
+    monkeypatch.setenv("REDIS_URL", "redis://unreachable")
+
+    async def run():
+        assert await cache.cache_set("books:raw:q:10", {"items": [1]}, ttl=60)
+        cache.l1.clear()
+        assert await cache.cache_get("books:raw:q:10") == {"items": [1]}
+        assert await cache.cache_get_many(["books:raw:q:10", "missing"]) == {"books:raw:q:10": {"items": [1]}}
+        token = await cache.cache_lock("lock:q", 10)
+        assert token and await cache.cache_lock("lock:q", 10) is None
+        assert await cache.cache_unlock("lock:q", token)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    # Статистика диска читається в потоці дискового рівня, а не в потоці виклику
+    threads = []
+    disk_stats = cache.disk.stats
+    monkeypatch.setattr(cache.disk, "stats", lambda: threads.append(threading.current_thread().name) or disk_stats())
+    stats = asyncio.run(cache.cache_stats())
+    assert stats["redis"]["state"] == "open" and stats["disk"]["entries"] == 1
+    assert threads and threads[0].startswith("disk-cache")
+
+
+def test_disk_copy_of_redis_writes_is_written_behind(monkeypatch, tmp_path, fake_redis):
+    """З робочим Redis копія на диск пишеться у фоні, по порядку з видаленнями"""
+    import threading
+
+    from core import cache
+    from core.disk_cache import DiskCache
+
+    disk = DiskCache(str(tmp_path / "cache.db"), max_bytes=10**6)
+    writer_threads = []
+    set_many = disk.set_many
+
+    def tracked_set_many(items, ttl):
+        writer_threads.append(threading.current_thread())
+        set_many(items, ttl)
+
+    disk.set_many = tracked_set_many
+    monkeypatch.setattr(cache, "disk", disk)
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    monkeypatch.setenv("REDIS_URL", "redis://fake")
+
+    async def run():
+        assert await cache.cache_set("books:raw:a:10", {"items": [1]}, ttl=60)
+        assert await cache.cache_set_many({"books:raw:b:10": {"items": [2]}}, ttl=60)
+        await cache.cache_delete("books:raw:a:10")
+        await cache.flush_disk_writes()
+
+    asyncio.run(run())
+    assert writer_threads and all(thread is not threading.main_thread() for thread in writer_threads)
+    assert disk.get("books:raw:a:10") is None
+    assert disk.get("books:raw:b:10") is not None
@@ -37,3 +37,11 @@ def test_log_test(client):
     data = response.json()
     assert "message" in data
     assert "levels_tested" in data
+
+
+def test_cache_stats(client):
+    response = client.get("/common/cache-stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert "l1_hit_ratio" in data
+    assert "l2_hit_ratio" in data
@@ -1,3 +1,7 @@
+import asyncio
+import json
+
+
 def test_external_books_endpoint(client):
     """Тест пошуку книг через Google Books API"""
     response = client.get("/api/external/books?query=python&max_results=5")
@@ -33,3 +37,577 @@ def test_cache_test_endpoint(client):
     assert "cache_status" in data
     assert "first_request_ms" in data
     assert "second_request_ms" in data
+
+
+def test_external_books_use_shared_http_client(client, google_books_stub):
+    """Запит до Google Books іде через async-клієнт, повторний - з кешу"""
+    response = client.get("/api/external/books?query=stub&max_results=1")
+    assert response.status_code == 200
+    assert response.json()["books"][0]["title"] == "Stub Book"
+    assert google_books_stub[0].url.params["q"] == "stub"
+
+    assert client.get("/api/external/books?query=stub&max_results=1").status_code == 200
+    assert len(google_books_stub) == 1
+
+
+def test_external_books_response_cache(client, google_books_stub, monkeypatch):
+    """Повтор пошуку віддає збережені байти відповіді в кодуванні, яке приймає клієнт"""
+    from core.response_cache import ResponseCache
+    from external_api.service import books_service
+
+    responses = ResponseCache(compress_min_bytes=0, enabled=True)
+    monkeypatch.setattr(books_service, "responses", responses)
+
+    first = client.get("/api/external/books?query=bytes&max_results=1", headers={"Accept-Encoding": "identity"})
+    second = client.get("/api/external/books?query=bytes&max_results=1", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert responses.hits == 1
+    assert "Content-Encoding" not in first.headers
+    assert second.headers["Content-Encoding"] == "gzip"
+    assert second.headers["Vary"] == "Accept-Encoding"
+    assert second.content == first.content
+    assert second.json()["books"][0]["title"] == "Stub Book"
+    assert len(google_books_stub) == 1
+
+
+def test_http_client_lifecycle():
+    """Клієнт створюється в lifespan і перевикористовується до закриття"""
+    from external_api import http_client
+
+    async def run():
+        started = await http_client.start_http_client()
+        assert http_client.get_http_client() is started
+        await http_client.close_http_client()
+        return started
+
+    assert asyncio.run(run()).is_closed
+
+
+def test_http_client_replaced_in_new_loop_closes_old_one():
+    """Клієнт з попереднього event loop закривається, а не лишається з відкритим пулом"""
+    from external_api import http_client
+
+    async def get():
+        return http_client.get_http_client()
+
+    async def replace():
+        client = http_client.get_http_client()
+        await asyncio.sleep(0)
+        return client
+
+    first = asyncio.run(get())
+    second = asyncio.run(replace())
+    assert second is not first
+    assert first.is_closed and not second.is_closed
+    asyncio.run(http_client.close_http_client())
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Одночасні виклики з тим самим ключем - один запит до upstream"""
+    from core.single_flight import SingleFlight
+
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"items": []}
+
+    async def run():
+        flight = SingleFlight(distributed=False)
+        results = await asyncio.gather(*(flight.do("books:raw:q:10", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_single_flight_leader_cancellation_keeps_followers():
+    """Скасований лідер (клієнт закрив потік) не скасовує запит для інших очікувачів"""
+    from core.single_flight import SingleFlight
+
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"items": ["book"]}
+
+    async def run():
+        flight = SingleFlight(distributed=False)
+        leader = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        return flight, leader, result
+
+    flight, leader, result = asyncio.run(run())
+    assert leader.cancelled()
+    assert result == {"items": ["book"]}
+    assert len(calls) == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_single_flight_redis_lock_across_workers(monkeypatch, fake_redis):
+    """Другий воркер не йде в upstream, а чекає, поки лідер заповнить кеш"""
+    from core.single_flight import SingleFlight
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    shared_cache, calls = {}, []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        shared_cache["key"] = {"items": []}
+        return shared_cache["key"]
+
+    async def peek():
+        return shared_cache.get("key")
+
+    async def run():
+        workers = [SingleFlight(distributed=True, poll_interval=0.01) for _ in range(2)]
+        results = await asyncio.gather(*(worker.do("key", fetch, peek=peek) for worker in workers))
+        return workers, results
+
+    workers, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results == [{"items": []}, {"items": []}]
+    assert sum(worker.remote_coalesced for worker in workers) == 1
+    assert asyncio.run(fake_redis.exists("lock:key")) == 0
+
+
+def test_cache_key_normalisation():
+    from external_api import keys
+
+    assert keys.normalize_query("  Python  PROGRAMMING ") == "python programming"
+    assert keys.cache_key("raw", "Ｐython", 10) == keys.cache_key("raw", "python", 10) == "books:raw:python:10"
+    assert keys.cache_key("raw", "q", 10, lang="en", order="new") == "books:raw:q:10:lang=en:order=new"
+    long_key = keys.cache_key("raw", "x" * 500, 10)
+    assert long_key.startswith("books:raw:h:") and len(long_key) < 100
+    assert keys.superset_sizes(10) == [20, 40]
+
+
+def test_external_books_reuse_larger_cached_result(client, google_books_stub):
+    """Запит на 10 результатів обслуговує кешована відповідь на 20; варіанти запису запиту - один ключ"""
+    assert client.get("/api/external/books/raw?query=Python&max_results=20").status_code == 200
+    response = client.get("/api/external/books/raw?query=%20python%20&max_results=10")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) <= 10
+    assert len(google_books_stub) == 1
+    assert google_books_stub[0].url.params["q"] == "python"
+
+
+def test_external_books_cache_raw_only(client, monkeypatch, fake_redis, google_books_stub):
+    """EXTERNAL_CACHE_PROCESSED=0: у Redis лише сира відповідь, оброблений вигляд будується з неї"""
+    monkeypatch.setattr("external_api.service.CACHE_PROCESSED", False)
+    for _ in range(2):
+        response = client.get("/api/external/books?query=raw%20only&max_results=10")
+        assert response.status_code == 200
+        assert response.json()["books"][0]["title"] == "Stub Book"
+    assert len(google_books_stub) == 1
+    stored = asyncio.run(fake_redis.keys("books:*"))
+    assert stored == [b"books:raw:raw only:10"]
+
+
+def test_process_raw_fast_path():
+    """Перетворення без повторної валідації дає ті самі поля, що й моделі; посилання лишаються рядками"""
+    from external_api.models import GoogleBooksResponse, ProcessedBook
+    from external_api.service import GoogleBooksService
+
+    raw = {
+        "kind": "books#volumes",
+        "totalItems": 2,
+        "items": [
+            {
+                "id": "a",
+                "volumeInfo": {
+                    "title": "Full",
+                    "authors": ["A. Author"],
+                    "publishedDate": "2019-05",
+                    "pageCount": 320,
+                    "categories": ["Computers"],
+                    "imageLinks": {"thumbnail": "http://books.google.com/t?id=a"},
+                    "previewLink": "http://books.google.com/books?id=a&hl=&source=gbs_api",
+                    "language": "en",
+                    "saleInfo": {"ignored": True},
+                },
+            },
+            {"id": "b", "volumeInfo": {"title": "Minimal", "publishedDate": "n.d."}},
+        ],
+    }
+    GoogleBooksResponse.model_validate(raw)
+
+    books = GoogleBooksService._process_raw(raw)
+    assert books[0]["published_year"] == 2019
+    assert books[0]["preview_link"] == "http://books.google.com/books?id=a&hl=&source=gbs_api"
+    assert books[1] == {
+        "id": "b",
+        "title": "Minimal",
+        "authors": ["Unknown Author"],
+        "published_year": None,
+        "page_count": None,
+        "categories": [],
+        "thumbnail": None,
+        "preview_link": None,
+        "language": None,
+    }
+    assert [ProcessedBook.model_validate(book).model_dump() for book in books] == books
+    response = GoogleBooksService._processed_response(books)
+    assert response.total_books == 2 and response.books[1].authors == ["Unknown Author"]
+
+
+def test_external_books_stream_fans_out_pages(client, monkeypatch, fake_redis, mock_google_books):
+    """max_results > 40: сторінки startIndex паралельно, дублікати за id відкинуті, потік NDJSON"""
+    import httpx
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        start = int(request.url.params.get("startIndex", 0))
+        size = int(request.url.params["maxResults"])
+        calls.append(start)
+        # 90 результатів усього; сусідні сторінки перекриваються на одну книгу
+        ids = range(max(start - 1, 0), min(start + size, 90))
+        items = [{"id": f"vol-{i}", "volumeInfo": {"title": f"Book {i}"}} for i in ids]
+        return httpx.Response(200, json={"kind": "books#volumes", "totalItems": 90, "items": items})
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    mock_google_books(handler)
+
+    response = client.get("/api/external/books/stream?query=fanout&max_results=200")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    books = [json.loads(line) for line in response.text.splitlines()]
+    assert [book["id"] for book in books] == [f"vol-{i}" for i in range(90)]
+    assert sorted(calls)[:3] == [0, 40, 80]
+
+    merged = client.get("/api/external/books?query=fanout&max_results=200").json()
+    assert merged["total_books"] == 90
+
+
+def test_external_books_stream_survives_short_pages(client, monkeypatch, fake_redis, mock_google_books):
+    """Коротка сторінка посеред вибірки не обриває потік; кінець - порожня сторінка"""
+    import httpx
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        start = int(request.url.params.get("startIndex", 0))
+        # Друга сторінка коротка, четверта - порожня; totalItems у Google завищений
+        sizes = {0: 40, 40: 25, 80: 40}
+        ids = range(start, start + sizes.get(start, 0))
+        items = [{"id": f"vol-{i}", "volumeInfo": {"title": f"Book {i}"}} for i in ids]
+        return httpx.Response(200, json={"kind": "books#volumes", "totalItems": 1000, "items": items})
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    mock_google_books(handler)
+
+    response = client.get("/api/external/books/stream?query=gaps&max_results=200")
+    assert response.status_code == 200
+    books = [json.loads(line) for line in response.text.splitlines()]
+    assert len(books) == 105
+    assert books[-1]["id"] == "vol-119"
+
+
+def test_processed_refresh_does_not_reuse_stale_raw(monkeypatch, fake_redis, mock_google_books):
+    """Фонове оновлення обробленого запису йде в Google, а не будується з такого ж застарілого сирого"""
+    import time
+
+    import httpx
+
+    from external_api.service import GoogleBooksService
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        items = [{"id": f"v{len(calls)}", "volumeInfo": {"title": f"Volume {len(calls)}"}}]
+        return httpx.Response(200, json={"kind": "books#volumes", "totalItems": 1, "items": items})
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    mock_google_books(handler)
+    service = GoogleBooksService()
+    now = time.time()
+
+    async def run():
+        first = await service.process_books_data("drift", 5)
+        # Сирий і оброблений записи застаріли одночасно
+        monkeypatch.setattr("core.swr.time.time", lambda: now + service.cache.window("books:")[0] + 1)
+        stale = await service.process_books_data("drift", 5)
+        while service.cache._refreshing:
+            await asyncio.sleep(0)
+        fresh = await service.process_books_data("drift", 5)
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(run())
+    assert first.books[0].id == stale.books[0].id == "v1"
+    assert fresh.books[0].id == "v2"
+    assert len(calls) == 2
+
+
+def test_circuit_breaker_fails_fast_and_recovers(client, monkeypatch, fake_redis, mock_google_books):
+    """Після серії 5xx запобіжник відкривається: 503 без запиту до Google; health читає його стан"""
+    import time
+
+    import httpx
+
+    from core.resilience import CircuitBreaker
+    from external_api.service import books_service, is_upstream_failure
+
+    upstream = {"status": 503, "calls": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream["calls"] += 1
+        if upstream["status"] != 200:
+            return httpx.Response(upstream["status"])
+        return httpx.Response(200, json={"kind": "books#volumes", "totalItems": 0, "items": []})
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    mock_google_books(handler)
+    breaker = CircuitBreaker("google_books", failure_threshold=2, recovery_timeout=0.2, is_failure=is_upstream_failure)
+    monkeypatch.setattr(books_service, "breaker", breaker)
+
+    assert client.get("/api/external/books/raw?query=a").status_code == 500
+    assert client.get("/api/external/books/raw?query=b").status_code == 500
+    response = client.get("/api/external/books/raw?query=c")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert upstream["calls"] == 2
+
+    health = client.get("/api/external/health").json()
+    assert health["status"] == "degraded"
+    assert health["external_apis"]["google_books"]["state"] == "open"
+
+    # 404 - не збій upstream, запобіжник не рахує
+    assert not is_upstream_failure(httpx.HTTPStatusError("", request=None, response=httpx.Response(404)))
+
+    time.sleep(0.25)
+    upstream["status"] = 200
+    assert client.get("/api/external/books/raw?query=d").status_code == 200
+    assert client.get("/api/external/health").json()["status"] == "healthy"
+
+
+def test_aimd_limiter_adapts_to_failures_and_latency():
+    """Ліміт росте адитивно на успіхах і падає вдвічі на помилках; понад ліміт - відмова після очікування в черзі"""
+    from core.resilience import AIMDLimiter, ConcurrencyLimitExceeded
+
+    limiter = AIMDLimiter("test", initial=2, minimum=1, maximum=4, latency_target=0.05, queue_timeout=0.01)
+
+    async def ok():
+        return "ok"
+
+    async def slow():
+        await asyncio.sleep(0.1)
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def run():
+        for _ in range(20):
+            await limiter.run(ok)
+        assert limiter.stats()["limit"] == 4
+
+        await limiter.run(slow)
+        assert limiter.stats()["limit"] == 2
+
+        try:
+            await limiter.run(failing)
+        except RuntimeError:
+            pass
+        assert limiter.stats()["limit"] == 1
+
+        results = await asyncio.gather(limiter.run(slow), limiter.run(slow), return_exceptions=True)
+        assert isinstance(results[1], ConcurrencyLimitExceeded)
+        assert limiter.stats()["rejected"] == 1
+
+    asyncio.run(run())
+
+
+def test_aimd_limiter_queues_calls_over_the_limit():
+    """Виклики понад ліміт чекають на вільне місце у порядку черги, а не отримують відмову"""
+    from core.resilience import AIMDLimiter
+
+    limiter = AIMDLimiter("test", initial=1, minimum=1, maximum=1, queue_timeout=1)
+    order = []
+
+    async def call(name):
+        order.append(f"start {name}")
+        await asyncio.sleep(0.01)
+        order.append(f"end {name}")
+        return name
+
+    async def run():
+        results = await asyncio.gather(*(limiter.run(lambda name=name: call(name)) for name in "abc"))
+        return results, limiter.stats()
+
+    results, stats = asyncio.run(run())
+    assert results == ["a", "b", "c"]
+    assert order == ["start a", "end a", "start b", "end b", "start c", "end c"]
+    assert stats == {"limit": 1, "in_flight": 0, "queued": 0, "rejected": 0}
+
+
+def test_aimd_limiter_decreases_once_per_window():
+    """Одночасні збої зменшують ліміт один раз; збій після зменшення - ще раз"""
+    from core.resilience import AIMDLimiter
+
+    limiter = AIMDLimiter("test", initial=8, minimum=1, maximum=8)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        results = await asyncio.gather(*(limiter.run(failing) for _ in range(8)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert limiter.stats()["limit"] == 4
+
+        try:
+            await limiter.run(failing)
+        except RuntimeError:
+            pass
+        assert limiter.stats()["limit"] == 2
+
+    asyncio.run(run())
+
+
+def test_cache_warmer_refreshes_popular_searches_within_budget(client, monkeypatch, fake_redis, google_books_stub):
+    """Найпопулярніший пошук оновлюється до закінчення soft TTL; решта чекає, поки є бюджет"""
+    from core.popularity import PopularityTracker
+    from external_api.service import books_service
+    from external_api.warmer import CacheWarmer
+
+    monkeypatch.setattr("core.popularity.get_redis", lambda: fake_redis)
+    monkeypatch.setattr(books_service, "popularity", PopularityTracker("warmer_test"))
+    for query in ("hot", "hot", "hot", "cold"):
+        assert client.get(f"/api/external/books?query={query}&max_results=10").status_code == 200
+    assert len(google_books_stub) == 2
+
+    # lead більший за soft TTL - обидва записи "скоро протухнуть"
+    warmer = CacheWarmer(books_service, top_k=2, interval=1, lead=3600, budget=1)
+    asyncio.run(warmer.run_once())
+    assert len(google_books_stub) == 3
+    assert google_books_stub[-1].url.params["q"] == "hot"
+
+    assert client.get("/api/external/books?query=hot&max_results=10").status_code == 200
+    # Лок циклу ще тримається - другий прохід лише рахує влучання в прогріті записи
+    asyncio.run(warmer.run_once())
+    stats = warmer.stats()
+    assert stats["cycles"] == 1 and stats["warmed"] == 1 and stats["upstream_requests"] == 1
+    assert stats["over_budget"] == 1
+    assert stats["tracked_requests"] == 5 and stats["hit_ratio"] == 0.2
+
+
+def test_external_books_batch(client, monkeypatch, fake_redis, mock_google_books):
+    """Порядок відповіді як у запиті; закешовані пошуки без запиту до Google, помилка - лише у своєму елементі"""
+    import httpx
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        query = request.url.params["q"]
+        calls.append(query)
+        if query == "broken":
+            return httpx.Response(404, json={"error": "not found"})
+        items = [{"id": f"{query}-1", "volumeInfo": {"title": f"{query} book"}}]
+        return httpx.Response(200, json={"kind": "books#volumes", "totalItems": 1, "items": items})
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    mock_google_books(handler)
+    assert client.get("/api/external/books?query=cached&max_results=5").status_code == 200
+
+    searches = [
+        {"query": "fresh", "max_results": 5},
+        {"query": "broken"},
+        {"query": " Cached ", "max_results": 5},
+    ]
+    response = client.post("/api/external/books/batch", json=searches)
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["query"] for result in results] == ["fresh", "broken", " Cached "]
+    assert results[0]["result"]["books"][0]["title"] == "fresh book"
+    assert results[1]["status_code"] == 500 and results[1]["result"] is None and results[1]["error"]
+    assert results[2]["result"]["books"][0]["id"] == "cached-1"
+    assert sorted(calls) == ["broken", "cached", "fresh"]
+
+    assert client.post("/api/external/books/batch", json=[]).status_code == 422
+    assert client.post("/api/external/books/batch", json=[{"query": "x", "max_results": 41}]).status_code == 422
+
+
+def test_external_books_batch_reads_each_key_once(client, monkeypatch, google_books_stub):
+    """Ключі пакета читаються одним MGET; промахи не йдуть у Redis по кожен ключ вдруге"""
+    from core import cache
+    from external_api.service import books_service
+
+    reads = []
+    redis_get, redis_get_many = cache._redis_get, cache._redis_get_many
+
+    async def counting_get(key):
+        reads.append([key])
+        return await redis_get(key)
+
+    async def counting_get_many(missing):
+        reads.append(list(missing))
+        return await redis_get_many(missing)
+
+    assert client.get("/api/external/books?query=cached&max_results=5").status_code == 200
+    cache.l1.clear()
+    monkeypatch.setattr(cache, "_redis_get", counting_get)
+    monkeypatch.setattr(cache, "_redis_get_many", counting_get_many)
+
+    searches = [{"query": "cached", "max_results": 5}, {"query": "miss", "max_results": 5}]
+    assert client.post("/api/external/books/batch", json=searches).status_code == 200
+
+    batch_keys = [books_service.warm_key(search["query"], search["max_results"]) for search in searches]
+    batch_reads = [keys for keys in reads if set(keys) & set(batch_keys)]
+    assert batch_reads == [batch_keys]
+    assert len(google_books_stub) == 2
+
+
+def test_external_router_handlers_await_service(client, google_books_stub):
+    response = client.get("/api/external/processed?query=stub&max_results=1")
+    assert response.status_code == 200
+    assert response.json()["books"][0]["title"] == "Stub Book"
+    assert client.get("/api/external/data?query=stub&max_results=1").json()["items"][0]["id"] == "stub-1"
+
+
+def test_external_books_negative_cache(client, monkeypatch, fake_redis, mock_google_books):
+    """Порожній результат і відмова Google кешуються коротко: повтор запиту не йде в API"""
+    import httpx
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        query = request.url.params["q"]
+        calls.append(query)
+        if query == "bad request":
+            return httpx.Response(400, json={"error": "invalid query"})
+        if query == "outage":
+            return httpx.Response(502, json={"error": "bad gateway"})
+        # Без items, як Google відповідає на запит без результатів
+        return httpx.Response(200, json={"kind": "books#volumes", "totalItems": 0})
+
+    monkeypatch.setattr("core.cache.get_redis", lambda: fake_redis)
+    mock_google_books(handler)
+
+    for _ in range(2):
+        response = client.get("/api/external/books?query=qwzx&max_results=10")
+        assert response.status_code == 200
+        assert response.json() == {"total_books": 0, "books": []}
+    ttl = asyncio.run(fake_redis.ttl("books:raw:qwzx:10"))
+    assert 0 < ttl <= 300 * 1.2 + 1
+
+    # Відмова на запит (4xx) з кешу - та сама відповідь, без Retry-After
+    first = client.get("/api/external/books/raw?query=bad%20request")
+    cached = client.get("/api/external/books/raw?query=bad%20request")
+    assert first.status_code == cached.status_code == 500
+    assert cached.json() == first.json()
+    assert "Retry-After" not in cached.headers
+
+    # Збій Google (5xx) з кешу - 503 з Retry-After
+    assert client.get("/api/external/books/raw?query=outage").status_code == 500
+    cached = client.get("/api/external/books/raw?query=outage")
+    assert cached.status_code == 503
+    assert 0 < int(cached.headers["Retry-After"]) <= 5 * 1.2 + 1
+    assert calls == ["qwzx", "bad request", "outage"]